@@ -0,0 +1,47 @@
+# backend/app/api/admin.py
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse, Response
+
+from ..core.profiling import admin_token_ok, list_profiles, get_profile_session, render_speedscope, render_collapsed
+from ..core.admission import admission
+
+router = APIRouter()
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    if not admin_token_ok(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@router.get("/admission", dependencies=[Depends(require_admin)])
+def get_admission():
+    """Текущая загрузка admission control: активные/ждущие операции по классам."""
+    return {"status": "ok", "items": admission.snapshot()}
+
+@router.get("/profiles", dependencies=[Depends(require_admin)])
+def get_profiles():
+    """Список сохраненных профилей запросов (самые свежие сверху)."""
+    return {"status": "ok", "items": list_profiles()}
+
+@router.get("/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+def download_profile(profile_id: str, format: str = "speedscope"):
+    """
+    Профиль запроса:
+    - format=speedscope — JSON для https://www.speedscope.app
+    - format=collapsed  — collapsed stacks для flamegraph.pl / inferno
+    """
+    session = get_profile_session(profile_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    if format == "collapsed":
+        return PlainTextResponse(
+            render_collapsed(session),
+            headers={"Content-Disposition": f'attachment; filename="{profile_id}.folded"'}
+        )
+    if format != "speedscope":
+        raise HTTPException(status_code=400, detail="format must be 'speedscope' or 'collapsed'")
+    return Response(
+        content=render_speedscope(session),
+        media_type="application/json",
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.speedscope.json"'}
+    )
@@ -0,0 +1,62 @@
+# backend/app/api/alerts.py
+import asyncio
+import json
+from typing import Optional
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.database import get_async_db
+from ..db.models import TrendAlert
+from ..services.detector import detector, alert_to_dict
+
+router = APIRouter()
+
+HEARTBEAT_SECONDS = 15
+
+@router.get("")
+async def list_alerts(
+    vertical: Optional[str] = None, since_id: int = 0, limit: int = 50,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Без since_id — последние limit алертов (новые первыми).
+    С since_id — догрузка после переподключения: по возрастанию id, следующую страницу берем с последнего полученного id,
+    иначе при разрыве дольше limit алертов старые из пропущенных потерялись бы.
+    """
+    query = select(TrendAlert).where(TrendAlert.id > since_id)
+    if vertical:
+        query = query.where(TrendAlert.vertical == vertical)
+    order = TrendAlert.id.asc() if since_id else TrendAlert.id.desc()
+    rows = (await db.execute(query.order_by(order).limit(min(limit, 500)))).scalars().all()
+    return {"status": "ok", "items": [alert_to_dict(a) for a in rows]}
+
+@router.get("/stream")
+async def stream_alerts(request: Request, vertical: Optional[str] = None):
+    """
+    Push алертов через Server-Sent Events (EventSource на фронте).
+    Раз в 15 сек шлем комментарий-heartbeat, чтобы прокси не рвали соединение.
+    """
+    sub = detector.subscribe()
+
+    async def events():
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    alert = await asyncio.wait_for(sub.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if vertical and alert["vertical"] != vertical:
+                    continue
+                yield f"id: {alert['id']}\nevent: alert\ndata: {json.dumps(alert, ensure_ascii=False)}\n\n"
+        finally:
+            detector.unsubscribe(sub)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@router.get("/baselines")
+def get_baselines():
+    """Текущие онлайн-базлайны скорости по вертикалям (в памяти детектора)."""
+    return {"status": "ok", "items": detector.baselines_snapshot()}
@@ -0,0 +1,34 @@
+# backend/app/api/export.py
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from ..services.export import export_stream, export_filename, resolve_columns, ExportError, FORMATS
+from .admin import require_admin
+
+router = APIRouter()
+
+@router.get("/{dataset}", dependencies=[Depends(require_admin)])
+async def export_dataset(
+    dataset: str, format: str = "parquet", columns: Optional[str] = None, vertical: Optional[str] = None,
+    since: Optional[datetime] = None, until: Optional[datetime] = None
+):
+    """
+    Потоковая выгрузка датасета (trends | snapshots | profiles | competitor_videos | alerts)
+    в Parquet (zstd) или Arrow IPC stream. columns — проекция через запятую;
+    vertical / since / until — фильтры. Читается серверным курсором, в памяти — одна порция.
+    """
+    projection = [c.strip() for c in (columns or "").split(",") if c.strip()] or None
+    try:
+        # Валидируем до начала стрима: после первых байт HTTP-статус уже не поменять
+        if format not in FORMATS:
+            raise ExportError(f"format: {', '.join(FORMATS)}")
+        resolve_columns(dataset, projection)
+    except ExportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return StreamingResponse(
+        export_stream(dataset, format, projection, vertical, since, until),
+        media_type=FORMATS[format][0],
+        headers={"Content-Disposition": f'attachment; filename="{export_filename(dataset, format)}"'}
+    )
@@ -0,0 +1,29 @@
+# backend/app/api/leaderboards.py
+from typing import Optional
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.database import get_async_db
+from ..services.leaderboards import read_leaderboard, list_leaderboards, rebuild_leaderboards
+from .admin import require_admin
+
+router = APIRouter()
+
+@router.get("")
+async def get_leaderboards(vertical: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
+    """Какие топы уже посчитаны (по вертикалям)."""
+    return {"status": "ok", "items": await list_leaderboards(db, vertical)}
+
+@router.post("/rebuild", dependencies=[Depends(require_admin)])
+async def rebuild(db: AsyncSession = Depends(get_async_db)):
+    """Полная пересборка топов из trends (обычно не нужна: топы обновляются инкрементально)."""
+    return {"status": "ok", "trends": await rebuild_leaderboards(db)}
+
+@router.get("/{vertical}")
+async def get_leaderboard(
+    vertical: str, limit: int = 50, db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Предрасчитанный топ вертикали по UTS.
+    Без ILIKE-скана trends: короткая выборка по индексу, обновляется Deep Scan'ом и рескан-задачей.
+    """
+    return {"status": "ok", "items": await read_leaderboard(db, vertical, limit)}
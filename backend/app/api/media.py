@@ -0,0 +1,57 @@
+# backend/app/api/media.py
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.config import settings
+from ..core.database import get_async_db
+from ..db.models import Trend, CompetitorVideo
+from ..services.media_cache import media_cache, SIZES, FORMATS
+
+router = APIRouter()
+
+async def _source_url(db: AsyncSession, platform_id: str) -> Optional[str]:
+    """URL обложки на CDN: live-выдача (память) -> trends -> competitor_videos."""
+    url = media_cache.known_url(platform_id)
+    if url:
+        return url
+    url = (await db.execute(select(Trend.cover_url).where(Trend.platform_id == platform_id))).scalar()
+    if url:
+        return url
+    return (await db.execute(
+        select(CompetitorVideo.cover_url).where(CompetitorVideo.platform_id == platform_id).limit(1)
+    )).scalar()
+
+@router.get("/cover/{platform_id}")
+async def get_cover(
+    platform_id: str, request: Request, size: str = "thumb", format: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Обложка видео через наш кэш: одна загрузка с CDN, миниатюра фиксированного размера,
+    WebP (если браузер принимает) или JPEG, долгий Cache-Control.
+    """
+    if size not in SIZES:
+        raise HTTPException(status_code=400, detail=f"size: {', '.join(SIZES)}")
+    if format and format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format: {', '.join(FORMATS)}")
+    fmt = format or ("webp" if "image/webp" in request.headers.get("accept", "") else "jpeg")
+
+    # Кэш-хит не ходит ни в БД, ни на CDN
+    found = await asyncio.to_thread(media_cache.variant, platform_id, size, fmt)
+    if found is None:
+        url = await _source_url(db, platform_id)
+        if url:
+            found = await asyncio.to_thread(media_cache.variant, platform_id, size, fmt, url)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Обложка недоступна")
+
+    path, etag = found
+    headers = {"Cache-Control": f"public, max-age={settings.MEDIA_CACHE_MAX_AGE}", "ETag": f'"{etag}"'}
+    if not format:
+        headers["Vary"] = "Accept"
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=FORMATS[fmt], headers=headers)
@@ -1,99 +1,73 @@
 # backend/app/api/profiles.py
-from fastapi import APIRouter, HTTPException
-from ..services.collector import TikTokCollector
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.database import get_async_db
+from ..services.profile_analytics import get_cached_profile
 from ..services.scorer import TrendScorer
 
 router = APIRouter()
 scorer = TrendScorer()
 
-def get_universal_val(item: dict, keys: list, default=0):
-    """Извлекает значения из разных форматов ответа TikTok (stats или корень)."""
-    stats = item.get("stats") or {}
-    for k in keys:
-        val = item.get(k) or stats.get(k)
-        if val is not None:
-            try: return int(val)
-            except: return val
-    return default
-
-def get_universal_cover(item: dict) -> str:
-    """Обеспечивает корректный формат обложек видео и аватаров."""
-    v = item.get("video") or item.get("videoMeta") or {}
-    cover = (
-        v.get("coverUrl") or v.get("cover") or v.get("origin_cover") or 
-        item.get("coverUrl") or item.get("cover") or v.get("thumbnail") or ""
-    )
-    # Заменяем формат heic на jpeg для совместимости с браузерами
-    return cover.replace(".heic", ".jpeg") if ".heic" in cover else cover
+def report_video(v: dict) -> dict:
+    """Видео из кэша Spy Mode -> формат аудита профиля (stats: likes/comments/shares/bookmarks, как и раньше)."""
+    stats = v.get("stats") or {}
+    return {
+        "id": v.get("id"),
+        "url": v.get("url"),
+        "title": v.get("title") or "Без описания",
+        "cover_url": v.get("cover_url"),
+        "cover_proxy": v.get("cover_proxy"),
+        "views": v.get("views", 0),
+        "uts_score": v.get("uts_score", 0),
+        "stats": {
+            "likes": stats.get("diggCount", 0),
+            "comments": stats.get("commentCount", 0),
+            "shares": stats.get("shareCount", 0),
+            "bookmarks": stats.get("collectCount", 0),
+        },
+        "uploaded_at": v.get("uploaded_at", 0),
+    }
 
 @router.get("/{username}")
-async def get_unified_profile_report(username: str):
+async def get_unified_profile_report(username: str, background_tasks: BackgroundTasks, live: bool = False, db: AsyncSession = Depends(get_async_db)):
     """
-    Проводит глубокий аудит профиля в реальном времени.
-    ДАННЫЕ НЕ СОХРАНЯЮТСЯ В БД (100% Live) для экономии места.
+    Аудит профиля. Основной путь — кэш ProfileData (тот же, что у Spy Mode):
+    свежие данные отдаются одним SELECT, устаревшие — сразу, с обновлением в фоне.
+    live=true — принудительный парсинг в реальном времени.
     """
     clean_username = username.lower().strip().replace("@", "")
-    collector = TikTokCollector()
     
-    # 1. Запрос свежих данных из TikTok (последние 30 видео)
-    raw_videos = collector.collect([clean_username], limit=30, mode="profile")
+    profile, cache_status = await get_cached_profile(db, clean_username, background_tasks, force_refresh=live)
     
-    if not raw_videos:
+    if not profile:
         raise HTTPException(status_code=404, detail="Профиль не найден или закрыт")
 
-    # 2. Получение данных об авторе из первого видео
-    first_item = raw_videos[0]
-    channel = first_item.get("channel") or first_item.get("authorMeta") or {}
-    followers = int(get_universal_val(first_item, ["followers", "fans", "followerCount"], default=1))
+    channel = profile.channel_data or {}
+    followers = int(channel.get("fans") or 1)
+    full_feed = [report_video(v) for v in profile.latest_videos or []]
     
-    full_feed = []
-    for v in raw_videos:
-        views = get_universal_val(v, ["playCount", "views"])
-        likes = get_universal_val(v, ["diggCount", "likes"])
-        bookmarks = get_universal_val(v, ["collectCount", "bookmarks"])
-        shares = get_universal_val(v, ["shareCount", "shares"])
-        
-        # Расчет UTS как "снимка" (насколько видео успешно относительно подписчиков сейчас)
-        uts = scorer.calculate_uts(
-            {"views": views, "author_followers": followers, "collect_count": bookmarks, "share_count": shares}
-        )
-        
-        full_feed.append({
-            "id": v.get("id"),
-            "url": v.get("postPage") or v.get("webVideoUrl") or v.get("url"),
-            "title": v.get("title") or v.get("desc") or "Без описания",
-            "cover_url": get_universal_cover(v),
-            "views": views,
-            "uts_score": uts,
-            "stats": {"likes": likes, "comments": 0, "shares": shares, "bookmarks": bookmarks},
-            "uploaded_at": v.get("uploadedAt") or v.get("createTime") or 0
-        })
-
-    # 3. Расчет общих метрик эффективности аккаунта
-    total_views = sum(v["views"] for v in full_feed)
-    total_eng = sum(v["stats"]["likes"] + v["stats"]["bookmarks"] + v["stats"]["shares"] for v in full_feed)
-    
-    # Engagement Rate (ER)
-    er = round((total_eng / (total_views + 1) * 100), 2)
-    
-    # Анализ виральности и стабильности через скорер
-    efficiency = scorer.analyze_profile_efficiency(full_feed)
+    # Анализ виральности и стабильности через скорер (подписчики нужны для Viral Lift)
+    efficiency = scorer.analyze_profile_efficiency(
+        [{"views": v.get("views", 0), "author_followers": followers} for v in full_feed]
+    )
 
-    # 4. Формирование финального отчета для фронтенда
+    # Формирование финального отчета для фронтенда
     return {
         "author": {
             "username": clean_username,
-            "nickname": channel.get("name") or channel.get("nickName") or clean_username,
-            "avatar": get_universal_cover({"video": {"cover": channel.get("avatar") or channel.get("avatarThumb")}}),
+            "nickname": channel.get("nickName") or clean_username,
+            "avatar": channel.get("avatarThumb"),
             "followers": followers
         },
         "metrics": {
-            "avg_views": int(total_views / len(full_feed)) if full_feed else 0,
-            "engagement_rate": er,
+            "avg_views": int(profile.avg_views or 0),
+            "engagement_rate": profile.engagement_rate,
             "efficiency_score": efficiency.get("efficiency_score", 0),
             "status": efficiency.get("status", "Stable"),
             "avg_viral_lift": efficiency.get("avg_viral_lift", 0)
         },
-        "top_3_hits": sorted(full_feed, key=lambda x: x["views"], reverse=True)[:3],
-        "full_feed": sorted(full_feed, key=lambda x: x["uploaded_at"], reverse=True)
-    }
\ No newline at end of file
+        "top_3_hits": [report_video(v) for v in profile.top_videos or []],
+        "full_feed": full_feed,
+        "cache": cache_status,
+        "updated_at": profile.updated_at
+    }
@@ -2,20 +2,27 @@
 import time
 from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, delete # ✅ Добавлена функция удаления
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import or_, delete, select # ✅ Добавлена функция удаления
 from typing import List, Optional
 from pydantic import BaseModel, Field
 
-from ..core.database import get_db
+from ..core.database import get_async_db
 from ..db.models import Trend
 from ..services.collector import TikTokCollector
-from ..services.scorer import TrendScorer
-from ..services.ai import get_image_embedding
-from ..services.clustering import cluster_trends_by_visuals 
+from ..services.filter import ViralContentFilter
+from ..services.deep_scan import run_deep_scan, attribute
+from ..services.relevance import sort_trends
+from ..services.embeddings import load_embeddings, nearest
+from ..services.media_cache import media_cache, cover_proxy_path
+from ..services.phash import phash_index
+from ..services.adapter import fix_tt_url
+from ..core.metrics import stage
+from ..core.admission import admission
 
 # ИМПОРТ ПЛАНИРОВЩИКА
 from ..services.scheduler import scheduler, rescan_videos_task
+from ..services.summarizer import summarize_trends_task
 
 router = APIRouter()
 
@@ -27,6 +34,7 @@ class SearchRequest(BaseModel):
     is_deep: Optional[bool] = False
     time_window: Optional[str] = None
     rescan_hours: int = Field(default=24, ge=1)
+    fan_out: Optional[bool] = True       # Несколько ключей — параллельные запуски актора по ключу
 
 def trend_to_dict(trend: Trend) -> dict:
     return {
@@ -34,12 +42,17 @@ def trend_to_dict(trend: Trend) -> dict:
         "platform_id": trend.platform_id,
         "url": trend.url,
         "cover_url": trend.cover_url,
+        "cover_proxy": cover_proxy_path(trend.platform_id),
         "description": trend.description,
         "author_username": trend.author_username,
         "stats": trend.stats,
         "initial_stats": trend.initial_stats, 
         "uts_score": trend.uts_score,
         "cluster_id": trend.cluster_id,       
+        "similarity_score": trend.similarity_score,
+        "views_per_hour": trend.views_per_hour,
+        "acceleration": trend.acceleration,
+        "ai_summary": trend.ai_summary,
         "music_id": trend.music_id,
         "music_title": trend.music_title,
         "last_scanned_at": trend.last_scanned_at
@@ -47,137 +60,148 @@ def trend_to_dict(trend: Trend) -> dict:
 
 # --- ✅ ЭНДПОИНТ «ПРОЧИТАЛ И УДАЛИЛ» ---
 @router.get("/results")
-def get_saved_results(keyword: str, mode: str = "keywords", db: Session = Depends(get_db)):
+async def get_saved_results(keyword: str, mode: str = "keywords", sort: str = "uts", db: AsyncSession = Depends(get_async_db)):
     """
     Бесплатный поиск по базе данных. 
     Если данные уже прошли рескан (Точка Б), они удаляются сразу после выдачи.
+    sort: "uts" | "similarity" (близость к описанию бизнеса из Deep Scan) | "relevance" (смешанный ключ).
     """
     print(f"📂 DB Buffer Read: ищем '{keyword}' в режиме '{mode}'")
     clean_nick = keyword.lower().strip().replace("@", "")
     
     if mode == "username":
         # СТРОГО: ищем видео, где этот юзер является автором
-        query = db.query(Trend).filter(Trend.author_username.ilike(clean_nick))
+        query = select(Trend).where(Trend.author_username.ilike(clean_nick))
     else:
         # ОБЫЧНЫЙ ПОИСК: по ключевым словам в разных полях
         search_term = f"%{keyword}%"
-        query = db.query(Trend).filter(
+        query = select(Trend).where(
             or_(Trend.description.ilike(search_term), Trend.vertical.ilike(search_term))
         )
     
-    results = query.order_by(Trend.uts_score.desc()).all()
-    data_to_return = [trend_to_dict(t) for t in results]
+    if sort == "similarity":
+        query = query.order_by(Trend.similarity_score.desc().nulls_last(), Trend.uts_score.desc())
+    else:
+        query = query.order_by(Trend.uts_score.desc())
+    results = (await db.execute(query)).scalars().all()
+    if sort == "relevance":
+        results = sort_trends(results, "relevance")
+    with stage("serialization", mode="saved", items=len(results)):
+        data_to_return = [trend_to_dict(t) for t in results]
 
     # ✅ САМООЧИСТКА: Удаляем записи, если сверка уже завершена (есть дата последнего скана)
     ids_to_clean = [t.id for t in results if t.last_scanned_at is not None]
     
     if ids_to_clean:
-        db.execute(delete(Trend).where(Trend.id.in_(ids_to_clean)))
-        db.commit()
+        await db.execute(delete(Trend).where(Trend.id.in_(ids_to_clean)))
+        await db.commit()
+        phash_index.remove(ids_to_clean)  # Их эмбеддинги ушли каскадом — дубли больше не на что вести
         print(f"🧹 БД Очищена: Удалено {len(ids_to_clean)} временных записей после выдачи.")
 
     return {"status": "ok", "items": data_to_return}
 
+@router.get("/{trend_id}/similar")
+async def get_similar_trends(trend_id: int, k: int = 10, same_vertical: bool = False, db: AsyncSession = Depends(get_async_db)):
+    """Визуально похожие видео (CLIP обложек): ANN-кандидаты + точный пересчет косинуса."""
+    trend = await db.get(Trend, trend_id)
+    vector = (await load_embeddings(db, [trend_id])).get(trend_id) if trend else None
+    if vector is None:
+        raise HTTPException(status_code=404, detail="Нет эмбеддинга для этого видео")
+
+    k = max(1, min(k, 100))
+    hits = await nearest(db, vector, k=k, vertical=trend.vertical if same_vertical else None, exclude_id=trend_id)
+    found = {t.id: t for t in (await db.execute(select(Trend).where(Trend.id.in_([i for i, _ in hits])))).scalars().all()}
+    items = []
+    for hit_id, score in hits:
+        if hit_id in found:
+            items.append({**trend_to_dict(found[hit_id]), "visual_similarity": score})
+    return {"status": "ok", "items": items}
+
 @router.post("/search")
-def search_trends(req: SearchRequest, db: Session = Depends(get_db)):
-    """Deep Scan + Auto Rescan Scheduler (Point A Setup)"""
+async def search_trends(req: SearchRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    Deep Scan + Auto Rescan Scheduler (Point A Setup).
+    Под admission control: при перегрузке — 429/503 с Retry-After (см. core/admission.py).
+    """
+    async with admission.admit("deep_scan" if req.is_deep else "live_scrape"):
+        return await _search(req, db)
+
+async def _search(req: SearchRequest, db: AsyncSession):
     search_targets = [req.target] if req.target else req.keywords
     if not search_targets or not search_targets[0]:
         return {"status": "error", "message": "No query provided"}
 
-    print(f"🔎 API Search [{req.mode}]: {search_targets} (Deep: {req.is_deep})")
+    print(f"🔎 API Search [{req.mode}]: {search_targets} (Deep: {req.is_deep}, Fan-out: {req.fan_out and len(search_targets) > 1})")
     
     collector = TikTokCollector()
-    
-    # 1. ВСЕГДА ПЕРВЫМ ДЕЛОМ LIVE ПАРСИНГ
-    if req.mode == "username":
-        limit = 20
-        raw_items = collector.collect(search_targets, limit=limit, mode="profile", is_deep=True)
-    else:
-        limit = 50 if req.is_deep else 20
-        raw_items = collector.collect(search_targets, limit=limit, mode="search", is_deep=req.is_deep)
-    
-    if not raw_items:
-        return {"status": "empty", "items": []}
 
-    # 2. ПРЕДВАРИТЕЛЬНАЯ ФИЛЬТРАЦИЯ
-    clean_items = []
-    if req.mode == "username":
-        clean_items = raw_items # Для юзера берем всё без исключений
-    else:
-        # Для ключевых слов оставляем популярные
-        for item in raw_items:
-            v_count = int(item.get("views") or (item.get("stats") or {}).get("playCount") or 0)
-            if v_count >= 5000: clean_items.append(item)
+    # --- ✅ РЕЖИМ 2: DEEP SCAN (конвейер: сбор -> фильтр -> дедуп -> БД -> эмбеддинги -> кластеры -> UTS) ---
+    if req.is_deep:
+        processed_trends_objects = await run_deep_scan(
+            db, search_targets, mode=req.mode, fan_out=req.fan_out, collector=collector, business_desc=req.business_desc
+        )
+        if not processed_trends_objects:
+            return {"status": "empty", "items": []}
+        return _finish_deep_scan(processed_trends_objects)
 
     # --- ✅ РЕЖИМ 1: ТРЕНДЫ (РАБОТАЕМ БЕЗ БАЗЫ ДАННЫХ) ---
-    if not req.is_deep:
-        live_results = []
-        for item in clean_items:
-            v_meta = item.get("video") or item.get("videoMeta") or {}
-            live_results.append({
-                "url": item.get("postPage") or item.get("url") or item.get("webVideoUrl"),
-                "cover_url": (v_meta.get("coverUrl") or item.get("coverUrl") or "").replace(".heic", ".jpeg"),
-                "description": item.get("title") or item.get("desc") or "No desc",
-                "author_username": (item.get("channel") or item.get("authorMeta") or {}).get("username") or "unknown",
-                "stats": {"playCount": int(item.get("views") or (item.get("stats") or {}).get("playCount") or 0)},
-                "uts_score": 0
-            })
-        return {"status": "ok", "items": live_results}
-
-    # --- ✅ РЕЖИМ 2: DEEP SCAN (ИСПОЛЬЗУЕМ ВРЕМЕННЫЙ БУФЕР БД) ---
-    scorer = TrendScorer()
-    processed_trends_objects = [] 
-    cascade_total = len(clean_items)
-
-    for item in clean_items:
-        p_id = str(item.get("id"))
-        video_url = item.get("postPage") or item.get("url") or item.get("webVideoUrl")
-        views_now = int(item.get("views") or (item.get("stats") or {}).get("playCount") or 0)
-        current_stats = {"playCount": views_now}
-
-        existing_video = db.query(Trend).filter(or_(Trend.platform_id == p_id, Trend.url == video_url)).first()
-
-        try:
-            if existing_video:
-                # ✅ Сброс Точки А при новом сканировании (храним временно для сверки)
-                existing_video.initial_stats = current_stats 
-                existing_video.stats = current_stats
-                existing_video.last_scanned_at = None # Обнуляем, чтобы рескан поставил новую метку
-                db.add(existing_video)
-                processed_trends_objects.append(existing_video)
-            else:
-                # Создаем новую запись «буфера»
-                new_trend = Trend(
-                    platform_id=p_id, url=video_url, 
-                    cover_url=(item.get("video", {}).get("coverUrl") or "").replace(".heic", ".jpeg"),
-                    description=item.get("title") or "No desc",
-                    stats=current_stats, initial_stats=current_stats,
-                    author_username=(item.get("channel") or {}).get("username") or "unknown",
-                    uts_score=0, vertical=search_targets[0] or "deep_scan",
-                    last_scanned_at=None
-                )
-                db.add(new_trend)
-                processed_trends_objects.append(new_trend)
-            db.commit()
-        except: db.rollback()
-
-    # 3. КЛАСТЕРИЗАЦИЯ (Только для Deep Scan)
-    if req.is_deep and processed_trends_objects:
-        processed_trends_objects = cluster_trends_by_visuals(processed_trends_objects)
-        for t in processed_trends_objects: db.add(t)
-        try: db.commit()
-        except: db.rollback()
+    viral_filter = ViralContentFilter(mode="profile" if req.mode == "username" else "live")
+    live_results = []
+    seen = {}  # platform_id -> результат — дедуп между ключами
+    got_any = False
+
+    # 1. ВСЕГДА ПЕРВЫМ ДЕЛОМ LIVE ПАРСИНГ (батчами: по одному на ключ при fan-out)
+    async for keyword, raw_items in collector.stream(search_targets, mode=req.mode, is_deep=False, fan_out=req.fan_out):
+        if not raw_items:
+            continue
+        got_any = True
+
+        # 2. ПРЕДВАРИТЕЛЬНАЯ ФИЛЬТРАЦИЯ (колоночно; для юзера берем всё)
+        clean_items = viral_filter.filter_content(raw_items)
+
+        with stage("normalization", mode="live") as span:
+            for item in clean_items:
+                p_id = str(item.get("id"))
+                if p_id in seen:
+                    seen[p_id]["vertical"] = attribute(seen[p_id]["vertical"], keyword)
+                    continue
+                v_meta = item.get("video") or item.get("videoMeta") or {}
+                cover_url = fix_tt_url(v_meta.get("coverUrl") or item.get("coverUrl"))
+                media_cache.remember(p_id, cover_url)  # Live-видео нет в БД: прокси найдет URL в памяти
+                live_item = {
+                    "platform_id": p_id,
+                    "url": item.get("postPage") or item.get("url") or item.get("webVideoUrl"),
+                    "cover_url": cover_url,
+                    "cover_proxy": cover_proxy_path(p_id) if cover_url else None,
+                    "description": item.get("title") or item.get("desc") or "No desc",
+                    "author_username": (item.get("channel") or item.get("authorMeta") or {}).get("username") or "unknown",
+                    "stats": {"playCount": int(item.get("views") or (item.get("stats") or {}).get("playCount") or 0)},
+                    "vertical": keyword,
+                    "uts_score": 0
+                }
+                seen[p_id] = live_item
+                live_results.append(live_item)
+            span.items = len(clean_items)
+
+    if not got_any:
+        return {"status": "empty", "items": []}
+    return {"status": "ok", "items": live_results}
 
+def _finish_deep_scan(processed_trends_objects: list) -> dict:
+    """Планирование рескана (Точка Б) и суммаризации + выдача результата Deep Scan."""
     # 4. ПЛАНИРОВАНИЕ СВЕРКИ (2 МИНУТЫ ТЕСТ)
-    if req.is_deep and processed_trends_objects:
-        saved_urls = [t.url for t in processed_trends_objects if t.url]
-        if saved_urls:
-            run_date = datetime.now() + timedelta(minutes=2) 
-            scheduler.add_job(
-                rescan_videos_task, 'date', run_date=run_date, 
-                args=[saved_urls, f"batch_{int(time.time())}"]
-            )
-            print(f"⏱️ ЗАДАЧА СВЕРКИ ОТПРАВЛЕНА: Запуск через 2 минуты.")
-
-    return {"status": "ok", "items": [trend_to_dict(t) for t in processed_trends_objects]}
\ No newline at end of file
+    saved_urls = [t.url for t in processed_trends_objects if t.url]
+    if saved_urls:
+        run_date = datetime.now() + timedelta(minutes=2) 
+        scheduler.add_job(
+            rescan_videos_task, 'date', run_date=run_date, 
+            args=[saved_urls, f"batch_{int(time.time())}"]
+        )
+        print(f"⏱️ ЗАДАЧА СВЕРКИ ОТПРАВЛЕНА: Запуск через 2 минуты.")
+
+    # Суть трендов по кластерам — фоном, чтобы не держать ответ на LLM
+    scheduler.add_job(summarize_trends_task, 'date', run_date=datetime.now(), args=[[t.id for t in processed_trends_objects]])
+
+    with stage("serialization", mode="deep", items=len(processed_trends_objects)):
+        items = [trend_to_dict(t) for t in processed_trends_objects]
+    return {"status": "ok", "items": items}
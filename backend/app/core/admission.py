@@ -0,0 +1,222 @@
+# backend/app/core/admission.py
+# Admission control: сколько тяжелых операций (live-скрейп, Deep Scan, CLIP) идет одновременно —
+# глобально и на одного клиента, — с честной очередью между клиентами и быстрым отказом при перегрузке.
+# Лучше сразу ответить 429/503 с Retry-After, чем принять всё и уронить пул БД и event loop.
+#
+# Клиент — X-Client-Id (ключ агентства/интеграции) или IP; ставится middleware в contextvar,
+# поэтому admit() работает и глубоко в сервисах (и в фоновых задачах — там клиент "local").
+import asyncio
+import contextvars
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Dict
+
+from prometheus_client import Counter, Gauge
+
+from .config import settings
+
+ADMISSION_ACTIVE = Gauge("trendscout_admission_active", "Выполняющиеся операции", ["op"])
+ADMISSION_QUEUED = Gauge("trendscout_admission_queued", "Операции в очереди на допуск", ["op"])
+ADMISSION_REJECTED = Counter(
+    "trendscout_admission_rejected_total", "Отказы admission control", ["op", "reason"]
+)
+
+current_client = contextvars.ContextVar("admission_client", default="local")
+
+class AdmissionRejected(Exception):
+    """status_code: 429 — превышена квота клиента, 503 — сервис перегружен. retry_after — секунды."""
+
+    def __init__(self, op: str, status_code: int, retry_after: int, reason: str):
+        super().__init__(f"{op}: {reason}")
+        self.op = op
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class OperationGate:
+    """
+    Лимиты одного класса операций:
+      limit       — одновременно во всем процессе,
+      per_client  — одновременно у одного клиента (еще столько же может ждать в очереди),
+      queue       — всего ждущих; сверх — 503 сразу,
+      timeout     — максимум ожидания в очереди, сек; если оценка ожидания больше — 503 сразу.
+    Очередь честная: у каждого клиента своя, слоты раздаются по кругу между клиентами.
+    """
+
+    def __init__(self, op: str, limit: int, per_client: int, queue: int, timeout: float):
+        self.op = op
+        self.limit = max(limit, 1)
+        self.per_client = max(per_client, 1)
+        self.max_queue = queue
+        self.timeout = timeout
+        self.active = 0
+        self.active_by_client: Dict[str, int] = {}
+        self.waiting: "OrderedDict[str, deque]" = OrderedDict()  # клиент -> его ждущие future (порядок = круг)
+        self.queued = 0
+        self.hold_ewma = 1.0  # Сглаженная длительность операции, сек (для Retry-After)
+
+    # --- Оценки ---
+    def estimated_wait(self) -> float:
+        return self.hold_ewma * (self.queued + 1) / self.limit
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self.estimated_wait()))
+
+    def _reject(self, status_code: int, reason: str):
+        ADMISSION_REJECTED.labels(self.op, reason).inc()
+        raise AdmissionRejected(self.op, status_code, self._retry_after(), reason)
+
+    def _can_run(self, client: str) -> bool:
+        return self.active < self.limit and self.active_by_client.get(client, 0) < self.per_client
+
+    def _grant(self, client: str):
+        self.active += 1
+        self.active_by_client[client] = self.active_by_client.get(client, 0) + 1
+        ADMISSION_ACTIVE.labels(self.op).set(self.active)
+
+    def _update_queue_gauge(self):
+        ADMISSION_QUEUED.labels(self.op).set(self.queued)
+
+    # --- Допуск ---
+    async def acquire(self, client: str):
+        if not self.waiting and self._can_run(client):
+            self._grant(client)
+            return
+
+        client_queue = self.waiting.get(client)
+        in_flight = self.active_by_client.get(client, 0) + (len(client_queue) if client_queue else 0)
+        if in_flight >= self.per_client * 2:
+            self._reject(429, "client_quota")
+        if self.queued >= self.max_queue:
+            self._reject(503, "queue_full")
+        if self.estimated_wait() > self.timeout:
+            self._reject(503, "overloaded")
+
+        future = asyncio.get_running_loop().create_future()
+        self.waiting.setdefault(client, deque()).append(future)
+        self.queued += 1
+        self._wake()  # Свободный слот мог простаивать: ждущие впереди упирались в свой per_client
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                return  # Слот выдан в момент таймаута — пользуемся им
+            self._drop_waiter(client, future)
+            self._reject(503, "queue_timeout")
+        except asyncio.CancelledError:
+            # Клиент отвалился: если слот уже выдан — возвращаем его, иначе просто уходим из очереди
+            if future.done() and not future.cancelled():
+                self.release(client, 0)
+            else:
+                self._drop_waiter(client, future)
+            raise
+
+    def _drop_waiter(self, client: str, future):
+        client_queue = self.waiting.get(client)
+        if client_queue and future in client_queue:
+            client_queue.remove(future)
+            self.queued -= 1
+            if not client_queue:
+                del self.waiting[client]
+            self._update_queue_gauge()
+        future.cancel()
+
+    def release(self, client: str, held: float):
+        self.active -= 1
+        left = self.active_by_client.get(client, 1) - 1
+        if left:
+            self.active_by_client[client] = left
+        else:
+            self.active_by_client.pop(client, None)
+        if held:
+            self.hold_ewma += 0.2 * (held - self.hold_ewma)
+        ADMISSION_ACTIVE.labels(self.op).set(self.active)
+        self._wake()
+
+    def _wake(self):
+        """Раздает свободные слоты ждущим по кругу: клиент получил слот — уходит в конец круга."""
+        progressed = True
+        while self.active < self.limit and self.waiting and progressed:
+            progressed = False
+            for client in list(self.waiting):
+                if self.active >= self.limit:
+                    break
+                if self.active_by_client.get(client, 0) >= self.per_client:
+                    continue
+                client_queue = self.waiting[client]
+                future = client_queue.popleft()
+                self.queued -= 1
+                if not client_queue:
+                    del self.waiting[client]
+                else:
+                    self.waiting.move_to_end(client)
+                if future.cancelled():
+                    continue
+                self._grant(client)
+                future.set_result(True)
+                progressed = True
+        self._update_queue_gauge()
+
+    def snapshot(self) -> dict:
+        return {
+            "op": self.op, "active": self.active, "limit": self.limit, "per_client": self.per_client,
+            "queued": self.queued, "max_queue": self.max_queue, "clients_waiting": len(self.waiting),
+            "hold_ewma_s": round(self.hold_ewma, 2),
+        }
+
+
+class AdmissionController:
+    def __init__(self, config: dict = None):
+        config = config or settings.ADMISSION
+        self.gates = {op: OperationGate(op, **limits) for op, limits in config.items()}
+
+    @asynccontextmanager
+    async def admit(self, op: str, client: str = None):
+        """async with admission.admit("deep_scan"): ... — или AdmissionRejected (429/503)."""
+        gate = self.gates.get(op)
+        if gate is None or not settings.ADMISSION_ENABLED:
+            yield
+            return
+        client = client or current_client.get()
+        await gate.acquire(client)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            gate.release(client, time.monotonic() - started)
+
+    def snapshot(self) -> list:
+        return [g.snapshot() for g in self.gates.values()]
+
+admission = AdmissionController()
+
+
+def _client_from_scope(scope) -> str:
+    for key, value in scope.get("headers") or []:
+        if key == b"x-client-id" and value:
+            return "id:" + value.decode("latin-1")[:64]
+    client = scope.get("client")
+    return f"ip:{client[0]}" if client else "local"
+
+class AdmissionClientMiddleware:
+    """
+    ASGI-middleware: кладет идентификатор клиента в contextvar на время запроса.
+    X-Client-Id не аутентифицирован: он делит квоту между честными клиентами,
+    а от перебора id защищают глобальные лимиты и длина очереди.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = current_client.set(_client_from_scope(scope))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_client.reset(token)
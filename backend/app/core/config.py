@@ -18,6 +18,134 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     # ===================================================
 
+    # Бэкенд коллектора: "apify" (боевой), "replay" (офлайн-фикстуры), "record" (apify + запись фикстур)
+    COLLECTOR_BACKEND: str = "apify"
+    COLLECTOR_FIXTURES_DIR: str = ""          # Пусто = backend/fixtures/apify
+    REPLAY_LATENCY_MS: int = 0                # Имитация старта актора
+    REPLAY_ITEM_LATENCY_MS: float = 0.0       # Имитация выгрузки датасета (на одну запись)
+    REPLAY_ITEMS: int = 0                     # 0 = столько, сколько просили в maxItems
+
+    # Наблюдаемость: печатать logfmt-строку на каждый тайминг-спан стадии
+    LOG_SPANS: bool = True
+
+    # Профилирование запросов (pyinstrument): заголовок X-Profile + X-Admin-Token или случайная выборка
+    ADMIN_TOKEN: str = ""                     # Пусто = админка и профилирование по заголовку выключены
+    PROFILE_SAMPLE_RATE: float = 0.0          # Доля запросов, профилируемых автоматически (0.01 = 1%)
+    PROFILE_INTERVAL_MS: float = 1.0          # Интервал сэмплирования
+    PROFILE_STORE_SIZE: int = 50              # Сколько последних профилей держать в памяти
+    PROFILE_PATH_PREFIXES: list = ["/api/trends", "/api/profiles", "/api/competitors"]
+
+    # Поиск по нескольким ключам: параллельные запуски актора (по одному на ключ)
+    SEARCH_FANOUT_CONCURRENCY: int = 4
+
+    # Индекс уже виденных видео (bloom-фильтр по trends.platform_id, перестраивается при старте)
+    DEDUP_BLOOM_CAPACITY: int = 1_000_000
+    DEDUP_BLOOM_FP_RATE: float = 0.01
+
+    # Суть трендов от Claude (по кластеру, фоном после Deep Scan)
+    AI_SUMMARY_MODEL: str = "claude-3-5-haiku-20241022"
+    SUMMARY_CLIENT: str = "anthropic"         # "anthropic" или "stub" (локальная заглушка без сети)
+    SUMMARY_MODE: str = "async"               # "async" — параллельные запросы, "batch" — Message Batches API
+    SUMMARY_CONCURRENCY: int = 4
+    SUMMARY_BATCH_MIN: int = 20               # Меньше промптов — batch не имеет смысла, идем обычными запросами
+    SUMMARY_BATCH_TIMEOUT: int = 1800         # Сек; batch не закончился — отменяем и досчитываем обычными запросами
+    SUMMARY_NOISE_LIMIT: int = 5              # Сколько видео вне кластеров суммаризировать поштучно
+
+    # Исходящие вызовы (core/outbound.py): лимиты на провайдера, ретраи, circuit breaker
+    OUTBOUND_POOL_SIZE: int = 32              # keep-alive соединений на хост
+    OUTBOUND_MAX_RETRIES: int = 3
+    OUTBOUND_BACKOFF_BASE: float = 0.5        # сек; задержка = random(0, base * 2^попытка)
+    OUTBOUND_BACKOFF_MAX: float = 20.0
+    OUTBOUND_BREAKER_FAILURES: int = 5        # ошибок подряд до размыкания
+    OUTBOUND_BREAKER_RESET_SECONDS: float = 30.0
+    OUTBOUND_LIMITS: dict = {
+        "images": {"rate": 20, "burst": 40},
+        "apify": {"rate": 2, "burst": 4, "retries": 0},   # ApifyClient сам ретраит HTTP; повтор run = лишние деньги
+        "anthropic": {"rate": 5, "burst": 10},
+    }
+
+    # Скорость роста по снимкам (services/velocity.py)
+    VELOCITY_HALF_LIFE_HOURS: float = 6.0     # Через сколько часов старый отрезок весит вдвое меньше
+    VELOCITY_MAX_POINTS: int = 24             # Сколько последних снимков видео брать в расчет
+
+    # Детектор ранних трендов (онлайн-базлайн скорости по вертикали)
+    DETECTOR_ALPHA: float = 0.05              # Скорость забывания базлайна (≈ последние 1/alpha снимков)
+    DETECTOR_Z_THRESHOLD: float = 3.0
+    DETECTOR_WARMUP: int = 20                 # Снимков в вертикали до первого алерта
+    DETECTOR_QUEUE_SIZE: int = 10_000
+    DETECTOR_COOLDOWN_SIZE: int = 10_000      # Сколько недавно алертнутых видео помнить (без повторов)
+    # Отслеживаемые вертикали: детектор сам сканирует и ресканирует их по расписанию, без участия пользователя
+    DETECTOR_VERTICALS: list = []             # Ключи, напр. DETECTOR_VERTICALS='["cars", "skincare"]'
+    DETECTOR_TRACK_MINUTES: int = 30          # Период задачи отслеживания
+    DETECTOR_TRACK_WINDOW_HOURS: int = 48     # Сколько часов ресканируем найденное видео
+    DETECTOR_TRACK_LIMIT: int = 500           # Максимум видео на рескан за один проход
+
+    # Фильтр виральности перед сохранением (services/filter.py), пороги по режиму
+    VIRAL_FILTER: dict = {
+        "live": {"min_views": 5000},
+        "deep": {
+            "min_views": 5000,
+            "fresh_hours": 48, "fresh_views": 1000,       # Свежий взлет
+            "recent_days": 60, "recent_likes": 1000,      # Уверенный тренд
+            "timeless_views": 100000,                     # Старое, но легендарное
+        },
+        "profile": {},
+    }
+
+    # Конвейер Deep Scan (services/pipeline.py): размер очередей между стадиями и воркеры на стадию
+    PIPELINE_QUEUE_SIZE: int = 8
+    DEEP_SCAN_CONCURRENCY: dict = {"filter": 1, "dedup": 2, "normalize": 2, "embed": 4}  # upsert — всегда 1 (одна сессия)
+    DEEP_SCAN_EMBED: bool = True              # CLIP-эмбеддинги обложек внутри конвейера
+    PHASH_ENABLED: bool = True                # Дубли обложек (dHash) берут эмбеддинг у уже посчитанного видео
+    PHASH_MAX_DISTANCE: int = 4               # Порог Хэмминга из 64 бит (больше — больше ложных склеек)
+
+    # Прокси обложек /api/media/cover/{platform_id}: дисковый кэш оригиналов и миниатюр (LRU)
+    MEDIA_CACHE_DIR: str = ""                 # Пусто = backend/media_cache
+    MEDIA_CACHE_MAX_MB: int = 2048
+    MEDIA_CACHE_MAX_AGE: int = 30 * 24 * 3600  # Cache-Control для браузера/CDN, сек
+    MEDIA_URL_MEMORY: int = 50000             # Сколько URL обложек live-выдачи помнить (их нет в БД)
+
+    # Релевантность бизнесу: вес близости к business_desc в смешанной сортировке (остальное — UTS)
+    RELEVANCE_WEIGHT: float = 0.5
+
+    # Бэкенд CLIP-эмбеддингов: "torch" (исходный), "onnx" (fp32) или "onnx-int8" (динамическая квантизация)
+    EMBEDDING_BACKEND: str = "torch"
+    ONNX_MODEL_DIR: str = ""                  # Пусто = backend/models/clip-onnx
+    ONNX_INTRA_OP_THREADS: int = 4
+
+    # Хранение эмбеддингов (trend_embeddings): "vector" (float32) | "halfvec" (float16, вдвое меньше)
+    # | "int8" (вчетверо меньше, поиск сканом). После смены: python -m app.services.embeddings convert
+    EMBEDDING_STORAGE: str = "vector"
+    EMBEDDING_RESCORE_FACTOR: int = 4        # Кандидатов для точного пересчета: k * factor
+    EMBEDDING_INT8_SCAN_LIMIT: int = 50000   # Сколько последних векторов сканирует int8-поиск
+
+    # Предрасчитанные топы по вертикали / кластеру (/api/leaderboards)
+    LEADERBOARD_SIZE: int = 100
+    LEADERBOARD_MAX_AGE_DAYS: int = 7         # Место в топе без обновлений дольше — выбывает
+
+    # Рейтинг авторов (/api/competitors/ranking)
+    CREATOR_RANKING_WINDOW: int = 50          # Последних видео на профиль
+    CREATOR_RANKING_MAX_PROFILES: int = 2000
+
+    # Выгрузка Parquet / Arrow (/api/export, python -m app.services.export): строк в одной порции курсора
+    EXPORT_CHUNK_ROWS: int = 50000
+
+    # Admission control (core/admission.py): лимиты одновременных тяжелых операций — на процесс и на клиента.
+    # Сверх очереди или при оценке ожидания > timeout — сразу 503 с Retry-After; сверх квоты клиента — 429.
+    ADMISSION_ENABLED: bool = True
+    ADMISSION: dict = {
+        "live_scrape": {"limit": 8, "per_client": 2, "queue": 32, "timeout": 15},
+        "deep_scan": {"limit": 2, "per_client": 1, "queue": 6, "timeout": 30},
+        "embedding": {"limit": 4, "per_client": 4, "queue": 64, "timeout": 30},
+    }
+    # Пул async-соединений БД: таймаут короче дефолтных 30 сек — при исчерпании лучше быстрый отказ
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 10
+
+    # Кэш профилей (Spy Mode / Audit): сколько минут ProfileData считается свежим
+    PROFILE_CACHE_TTL_MINUTES: int = 360
+
     # Настройки CORS
     BACKEND_CORS_ORIGINS: list = ["http://localhost:3000", "http://127.0.0.1:3000"]
 
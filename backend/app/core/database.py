@@ -1,6 +1,8 @@
 # backend/app/core/database.py
 from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from .config import settings
 
 # 1. Создаем движок (Engine)
@@ -30,4 +32,46 @@ def get_db():
         print(f"❌ Database error in get_db(): {e}")
         raise
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# --- ⚡ ASYNC ДВИЖОК (asyncpg) ДЛЯ API И ПЛАНИРОВЩИКА ---
+def _build_async_url(raw_url: str):
+    """
+    Превращает обычный postgresql:// URL в postgresql+asyncpg://.
+    asyncpg не понимает параметр sslmode (Supabase/Render его добавляют),
+    поэтому выносим его в connect_args.
+    """
+    url = make_url(raw_url.replace("postgres://", "postgresql://", 1))
+    connect_args = {}
+    query = dict(url.query)
+    sslmode = query.pop("sslmode", None)
+    if sslmode and sslmode != "disable":
+        connect_args["ssl"] = "require"
+    url = url.set(drivername="postgresql+asyncpg", query=query)
+    return url, connect_args
+
+_async_url, _async_connect_args = _build_async_url(settings.DATABASE_URL)
+
+async_engine = create_async_engine(
+    _async_url,
+    pool_pre_ping=True,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    connect_args=_async_connect_args,
+    echo=False
+)
+
+# expire_on_commit=False: после commit объекты остаются читаемыми без ленивых запросов
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+async def get_async_db():
+    """Async Dependency: одна AsyncSession на запрос."""
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except Exception as e:
+            await db.rollback()
+            print(f"❌ Database error in get_async_db(): {e}")
+            raise
@@ -0,0 +1,87 @@
+# backend/app/core/metrics.py
+import functools
+import inspect
+import time
+
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+
+from .config import settings
+
+# --- 📈 МЕТРИКИ PROMETHEUS ---
+# Бакеты покрывают и быстрые стадии (сериализация, мс) и запуск актора Apify (десятки секунд)
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+STAGE_SECONDS = Histogram(
+    "trendscout_stage_seconds", "Длительность стадии пайплайна", ["stage"], buckets=STAGE_BUCKETS
+)
+STAGE_ERRORS = Counter(
+    "trendscout_stage_errors_total", "Исключения внутри стадии", ["stage"]
+)
+ITEMS_PROCESSED = Counter(
+    "trendscout_items_processed_total", "Сколько записей прошло через стадию", ["stage"]
+)
+APIFY_RUNS = Counter(
+    "trendscout_apify_runs_total", "Запуски актора Apify", ["mode", "status"]
+)
+STAGES_IN_FLIGHT = Gauge(
+    "trendscout_stages_in_flight", "Стадии, выполняющиеся прямо сейчас", ["stage"]
+)
+
+class stage:
+    """
+    Тайминг-спан стадии: пишет гистограмму, счетчик записей и одну logfmt-строку в лог.
+    Работает как `with`, `async with` и как декоратор (sync и async функции):
+
+        with stage("actor_call", mode="search") as span:
+            ...
+            span.items = len(raw_items)
+    """
+
+    def __init__(self, name: str, items: int = 0, **fields):
+        self.name = name
+        self.items = items
+        self.fields = fields
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        STAGES_IN_FLIGHT.labels(self.name).inc()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        STAGES_IN_FLIGHT.labels(self.name).dec()
+        STAGE_SECONDS.labels(self.name).observe(elapsed)
+        if self.items:
+            ITEMS_PROCESSED.labels(self.name).inc(self.items)
+        if exc_type is not None:
+            STAGE_ERRORS.labels(self.name).inc()
+        if settings.LOG_SPANS:
+            extra = "".join(f" {k}={v}" for k, v in self.fields.items())
+            status = "error" if exc_type else "ok"
+            print(f"⏱️ span={self.name} ms={elapsed * 1000:.1f} items={self.items} status={status}{extra}")
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+    def __call__(self, fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with stage(self.name, **self.fields):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(self.name, **self.fields):
+                return fn(*args, **kwargs)
+        return wrapper
+
+def render_metrics():
+    """Тело и content-type для эндпоинта /metrics."""
+    return generate_latest(), CONTENT_TYPE_LATEST
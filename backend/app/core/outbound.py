@@ -0,0 +1,232 @@
+# backend/app/core/outbound.py
+# Общий слой исходящих вызовов (картинки TikTok CDN, Apify, Anthropic):
+# - пул keep-alive соединений (один requests.Session на процесс),
+# - token bucket на провайдера (общий для потоков и корутин),
+# - ретраи с экспоненциальной задержкой и full jitter (без "стада" одновременных повторов),
+# - circuit breaker: после серии ошибок провайдер временно не дергаем вовсе.
+import asyncio
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from prometheus_client import Counter, Gauge
+
+from .config import settings
+
+RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504, 529}
+
+OUTBOUND_CALLS = Counter(
+    "trendscout_outbound_calls_total", "Исходящие вызовы по провайдерам", ["provider", "status"]
+)
+CIRCUIT_OPEN = Gauge(
+    "trendscout_circuit_open", "1 — circuit breaker провайдера разомкнут", ["provider"]
+)
+
+class OutboundHTTPError(Exception):
+    """Ответ провайдера с плохим статусом (retry_after — из заголовка Retry-After, если был)."""
+
+    def __init__(self, status_code: int, retry_after: Optional[float] = None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+class CircuitOpenError(Exception):
+    pass
+
+def is_retryable(exc: Exception) -> bool:
+    """Сетевые сбои, таймауты и 429/5xx (в т.ч. исключения SDK Anthropic со status_code)."""
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return True
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUSES
+    return type(exc).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+class TokenBucket:
+    """rate токенов в секунду, не больше burst подряд. Потокобезопасный."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Берет токен в долг и возвращает, сколько ждать до его появления."""
+        if self.rate <= 0:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self):
+        wait = self._reserve()
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        wait = self._reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+
+class CircuitBreaker:
+    """closed -> (failures подряд) -> open -> (reset_seconds) -> half-open: одна пробная попытка."""
+
+    def __init__(self, name: str, failures: int, reset_seconds: float):
+        self.name = name
+        self.threshold = failures
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_seconds:
+                # half-open: пропускаем одну попытку, следующие ждут ее результата
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            if self.opened_at is not None:
+                print(f"🔌 Circuit '{self.name}': снова замкнут.")
+            self.opened_at = None
+        CIRCUIT_OPEN.labels(self.name).set(0)
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            tripped = self.failures >= self.threshold
+            if tripped:
+                if self.opened_at is None:
+                    print(f"🔌 Circuit '{self.name}': разомкнут после {self.failures} ошибок подряд.")
+                self.opened_at = time.monotonic()
+        if tripped:
+            CIRCUIT_OPEN.labels(self.name).set(1)
+
+
+class Provider:
+    """Политика одного провайдера: лимит, ретраи, breaker. Работает и из потоков, и из корутин."""
+
+    def __init__(self, name: str, rate: float, burst: int, retries: int):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(name, settings.OUTBOUND_BREAKER_FAILURES, settings.OUTBOUND_BREAKER_RESET_SECONDS)
+        self.retries = retries
+
+    def _backoff(self, attempt: int, exc: Exception) -> float:
+        retry_after = getattr(exc, "retry_after", None)
+        if retry_after:
+            return float(retry_after)
+        cap = min(settings.OUTBOUND_BACKOFF_MAX, settings.OUTBOUND_BACKOFF_BASE * (2 ** attempt))
+        return random.uniform(0, cap)  # full jitter
+
+    def _check_open(self):
+        if not self.breaker.allow():
+            OUTBOUND_CALLS.labels(self.name, "circuit_open").inc()
+            raise CircuitOpenError(f"{self.name}: circuit open")
+
+    def _on_error(self, exc: Exception, attempt: int, retries: int) -> Optional[float]:
+        """Учитывает ошибку; возвращает паузу перед повтором или None, если повторять не нужно."""
+        retryable = is_retryable(exc)
+        if retryable:
+            self.breaker.record_failure()
+        OUTBOUND_CALLS.labels(self.name, "retry" if retryable and attempt < retries else "error").inc()
+        if not retryable or attempt >= retries:
+            return None
+        return self._backoff(attempt, exc)
+
+    def call(self, fn: Callable, *args, retries: Optional[int] = None, **kwargs):
+        retries = self.retries if retries is None else retries
+        for attempt in range(retries + 1):
+            self._check_open()
+            self.bucket.acquire()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as exc:
+                pause = self._on_error(exc, attempt, retries)
+                if pause is None:
+                    raise
+                time.sleep(pause)
+                continue
+            self.breaker.record_success()
+            OUTBOUND_CALLS.labels(self.name, "ok").inc()
+            return result
+
+    async def acall(self, fn: Callable, *args, retries: Optional[int] = None, **kwargs):
+        """Как call, но fn — корутинная функция."""
+        retries = self.retries if retries is None else retries
+        for attempt in range(retries + 1):
+            self._check_open()
+            await self.bucket.acquire_async()
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as exc:
+                pause = self._on_error(exc, attempt, retries)
+                if pause is None:
+                    raise
+                await asyncio.sleep(pause)
+                continue
+            self.breaker.record_success()
+            OUTBOUND_CALLS.labels(self.name, "ok").inc()
+            return result
+
+
+_providers: Dict[str, Provider] = {}
+_providers_lock = threading.Lock()
+_session = None
+
+def provider(name: str) -> Provider:
+    """Провайдеры: "images", "apify", "anthropic" — лимиты в settings.OUTBOUND_LIMITS."""
+    with _providers_lock:
+        if name not in _providers:
+            limits = settings.OUTBOUND_LIMITS.get(name, {})
+            _providers[name] = Provider(
+                name,
+                rate=limits.get("rate", 0),
+                burst=limits.get("burst", 1),
+                retries=limits.get("retries", settings.OUTBOUND_MAX_RETRIES),
+            )
+        return _providers[name]
+
+def http_session() -> requests.Session:
+    """Один Session на процесс: keep-alive и пул соединений на хост."""
+    global _session
+    with _providers_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=settings.OUTBOUND_POOL_SIZE, pool_maxsize=settings.OUTBOUND_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers["User-Agent"] = "Mozilla/5.0"
+            _session = session
+        return _session
+
+def _get_bytes(url: str, timeout: float) -> bytes:
+    resp = http_session().get(url, timeout=timeout)
+    if resp.status_code != 200:
+        retry_after = resp.headers.get("Retry-After")
+        raise OutboundHTTPError(resp.status_code, float(retry_after) if retry_after and retry_after.isdigit() else None)
+    return resp.content
+
+def fetch_bytes(url: str, provider_name: str = "images", timeout: float = 5) -> Optional[bytes]:
+    """GET с пулом/лимитом/ретраями. None — если так и не получилось (вызывающий код решает сам)."""
+    try:
+        return provider(provider_name).call(_get_bytes, url, timeout)
+    except Exception as e:
+        print(f"⚠️ Outbound '{provider_name}': {url[:80]} -> {e}")
+        return None
@@ -0,0 +1,121 @@
+# backend/app/core/profiling.py
+import random
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+from pyinstrument import Profiler
+from pyinstrument.renderers import SpeedscopeRenderer
+
+from .config import settings
+
+# Последние N профилей в памяти процесса: id -> {meta + pyinstrument Session}
+_profiles: "OrderedDict[str, dict]" = OrderedDict()
+
+def admin_token_ok(token: Optional[str]) -> bool:
+    """Пустой ADMIN_TOKEN = админка выключена целиком."""
+    return bool(settings.ADMIN_TOKEN) and token == settings.ADMIN_TOKEN
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers") or []:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+def should_profile(scope) -> bool:
+    """Профилируем по заголовку X-Profile (только с валидным X-Admin-Token) или по sample rate."""
+    path = scope.get("path", "")
+    if not any(path.startswith(prefix) for prefix in settings.PROFILE_PATH_PREFIXES):
+        return False
+    if _header(scope, b"x-profile") and admin_token_ok(_header(scope, b"x-admin-token")):
+        return True
+    return settings.PROFILE_SAMPLE_RATE > 0 and random.random() < settings.PROFILE_SAMPLE_RATE
+
+def _store(profile_id: str, meta: dict):
+    _profiles[profile_id] = meta
+    while len(_profiles) > settings.PROFILE_STORE_SIZE:
+        _profiles.popitem(last=False)
+
+def list_profiles() -> list:
+    return [
+        {"id": pid, **{k: v for k, v in meta.items() if k != "session"}}
+        for pid, meta in reversed(_profiles.items())
+    ]
+
+def get_profile_session(profile_id: str):
+    meta = _profiles.get(profile_id)
+    return meta["session"] if meta else None
+
+def render_speedscope(session) -> str:
+    return SpeedscopeRenderer().render(session)
+
+def render_collapsed(session) -> str:
+    """
+    Формат collapsed stacks (flamegraph.pl / speedscope / inferno):
+    "frame1;frame2;frame3 <вес>", вес — микросекунды собственного времени фрейма.
+    """
+    lines = []
+
+    def walk(frame, stack):
+        label = f"{frame.function} ({frame.file_path_short}:{frame.line_no})".replace(";", ",")
+        path = stack + [label]
+        weight = int(frame.total_self_time * 1_000_000)
+        if weight > 0:
+            lines.append(f"{';'.join(path)} {weight}")
+        for child in frame.children:
+            if not child.is_synthetic:
+                walk(child, path)
+
+    root = session.root_frame()
+    if root is not None:
+        walk(root, [])
+    return "\n".join(lines) + "\n"
+
+
+class ProfilingMiddleware:
+    """
+    ASGI-middleware: по запросу (X-Profile + X-Admin-Token) или по PROFILE_SAMPLE_RATE
+    оборачивает запрос в сэмплирующий профайлер pyinstrument и кладет профиль в память.
+    id профиля возвращается в заголовке X-Profile-Id.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex[:12]
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers") or [])
+                headers.append((b"x-profile-id", profile_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        profiler = Profiler(interval=settings.PROFILE_INTERVAL_MS / 1000, async_mode="enabled")
+        started = time.perf_counter()
+        try:
+            profiler.start()
+        except RuntimeError as e:
+            # Профайлер уже запущен в этом контексте — отдаем запрос без профилирования
+            print(f"⚠️ Profiling skipped: {e}")
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profiler.stop()
+            _store(profile_id, {
+                "method": scope.get("method"),
+                "path": scope.get("path"),
+                "query": scope.get("query_string", b"").decode("latin-1"),
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "session": profiler.last_session
+            })
+            print(f"🔬 Profile {profile_id}: {scope.get('method')} {scope.get('path')}")
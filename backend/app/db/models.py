@@ -1,8 +1,8 @@
 # backend/app/db/models.py
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Float, Text, DateTime, Boolean
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Text, DateTime, Boolean, ForeignKey, UniqueConstraint, Index, LargeBinary
 from sqlalchemy.dialects.postgresql import JSONB
-from pgvector.sqlalchemy import Vector
+from pgvector.sqlalchemy import Vector, HALFVEC
 from ..core.database import Base
 
 class Trend(Base):
@@ -13,7 +13,7 @@ class Trend(Base):
     __tablename__ = "trends"
 
     id = Column(Integer, primary_key=True, index=True)
-    platform_id = Column(String, index=True)       # ID видео из TikTok
+    platform_id = Column(String, unique=True, index=True)  # ID видео из TikTok (ключ upsert-а)
     url = Column(String, unique=True, index=True)  # Ссылка на видео
     
     # Контент
@@ -45,14 +45,85 @@ class Trend(Base):
     similarity_score = Column(Float, default=0.0)  # Насколько похоже на нас
     reach_score = Column(Float, default=0.0)       # Normalized Reach
     uplift_score = Column(Float, default=0.0)      # Эффективность (L3)
+
+    # --- 📈 СКОРОСТЬ (по серии снимков trend_snapshots) ---
+    views_per_hour = Column(Float, nullable=True)  # Скорость на последнем отрезке между сканами
+    acceleration = Column(Float, default=0.0)      # Изменение скорости, просмотры/час²
+    velocity_ewma = Column(Float, nullable=True)   # Сглаженная скорость (EWMA с учетом времени)
+
+    cover_phash = Column(BigInteger, nullable=True)  # dHash обложки (services/phash.py): дубли не идут в CLIP
     
     # AI Поля
     ai_summary = Column(Text)                      # Суть тренда
-    embedding = Column(Vector(512))                # Вектор CLIP
+    # Вектор CLIP хранится отдельно (trend_embeddings) и подгружается только там, где нужен:
+    # services/embeddings.attach_embeddings проставляет сюда numpy-вектор (не колонка ORM).
+    embedding = None
     
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
+class TrendEmbedding(Base):
+    """
+    CLIP-вектор обложки, 1:1 с trends. Заполнена одна из колонок в зависимости от EMBEDDING_STORAGE:
+    vector (float32), half (float16) или codes+scale (int8-квантизация). См. services/embeddings.py.
+    """
+    __tablename__ = "trend_embeddings"
+    __table_args__ = (
+        Index("ix_trend_embeddings_vector_hnsw", "vector", postgresql_using="hnsw",
+              postgresql_ops={"vector": "vector_cosine_ops"}),
+        Index("ix_trend_embeddings_half_hnsw", "half", postgresql_using="hnsw",
+              postgresql_ops={"half": "halfvec_cosine_ops"}),
+    )
+
+    trend_id = Column(Integer, ForeignKey("trends.id", ondelete="CASCADE"), primary_key=True)
+    vector = Column(Vector(512), nullable=True)
+    half = Column(HALFVEC(512), nullable=True)
+    codes = Column(LargeBinary, nullable=True)     # 512 x int8
+    scale = Column(Float, nullable=True)           # vector ≈ codes * scale
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class TrendSnapshot(Base):
+    """
+    Снимок статистики видео на момент скана (Deep Scan = Точка А, каждый рескан — следующая точка).
+    По серии снимков считаются скорость, ускорение и EWMA (services/velocity.py).
+    """
+    __tablename__ = "trend_snapshots"
+    __table_args__ = (
+        Index("ix_trend_snapshots_trend_time", "trend_id", "captured_at"),
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    trend_id = Column(Integer, ForeignKey("trends.id", ondelete="CASCADE"), nullable=False)
+    views = Column(BigInteger, default=0)
+    likes = Column(BigInteger, default=0)
+    shares = Column(BigInteger, default=0)
+    bookmarks = Column(BigInteger, default=0)
+    captured_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class TrendAlert(Base):
+    """
+    Алерт раннего тренда от фонового детектора (services/detector.py):
+    скорость видео — выброс относительно онлайн-базлайна его вертикали.
+    Поля видео копируются: тренды из буфера удаляются после выдачи, а алерт остается.
+    """
+    __tablename__ = "trend_alerts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    trend_id = Column(Integer, ForeignKey("trends.id", ondelete="SET NULL"), nullable=True)
+    platform_id = Column(String, index=True)
+    url = Column(String)
+    vertical = Column(String, index=True)
+    author_username = Column(String)
+    views = Column(BigInteger, default=0)
+    views_per_hour = Column(Float)
+    acceleration = Column(Float)
+    zscore = Column(Float)                          # Насколько выше нормы вертикали (в сигмах, по log-скорости)
+    baseline_views_per_hour = Column(Float)         # "Нормальная" скорость вертикали на момент алерта
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
 class ProfileData(Base):
     """
     Таблица для аналитики профилей (Audit & Spy Mode).
@@ -65,7 +136,7 @@ class ProfileData(Base):
     # Инфо о канале
     channel_data = Column(JSONB, default={})
     
-    # Список последних видео
+    # Список последних видео (legacy: сырой массив, теперь видео лежат в competitor_videos)
     recent_videos_data = Column(JSONB, default=[])
     
     # Метрики для быстрой сортировки
@@ -73,4 +144,96 @@ class ProfileData(Base):
     avg_views = Column(Float, default=0.0)
     engagement_rate = Column(Float, default=0.0) # Добавлено для аналитики
     
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
\ No newline at end of file
+    # --- ⚡ ПРЕДРАСЧИТАННЫЕ АГРЕГАТЫ (Spy Mode читает только их) ---
+    top_videos = Column(JSONB, nullable=True)        # Топ-K по просмотрам
+    latest_videos = Column(JSONB, nullable=True)     # Лента по новизне
+    uts_distribution = Column(JSONB, default={})     # Гистограмма UTS по корзинам
+    total_views = Column(BigInteger, default=0)      # Суммы для инкрементального ER
+    total_engagement = Column(BigInteger, default=0)
+    last_uploaded_at = Column(BigInteger, nullable=True)  # Водяной знак: самое свежее видео
+    
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class CompetitorVideo(Base):
+    """
+    Нормализованные видео конкурентов (одна строка = одно видео).
+    Обновляются инкрементально: новые вставляются, старые только меняют статистику.
+    """
+    __tablename__ = "competitor_videos"
+    __table_args__ = (
+        UniqueConstraint("username", "platform_id", name="uq_competitor_videos_username_platform_id"),
+        Index("ix_competitor_videos_username_views", "username", "views"),
+        Index("ix_competitor_videos_username_uploaded_at", "username", "uploaded_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    profile_id = Column(Integer, ForeignKey("profile_data.id", ondelete="CASCADE"), index=True)
+    username = Column(String, nullable=False)
+    platform_id = Column(String, nullable=False)
+
+    url = Column(String)
+    title = Column(Text)
+    cover_url = Column(String)
+    uploaded_at = Column(BigInteger, default=0)   # Unix timestamp (секунды)
+
+    views = Column(BigInteger, default=0)
+    likes = Column(BigInteger, default=0)
+    comments = Column(BigInteger, default=0)
+    shares = Column(BigInteger, default=0)
+    bookmarks = Column(BigInteger, default=0)
+    uts_score = Column(Float, default=0.0)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class CompetitorWatch(Base):
+    """
+    Watchlist конкурентов: профили, которые фоновая задача обновляет сама
+    (пачками по несколько профилей за один запуск актора).
+    """
+    __tablename__ = "competitor_watchlist"
+
+    id = Column(Integer, primary_key=True, index=True)
+    username = Column(String, unique=True, index=True, nullable=False)
+    refresh_minutes = Column(Integer, default=360)           # Как часто обновлять
+    next_refresh_at = Column(DateTime, default=datetime.utcnow, index=True)
+    last_refreshed_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class LeaderboardEntry(Base):
+    """
+    Место видео в предрасчитанном топе (services/leaderboards.py).
+    scope = "vertical" (scope_key = вертикаль). Топов по кластерам нет: cluster_id живет только в пределах скана.
+    Поля видео лежат копией в payload — топ не зависит от очистки буфера trends.
+    """
+    __tablename__ = "leaderboard_entries"
+    __table_args__ = (
+        UniqueConstraint("scope", "scope_key", "platform_id", name="uq_leaderboard_scope_platform"),
+        Index("ix_leaderboard_scope_key_score", "scope", "scope_key", "uts_score"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    scope = Column(String(16), nullable=False)
+    scope_key = Column(String, nullable=False)
+    platform_id = Column(String, nullable=False, index=True)
+    trend_id = Column(Integer, ForeignKey("trends.id", ondelete="SET NULL"), nullable=True)
+    uts_score = Column(Float, default=0.0)
+    payload = Column(JSONB, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class AISummaryCache(Base):
+    """
+    Кэш ответов Claude по хэшу содержимого (модель + версия промпта + промпт кластера).
+    Тот же набор описаний при повторном скане не стоит ни одного запроса к модели.
+    """
+    __tablename__ = "ai_summary_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String(64), unique=True, index=True, nullable=False)
+    summary = Column(Text, nullable=False)
+    model = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
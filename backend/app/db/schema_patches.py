@@ -0,0 +1,68 @@
+# backend/app/db/schema_patches.py
+from sqlalchemy import text
+
+# create_all() создает только НОВЫЕ таблицы и не трогает существующие.
+# Поэтому новые колонки/индексы для старых таблиц докатываем здесь.
+# Каждая команда обязана быть идемпотентной (IF NOT EXISTS), т.к. выполняется при каждом старте.
+SCHEMA_PATCHES = [
+    # --- profile_data: предрасчитанные агрегаты Spy Mode ---
+    "ALTER TABLE profile_data ADD COLUMN IF NOT EXISTS top_videos JSONB",
+    "ALTER TABLE profile_data ADD COLUMN IF NOT EXISTS latest_videos JSONB",
+    "ALTER TABLE profile_data ADD COLUMN IF NOT EXISTS uts_distribution JSONB DEFAULT '{}'::jsonb",
+    "ALTER TABLE profile_data ADD COLUMN IF NOT EXISTS total_views BIGINT DEFAULT 0",
+    "ALTER TABLE profile_data ADD COLUMN IF NOT EXISTS total_engagement BIGINT DEFAULT 0",
+    "ALTER TABLE profile_data ADD COLUMN IF NOT EXISTS last_uploaded_at BIGINT",
+
+    # --- competitor_videos: закладки (stats.bookmarks в аудите профиля) ---
+    "ALTER TABLE competitor_videos ADD COLUMN IF NOT EXISTS bookmarks BIGINT DEFAULT 0",
+
+    # --- trends: platform_id уникален (ключ для INSERT ... ON CONFLICT) ---
+    # Старый индекс был неуникальным: сначала чистим дубли (оставляем самую свежую запись), затем пересоздаем.
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = 'ix_trends_platform_id' AND i.indisunique
+        ) THEN
+            DELETE FROM trends a USING trends b
+            WHERE a.platform_id = b.platform_id AND a.id < b.id;
+            DROP INDEX IF EXISTS ix_trends_platform_id;
+            CREATE UNIQUE INDEX ix_trends_platform_id ON trends (platform_id);
+        END IF;
+    END $$
+    """,
+
+    # --- trends: скорость по серии снимков ---
+    "ALTER TABLE trends ADD COLUMN IF NOT EXISTS views_per_hour DOUBLE PRECISION",
+    "ALTER TABLE trends ADD COLUMN IF NOT EXISTS acceleration DOUBLE PRECISION DEFAULT 0",
+    "ALTER TABLE trends ADD COLUMN IF NOT EXISTS velocity_ewma DOUBLE PRECISION",
+
+    # --- trends: перцептивный хэш обложки ---
+    "ALTER TABLE trends ADD COLUMN IF NOT EXISTS cover_phash BIGINT",
+
+    # --- leaderboard_entries: кластерные топы упразднены (cluster_id не переживает скан) ---
+    "DELETE FROM leaderboard_entries WHERE scope = 'cluster'",
+
+    # --- trends.embedding -> trend_embeddings (векторы отдельно, не тянутся с каждой выборкой трендов) ---
+    """
+    DO $$
+    BEGIN
+        IF EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'trends' AND column_name = 'embedding'
+        ) THEN
+            INSERT INTO trend_embeddings (trend_id, vector, created_at)
+            SELECT id, embedding, now() FROM trends WHERE embedding IS NOT NULL
+            ON CONFLICT (trend_id) DO NOTHING;
+            ALTER TABLE trends DROP COLUMN embedding;
+        END IF;
+    END $$
+    """,
+]
+
+def apply_schema_patches(engine):
+    """Прогоняет все патчи схемы в одной транзакции."""
+    with engine.begin() as conn:
+        for statement in SCHEMA_PATCHES:
+            conn.execute(text(statement))
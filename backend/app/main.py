@@ -13,22 +13,31 @@ print("🚀 MODE: 6-Layer Analysis + Auto-Rescan")
 print("--------------------------------------------------")
 
 # 2. --- ТЕПЕРЬ ОСТАЛЬНОЙ КОД ---
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from .core.database import Base, engine
+from .core.database import Base, engine, async_engine, AsyncSessionLocal
 from .core.config import settings
+from .core.metrics import render_metrics
+from .core.profiling import ProfilingMiddleware
+from .core.admission import AdmissionClientMiddleware, AdmissionRejected
 # 👇 ВАЖНО: Явный импорт моделей, чтобы SQLAlchemy их увидела!
 from .db import models 
-from .api import trends, profiles, competitors
+from .db.schema_patches import apply_schema_patches
+from .api import trends, profiles, competitors, admin, alerts, media, leaderboards, export
 
 # 👇 НОВЫЙ ИМПОРТ: Планировщик задач
 from .services.scheduler import start_scheduler
+from .services.dedup import seen_index
+from .services.phash import phash_index
+from .services.detector import detector
 
 # --- 🔥 ПРИНУДИТЕЛЬНОЕ СОЗДАНИЕ ТАБЛИЦ ПРИ ЗАПУСКЕ 🔥 ---
 print("🏗️  Force creating database tables in PostgreSQL...")
 try:
     Base.metadata.create_all(bind=engine)
+    apply_schema_patches(engine)
     print("✅  Tables created successfully!")
 except Exception as e:
     print(f"❌  Error creating tables: {e}")
@@ -49,9 +58,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Профилирование медленных запросов по заголовку / sample rate (профили: /api/admin/profiles)
+app.add_middleware(ProfilingMiddleware)
+# Идентификатор клиента (X-Client-Id или IP) для квот admission control
+app.add_middleware(AdmissionClientMiddleware)
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    """Перегрузка/квота: быстрый отказ с подсказкой, когда повторить."""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"status": "error", "message": "Слишком много запросов, повторите позже",
+                 "op": exc.op, "reason": exc.reason, "retry_after": exc.retry_after},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 # Подключаем ручки (API Endpoints)
 app.include_router(trends.router, prefix="/api/trends", tags=["Trends"])
 app.include_router(profiles.router, prefix="/api/profiles", tags=["Profiles"])
+app.include_router(competitors.router, prefix="/api/competitors", tags=["Competitors"])
+app.include_router(alerts.router, prefix="/api/alerts", tags=["Alerts"])
+app.include_router(media.router, prefix="/api/media", tags=["Media"])
+app.include_router(leaderboards.router, prefix="/api/leaderboards", tags=["Leaderboards"])
+app.include_router(export.router, prefix="/api/export", tags=["Export"])
+app.include_router(admin.router, prefix="/api/admin", tags=["Admin"])
 
 # --- ⏰ ЗАПУСК ПЛАНИРОВЩИКА (SCHEDULER) ---
 @app.on_event("startup")
@@ -60,6 +90,29 @@ async def startup_event():
     print("⏳ Initializing Background Scheduler...")
     start_scheduler()
     print("✅ Scheduler is running and waiting for tasks.")
+    detector.start()
+    print("✅ Early-trend detector is consuming rescans.")
+
+    # Индекс уже виденных видео: Deep Scan не гоняет повторы через нормализацию и вставку
+    try:
+        async with AsyncSessionLocal() as db:
+            await seen_index.rebuild(db)
+    except Exception as e:
+        print(f"⚠️ Dedup index не построен (работаем через БД): {e}")
+
+    # Индекс pHash обложек: перезаливы берут готовый эмбеддинг вместо CLIP
+    if settings.PHASH_ENABLED:
+        try:
+            async with AsyncSessionLocal() as db:
+                await phash_index.rebuild(db)
+        except Exception as e:
+            print(f"⚠️ pHash index не построен (все обложки идут в CLIP): {e}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Закрываем пул async-соединений при остановке сервера"""
+    await detector.stop()
+    await async_engine.dispose()
 # ------------------------------------------
 
 @app.get("/")
@@ -73,6 +126,12 @@ def health_check():
         "database": "PostgreSQL Connected"
     }
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus: тайминги стадий пайплайна, счетчики записей и запусков Apify"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 if __name__ == "__main__":
     import uvicorn
     # Запуск через модуль app.main для корректной работы путей
@@ -1,4 +1,5 @@
 # backend/app/services/adapter.py
+from datetime import datetime
 
 def adapt_apidojo_to_standard(item: dict) -> dict:
     """
@@ -75,4 +76,73 @@ def adapt_apidojo_to_standard(item: dict) -> dict:
 
     except Exception as e:
         print(f"⚠️ Ошибка адаптации элемента: {e}")
-        return None
\ No newline at end of file
+        return None
+
+
+def to_epoch(value) -> int:
+    """Приводит дату публикации (unix-секунды, миллисекунды или ISO-строка) к unix-секундам."""
+    if not value: return 0
+    try:
+        ts = int(float(value))
+        return ts // 1000 if ts > 10**11 else ts  # миллисекунды → секунды
+    except (TypeError, ValueError):
+        pass
+    try:
+        return int(datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp())
+    except ValueError:
+        return 0
+
+def fix_tt_url(url: str) -> str:
+    if not url or not isinstance(url, str): return None
+    if ".heic" in url: return url.replace(".heic", ".jpeg")
+    return url
+
+def normalize_video_data(item: dict) -> dict:
+    """
+    Превращает любой JSON от Apify в наш стандартный формат.
+    Точно так же, как мы сделали в trends.py.
+    (Перенесено из api/competitors.py — нужно и роутам, и фоновым задачам.)
+    """
+    # 1. Достаем статистику отовсюду
+    stats = item.get("stats") or {}
+    views = item.get("views") or item.get("playCount") or stats.get("playCount") or 0
+    likes = item.get("likes") or item.get("diggCount") or stats.get("diggCount") or 0
+    comments = item.get("comments") or item.get("commentCount") or stats.get("commentCount") or 0
+    shares = item.get("shares") or item.get("shareCount") or stats.get("shareCount") or 0
+    bookmarks = item.get("bookmarks") or item.get("collectCount") or stats.get("collectCount") or 0
+    
+    # 2. Достаем дату
+    uploaded_at = to_epoch(item.get("uploadedAt") or item.get("createTime") or item.get("createTimeISO"))
+    
+    # 3. Достаем автора/канал
+    channel = item.get("channel") or item.get("authorMeta") or {}
+    author_name = channel.get("username") or channel.get("name") or "unknown"
+    avatar = fix_tt_url(channel.get("avatar") or channel.get("avatarThumb"))
+    
+    # 4. Достаем обложку
+    video_obj = item.get("video") or item.get("videoMeta") or {}
+    cover = fix_tt_url(video_obj.get("cover") or video_obj.get("coverUrl") or item.get("cover_url"))
+
+    # Собираем чистый объект
+    return {
+        "id": str(item.get("id")),
+        "title": item.get("title") or item.get("desc") or "",
+        "url": item.get("postPage") or item.get("webVideoUrl") or item.get("url"),
+        "cover_url": cover,
+        "uploaded_at": uploaded_at,
+        "views": int(views),
+        "stats": {
+            "playCount": int(views),
+            "diggCount": int(likes),
+            "commentCount": int(comments),
+            "shareCount": int(shares),
+            "collectCount": int(bookmarks)
+        },
+        "author": {
+            "username": author_name,
+            # Отображаемое имя: nickName (authorMeta) или name (channel); handle — только запасной вариант
+            "nickname": channel.get("nickName") or channel.get("name") or author_name,
+            "avatar": avatar,
+            "followers": channel.get("followers") or channel.get("fans") or 0
+        }
+    }
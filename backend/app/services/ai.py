@@ -1,16 +1,18 @@
 # backend/app/services/ai.py
 import os
-import requests
-import base64
+import io
 import numpy as np
-import torch
 from PIL import Image
-from transformers import CLIPProcessor, CLIPModel
 from anthropic import Anthropic
+from ..core.config import settings
+from ..core.metrics import stage
+from ..core.outbound import fetch_bytes, provider
 
 # Глобальные переменные для ленивой загрузки (чтобы не грузить память при старте)
+# torch/transformers тоже импортируются лениво: с EMBEDDING_BACKEND=onnx* torch в процесс не попадает вовсе
 _clip_model = None
 _clip_processor = None
+_onnx_clip = None
 _claude_client = None
 
 def get_claude_client():
@@ -18,7 +20,8 @@ def get_claude_client():
     if not _claude_client:
         key = os.getenv("ANTHROPIC_API_KEY")
         if key:
-            _claude_client = Anthropic(api_key=key)
+            # Ретраи делает core.outbound (с jitter и circuit breaker), а не SDK
+            _claude_client = Anthropic(api_key=key, max_retries=0)
     return _claude_client
 
 def load_clip():
@@ -26,35 +29,85 @@ def load_clip():
     if _clip_model is None:
         print("🧠 Загрузка модели CLIP...")
         try:
+            from transformers import CLIPProcessor, CLIPModel
             _clip_model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
             _clip_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
             print("✅ CLIP загружен.")
         except Exception as e:
             print(f"⚠️ Ошибка CLIP: {e}")
 
-def get_text_embedding(text: str) -> list:
-    """Превращает текст в вектор (список из 512 чисел)"""
+def load_onnx_clip():
+    """CLIP через ONNX Runtime (модели из `python -m app.services.clip_onnx export`)."""
+    global _onnx_clip
+    if _onnx_clip is None:
+        print(f"🧠 Загрузка CLIP ({settings.EMBEDDING_BACKEND}, threads={settings.ONNX_INTRA_OP_THREADS})...")
+        try:
+            from .clip_onnx import OnnxClip
+            _onnx_clip = OnnxClip(quantized=settings.EMBEDDING_BACKEND == "onnx-int8")
+            print("✅ CLIP (ONNX) загружен.")
+        except Exception as e:
+            print(f"⚠️ Ошибка CLIP (ONNX): {e}")
+    return _onnx_clip
+
+def _use_onnx() -> bool:
+    return settings.EMBEDDING_BACKEND in ("onnx", "onnx-int8")
+
+def clip_ready() -> bool:
+    if _use_onnx():
+        return load_onnx_clip() is not None
     load_clip()
-    if not _clip_model or not text: return None
-    try:
+    return _clip_model is not None
+
+def embed_image(image) -> list:
+    """PIL-картинка -> вектор (512) выбранным бэкендом."""
+    with stage("embedding", kind="image", backend=settings.EMBEDDING_BACKEND, items=1):
+        if _use_onnx():
+            return _onnx_clip.image_embeddings([image])[0].tolist()
+        import torch
+        inputs = _clip_processor(images=image, return_tensors="pt")
+        with torch.no_grad():
+            outputs = _clip_model.get_image_features(**inputs)
+        return outputs.squeeze().numpy().tolist()
+
+def embed_text(text: str) -> list:
+    with stage("embedding", kind="text", backend=settings.EMBEDDING_BACKEND, items=1):
+        if _use_onnx():
+            return _onnx_clip.text_embeddings([text])[0].tolist()
+        import torch
         inputs = _clip_processor(text=[text], return_tensors="pt", padding=True)
         with torch.no_grad():
             outputs = _clip_model.get_text_features(**inputs)
         return outputs.squeeze().numpy().tolist()
+
+def get_text_embedding(text: str) -> list:
+    """Превращает текст в вектор (список из 512 чисел)"""
+    if not text or not clip_ready(): return None
+    try:
+        return embed_text(text)
     except: return None
 
-def get_image_embedding(image_url: str) -> list:
-    """Скачивает картинку и превращает в вектор"""
-    load_clip()
-    if not _clip_model or not image_url: return None
+def open_image(data: bytes):
+    """Байты -> PIL-картинка или None"""
+    if not data: return None
     try:
-        resp = requests.get(image_url, headers={"User-Agent": "Mozilla/5.0"}, stream=True, timeout=5)
-        if resp.status_code != 200: return None
-        image = Image.open(resp.raw)
-        inputs = _clip_processor(images=image, return_tensors="pt")
-        with torch.no_grad():
-            outputs = _clip_model.get_image_features(**inputs)
-        return outputs.squeeze().numpy().tolist()
+        image = Image.open(io.BytesIO(data))
+        image.load()
+        return image
+    except: return None
+
+def fetch_image(image_url: str):
+    """Скачивает картинку (PIL) или None"""
+    if not image_url: return None
+    with stage("image_download", items=1):
+        return open_image(fetch_bytes(image_url))
+
+def get_image_embedding(image_url: str = None, image=None) -> list:
+    """Скачивает картинку (если не передана уже скачанная) и превращает в вектор"""
+    if not clip_ready(): return None
+    image = image if image is not None else fetch_image(image_url)
+    if image is None: return None
+    try:
+        return embed_image(image)
     except: return None
 
 def generate_trend_summary(description: str, views: int, cover_url: str = None) -> str:
@@ -72,8 +125,9 @@ def generate_trend_summary(description: str, views: int, cover_url: str = None)
              pass
         
         # Простой текстовый запрос (самый надежный)
-        resp = client.messages.create(
-            model="claude-3-5-haiku-20241022",
+        resp = provider("anthropic").call(
+            client.messages.create,
+            model=settings.AI_SUMMARY_MODEL,
             max_tokens=60,
             messages=[{"role": "user", "content": [{"type": "text", "text": prompt}]}]
         )
@@ -0,0 +1,260 @@
+# backend/app/services/apify_replay.py
+# Офлайн-замена Apify для нагрузочных тестов и CI без сети.
+# - ReplayApifyClient    — повторяет записанные датасеты (все форматы из adapter.py) с заданной задержкой и объемом.
+# - RecordingApifyClient — проксирует боевой ApifyClient и сохраняет каждый датасет в фикстуры.
+# Оба повторяют ту часть интерфейса ApifyClient, которой пользуется TikTokCollector:
+# client.actor(id).call(run_input=...) и client.dataset(id).iterate_items().
+import copy
+import glob
+import json
+import os
+import random
+import re
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from apify_client import ApifyClient
+
+from ..core.config import settings
+
+DEFAULT_FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "fixtures", "apify")
+VIDEO_ID_RE = re.compile(r"/video/(\d+)")
+
+def fixtures_dir() -> str:
+    return settings.COLLECTOR_FIXTURES_DIR or os.path.normpath(DEFAULT_FIXTURES_DIR)
+
+def detect_mode(run_input: dict) -> str:
+    """Восстанавливает режим коллектора по инпуту актора (search / profile / urls)."""
+    if run_input.get("keywords"):
+        return "search"
+    urls = run_input.get("startUrls") or []
+    if urls and all(VIDEO_ID_RE.search(str(u)) for u in urls):
+        return "urls"
+    return "profile"
+
+# --- Переписывание полей в любом из форматов (плоский / channel / authorMeta) ---
+def _set_author(item: dict, username: str):
+    if "channel.username" in item:
+        item["channel.username"] = username
+    if isinstance(item.get("channel"), dict):
+        item["channel"]["username"] = username
+    if isinstance(item.get("authorMeta"), dict):
+        item["authorMeta"]["name"] = username
+
+def _set_identity(item: dict, video_id: str, url: Optional[str] = None):
+    old_id = str(item.get("id"))
+    item["id"] = video_id
+    for key in ("postPage", "webVideoUrl", "url"):
+        value = item.get(key)
+        if isinstance(value, str):
+            item[key] = url or value.replace(old_id, video_id)
+
+def _scale_views(item: dict, factor: float):
+    if "views" in item:
+        item["views"] = int((item.get("views") or 0) * factor)
+    if "playCount" in item:
+        item["playCount"] = int((item.get("playCount") or 0) * factor)
+    if isinstance(item.get("stats"), dict) and "playCount" in item["stats"]:
+        item["stats"]["playCount"] = int((item["stats"].get("playCount") or 0) * factor)
+
+
+class _ReplayDataset:
+    def __init__(self, items: List[dict]):
+        self._items = items
+
+    def iterate_items(self):
+        per_item = settings.REPLAY_ITEM_LATENCY_MS / 1000
+        for item in self._items:
+            if per_item:
+                time.sleep(per_item)
+            yield item
+
+    def list_items(self):
+        return list(self.iterate_items())
+
+
+class _ReplayActor:
+    def __init__(self, client: "ReplayApifyClient", actor_id: str):
+        self.client = client
+        self.actor_id = actor_id
+
+    def call(self, run_input: dict = None, **kwargs) -> dict:
+        run_input = run_input or {}
+        if self.client.latency_ms:
+            time.sleep(self.client.latency_ms / 1000)
+        items = self.client.build_items(run_input)
+        dataset_id = uuid.uuid4().hex
+        self.client._datasets[dataset_id] = items
+        self.client.runs += 1
+        return {"id": dataset_id, "status": "SUCCEEDED", "defaultDatasetId": dataset_id}
+
+
+class ReplayApifyClient:
+    """Фейковый ApifyClient: отдает записанные датасеты вместо запуска актора."""
+
+    def __init__(self, fixtures_path: str = None, latency_ms: int = None, items: int = None, seed: int = 42):
+        self.fixtures_path = fixtures_path or fixtures_dir()
+        self.latency_ms = settings.REPLAY_LATENCY_MS if latency_ms is None else latency_ms
+        self.items = settings.REPLAY_ITEMS if items is None else items
+        self.runs = 0
+        self._rng = random.Random(seed)
+        self._datasets: Dict[str, List[dict]] = {}
+        self._pools = self._load_pools()
+
+    def _load_pools(self) -> Dict[str, List[dict]]:
+        """Фикстуры группируются по префиксу файла: search*.json, profile*.json, urls*.json."""
+        pools = {}
+        for path in sorted(glob.glob(os.path.join(self.fixtures_path, "*.json"))):
+            mode = os.path.basename(path).split("_")[0].split(".")[0]
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            pools.setdefault(mode, []).extend(data if isinstance(data, list) else [data])
+        if not pools:
+            print(f"⚠️ Replay: фикстуры не найдены в {self.fixtures_path}")
+        return pools
+
+    def _pool(self, mode: str) -> List[dict]:
+        if self._pools.get(mode):
+            return self._pools[mode]
+        return [item for pool in self._pools.values() for item in pool]
+
+    def build_items(self, run_input: dict) -> List[dict]:
+        mode = detect_mode(run_input)
+        pool = self._pool(mode)
+        if not pool:
+            return []
+
+        if mode == "urls":
+            # Рескан: ровно по одной записи на ссылку, с приростом просмотров (Точка Б)
+            result = []
+            for i, url in enumerate(run_input.get("startUrls") or []):
+                item = copy.deepcopy(pool[i % len(pool)])
+                match = VIDEO_ID_RE.search(str(url))
+                _set_identity(item, match.group(1) if match else str(i), url=str(url))
+                _scale_views(item, 1 + self._rng.random() * 0.5)
+                result.append(item)
+            return result
+
+        count = self.items or int(run_input.get("maxItems") or len(pool))
+        targets = [str(u).rstrip("/").split("@")[-1] for u in run_input.get("startUrls") or []]
+        result = []
+        for i in range(count):
+            item = copy.deepcopy(pool[i % len(pool)])
+            cycle = i // len(pool)
+            if cycle:
+                # Повторный проход по пулу — делаем уникальные id, иначе дедупликация схлопнет все в одно
+                _set_identity(item, f"{item.get('id')}{cycle:04d}")
+            if mode == "profile" and targets:
+                _set_author(item, targets[i % len(targets)])
+            result.append(item)
+        return result
+
+    def actor(self, actor_id: str) -> _ReplayActor:
+        return _ReplayActor(self, actor_id)
+
+    def dataset(self, dataset_id: str) -> _ReplayDataset:
+        return _ReplayDataset(self._datasets.pop(dataset_id, []))
+
+
+class _RecordingActor:
+    def __init__(self, client: "RecordingApifyClient", actor_id: str):
+        self.client = client
+        self.actor_id = actor_id
+
+    def call(self, run_input: dict = None, **kwargs) -> dict:
+        run = self.client.inner.actor(self.actor_id).call(run_input=run_input, **kwargs)
+        if not run:
+            return run
+        items = list(self.client.inner.dataset(run["defaultDatasetId"]).iterate_items())
+        self.client.save(detect_mode(run_input or {}), items)
+        # Датасет уже скачан — коллектор получит его из памяти, без второй выгрузки
+        self.client._datasets[run["defaultDatasetId"]] = items
+        return run
+
+
+class RecordingApifyClient:
+    """Боевой ApifyClient + запись каждого датасета в фикстуры для последующего replay."""
+
+    def __init__(self, inner, fixtures_path: str = None):
+        self.inner = inner
+        self.fixtures_path = fixtures_path or fixtures_dir()
+        self._datasets: Dict[str, List[dict]] = {}
+
+    def save(self, mode: str, items: List[dict]) -> str:
+        os.makedirs(self.fixtures_path, exist_ok=True)
+        path = os.path.join(self.fixtures_path, f"{mode}_{int(time.time() * 1000)}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(items, f, ensure_ascii=False)
+        print(f"💾 Recorder: {len(items)} записей → {path}")
+        return path
+
+    def actor(self, actor_id: str) -> _RecordingActor:
+        return _RecordingActor(self, actor_id)
+
+    def dataset(self, dataset_id: str):
+        if dataset_id in self._datasets:
+            return _ReplayDataset(self._datasets.pop(dataset_id))
+        return self.inner.dataset(dataset_id)
+
+
+_apify_clients: Dict[str, ApifyClient] = {}
+
+def build_apify_client(token: Optional[str]):
+    """Фабрика клиента для TikTokCollector с учетом COLLECTOR_BACKEND."""
+    backend = settings.COLLECTOR_BACKEND
+    if backend == "replay":
+        return ReplayApifyClient()
+    if not token:
+        return None
+
+    # Один ApifyClient на токен на весь процесс (его HTTP-сессия с keep-alive переиспользуется)
+    client = _apify_clients.get(token)
+    if client is None:
+        client = _apify_clients[token] = ApifyClient(token)
+    if backend == "record":
+        return RecordingApifyClient(client)
+    return client
+
+
+def run_replay_load(mode: str = "search", runs: int = 10, items: int = 100, latency_ms: int = 0) -> dict:
+    """
+    Простой нагрузочный прогон: collect() + нормализация через replay-бэкенд.
+    Возвращает пропускную способность (записей/сек) и время одного прогона.
+    """
+    from .adapter import normalize_video_data
+    from .collector import TikTokCollector
+
+    collector = TikTokCollector()
+    collector.client = ReplayApifyClient(latency_ms=latency_ms, items=items)
+
+    targets = {"search": ["replay"], "profile": ["replay_user"],
+               "urls": [f"https://www.tiktok.com/@replay/video/{7000000000000000000 + i}" for i in range(items)]}[mode]
+    durations, total = [], 0
+    for _ in range(runs):
+        started = time.perf_counter()
+        raw_items = collector.collect(targets, limit=items, mode=mode)
+        normalized = [normalize_video_data(item) for item in raw_items]
+        durations.append(time.perf_counter() - started)
+        total += len(normalized)
+
+    elapsed = sum(durations)
+    return {
+        "mode": mode,
+        "runs": runs,
+        "items": total,
+        "items_per_sec": round(total / elapsed, 1) if elapsed else 0,
+        "avg_run_ms": round(elapsed / runs * 1000, 2) if runs else 0
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Replay-нагрузка на TikTokCollector без сети")
+    parser.add_argument("--mode", default="search", choices=["search", "profile", "urls"])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--latency-ms", type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(run_replay_load(args.mode, args.runs, args.items, args.latency_ms), ensure_ascii=False, indent=2))
@@ -0,0 +1,177 @@
+# backend/app/services/clip_onnx.py
+# CLIP через ONNX Runtime (опционально int8) — для CPU-хостов без torch в рантайме.
+#
+# Из папки backend/:
+#   python -m app.services.clip_onnx export                 # экспорт fp32 + int8 (нужны torch, onnx)
+#   python -m app.services.clip_onnx parity --backend onnx-int8 --images ./covers
+#   python -m app.services.clip_onnx bench --backend onnx-int8 --n 64
+#
+# В рантайме нужны только onnxruntime, transformers (процессор/токенайзер) и pillow.
+import argparse
+import glob
+import os
+import sys
+import time
+from typing import List
+
+import numpy as np
+
+from ..core.config import settings
+
+MODEL_NAME = "openai/clip-vit-base-patch32"
+DEFAULT_MODEL_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "models", "clip-onnx")
+PARITY_MIN_COSINE = {"onnx": 0.999, "onnx-int8": 0.97}
+
+def model_dir() -> str:
+    return settings.ONNX_MODEL_DIR or os.path.normpath(DEFAULT_MODEL_DIR)
+
+def model_paths(quantized: bool) -> dict:
+    suffix = ".int8.onnx" if quantized else ".onnx"
+    return {
+        "image": os.path.join(model_dir(), f"image_encoder{suffix}"),
+        "text": os.path.join(model_dir(), f"text_encoder{suffix}"),
+    }
+
+# --- Экспорт (разово, на машине с torch) ---
+def export(quantize: bool = True, opset: int = 17):
+    import torch
+    from transformers import CLIPModel, CLIPProcessor
+
+    out = model_dir()
+    os.makedirs(out, exist_ok=True)
+    model = CLIPModel.from_pretrained(MODEL_NAME).eval()
+    processor = CLIPProcessor.from_pretrained(MODEL_NAME)
+    processor.save_pretrained(out)  # Рантайм ONNX грузит процессор отсюда, без обращения к hub
+
+    class ImageEncoder(torch.nn.Module):
+        def forward(self, pixel_values):
+            return model.get_image_features(pixel_values=pixel_values)
+
+    class TextEncoder(torch.nn.Module):
+        def forward(self, input_ids, attention_mask):
+            return model.get_text_features(input_ids=input_ids, attention_mask=attention_mask)
+
+    paths = model_paths(quantized=False)
+    with torch.no_grad():
+        torch.onnx.export(
+            ImageEncoder(), (torch.randn(1, 3, 224, 224),), paths["image"],
+            input_names=["pixel_values"], output_names=["embeds"],
+            dynamic_axes={"pixel_values": {0: "batch"}, "embeds": {0: "batch"}}, opset_version=opset
+        )
+        tokens = processor(text=["a photo"], return_tensors="pt", padding=True)
+        torch.onnx.export(
+            TextEncoder(), (tokens["input_ids"], tokens["attention_mask"]), paths["text"],
+            input_names=["input_ids", "attention_mask"], output_names=["embeds"],
+            dynamic_axes={"input_ids": {0: "batch", 1: "seq"}, "attention_mask": {0: "batch", 1: "seq"}, "embeds": {0: "batch"}},
+            opset_version=opset
+        )
+    print(f"✅ ONNX экспорт: {out}")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        q_paths = model_paths(quantized=True)
+        for kind in ("image", "text"):
+            quantize_dynamic(paths[kind], q_paths[kind], weight_type=QuantType.QInt8)
+        print("✅ int8 (dynamic quantization) готово.")
+
+# --- Рантайм ---
+class OnnxClip:
+    def __init__(self, quantized: bool = False):
+        import onnxruntime as ort
+        from transformers import CLIPProcessor
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = settings.ONNX_INTRA_OP_THREADS
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        paths = model_paths(quantized)
+        self.image_session = ort.InferenceSession(paths["image"], options, providers=["CPUExecutionProvider"])
+        self.text_session = ort.InferenceSession(paths["text"], options, providers=["CPUExecutionProvider"])
+        self.processor = CLIPProcessor.from_pretrained(model_dir())
+
+    def image_embeddings(self, images: list) -> np.ndarray:
+        pixels = self.processor(images=images, return_tensors="np")["pixel_values"].astype(np.float32)
+        return self.image_session.run(["embeds"], {"pixel_values": pixels})[0]
+
+    def text_embeddings(self, texts: List[str]) -> np.ndarray:
+        tokens = self.processor(text=texts, return_tensors="np", padding=True)
+        return self.text_session.run(["embeds"], {
+            "input_ids": tokens["input_ids"].astype(np.int64),
+            "attention_mask": tokens["attention_mask"].astype(np.int64),
+        })[0]
+
+# --- Сверка и замер ---
+def _sample_images(path: str, n: int) -> list:
+    from PIL import Image
+
+    files = sorted(glob.glob(os.path.join(path, "*"))) if path else []
+    if files:
+        return [Image.open(f).convert("RGB") for f in files[:n]]
+    # Нет папки с обложками — детерминированный шум (сверка все равно ловит поломанный экспорт)
+    rng = np.random.default_rng(0)
+    return [Image.fromarray(rng.integers(0, 255, size=(256, 256, 3), dtype=np.uint8)) for _ in range(n)]
+
+def _cosine_rows(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+def parity(backend: str, images_path: str = "", n: int = 16) -> bool:
+    """Сравнивает эмбеддинги ONNX с эталонным torch: минимальный косинус не ниже порога бэкенда."""
+    import torch
+    from transformers import CLIPModel, CLIPProcessor
+
+    images = _sample_images(images_path, n)
+    texts = ["black car drifting at night", "cat sleeping on a sofa", "street food cooking", "gym workout"]
+
+    model = CLIPModel.from_pretrained(MODEL_NAME).eval()
+    processor = CLIPProcessor.from_pretrained(MODEL_NAME)
+    with torch.no_grad():
+        ref_img = model.get_image_features(**processor(images=images, return_tensors="pt")).numpy()
+        ref_txt = model.get_text_features(**processor(text=texts, return_tensors="pt", padding=True)).numpy()
+
+    clip = OnnxClip(quantized=backend == "onnx-int8")
+    img_cos = _cosine_rows(ref_img, clip.image_embeddings(images))
+    txt_cos = _cosine_rows(ref_txt, clip.text_embeddings(texts))
+
+    threshold = PARITY_MIN_COSINE[backend]
+    ok = img_cos.min() >= threshold and txt_cos.min() >= threshold
+    print(f"{'✅' if ok else '❌'} Parity [{backend}]: image cos min={img_cos.min():.4f} mean={img_cos.mean():.4f}, "
+          f"text cos min={txt_cos.min():.4f} mean={txt_cos.mean():.4f} (порог {threshold})")
+    return ok
+
+def bench(backend: str, images_path: str = "", n: int = 64):
+    """Картинок/сек по одной (как в конвейере) и RSS процесса."""
+    import resource
+    from . import ai
+
+    images = _sample_images(images_path, n)
+    settings.EMBEDDING_BACKEND = backend
+    if not ai.clip_ready():
+        sys.exit(1)
+    ai.embed_image(images[0])  # прогрев
+    started = time.perf_counter()
+    for image in images:
+        ai.embed_image(image)
+    elapsed = time.perf_counter() - started
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"⏱️ {backend}: {n / elapsed:.1f} img/s, max RSS {rss:.0f} MB (threads={settings.ONNX_INTRA_OP_THREADS})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CLIP ONNX: экспорт, сверка с torch, замер")
+    parser.add_argument("command", choices=["export", "parity", "bench"])
+    parser.add_argument("--backend", default="onnx-int8", choices=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--no-quantize", action="store_true")
+    parser.add_argument("--images", default="", help="Папка с обложками (иначе синтетический шум)")
+    parser.add_argument("--n", type=int, default=16)
+    args = parser.parse_args()
+    if args.command == "parity" and args.backend == "torch":
+        parser.error("parity сравнивает ONNX с torch: --backend onnx или onnx-int8")
+
+    if args.command == "export":
+        export(quantize=not args.no_quantize)
+    elif args.command == "parity":
+        sys.exit(0 if parity(args.backend, args.images, args.n) else 1)
+    else:
+        bench(args.backend, args.images, args.n)
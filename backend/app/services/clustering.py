@@ -1,6 +1,7 @@
 # backend/app/services/clustering.py
 import numpy as np
 from sklearn.cluster import DBSCAN
+from ..core.metrics import stage
 
 def cluster_trends_by_visuals(trends_list: list) -> list:
     """
@@ -20,7 +21,8 @@ def cluster_trends_by_visuals(trends_list: list) -> list:
         # 2. Запускаем DBSCAN
         # eps=0.15 - насколько похожи должны быть картинки (0.0 - копии, 1.0 - разные)
         # min_samples=2 - минимальное кол-во видео, чтобы считать это группой
-        clustering = DBSCAN(eps=0.15, min_samples=2, metric='cosine').fit(X)
+        with stage("clustering", items=len(valid_trends)):
+            clustering = DBSCAN(eps=0.15, min_samples=2, metric='cosine').fit(X)
         
         labels = clustering.labels_ # Список типа [0, 0, 1, -1, 1 ...]
 
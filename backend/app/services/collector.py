@@ -1,16 +1,19 @@
 # backend/app/services/collector.py
 import os
-from typing import List
-from apify_client import ApifyClient
+import asyncio
+from typing import AsyncIterator, List, Optional, Tuple
+from .apify_replay import build_apify_client
+from ..core.metrics import stage, APIFY_RUNS
+from ..core.config import settings
+from ..core.outbound import provider
 
 class TikTokCollector:
     def __init__(self):
         token = os.getenv("APIFY_API_TOKEN")
-        if not token:
+        # Бэкенд выбирается через COLLECTOR_BACKEND (apify / replay / record)
+        self.client = build_apify_client(token)
+        if self.client is None:
             print("⚠️ WARNING: APIFY_API_TOKEN not found in .env")
-            self.client = None
-        else:
-            self.client = ApifyClient(token)
             
         # Используем именно этот актор
         self.actor_id = "apidojo/tiktok-scraper"
@@ -73,19 +76,69 @@ class TikTokCollector:
 
         try:
             # 3. Запуск актера
-            run = self.client.actor(self.actor_id).call(run_input=run_input)
+            with stage("actor_call", mode=mode, targets=len(targets)):
+                # Лимит запусков и circuit breaker на Apify (без повторов: каждый run стоит денег)
+                run = provider("apify").call(self.client.actor(self.actor_id).call, run_input=run_input)
             
             if not run: 
+                APIFY_RUNS.labels(mode, "failed").inc()
                 print("❌ Actor run failed")
                 return []
+            APIFY_RUNS.labels(mode, "ok").inc()
 
             # 4. Получение результатов
-            dataset = self.client.dataset(run["defaultDatasetId"])
-            raw_items = list(dataset.iterate_items())
+            with stage("dataset_download", mode=mode) as span:
+                dataset = self.client.dataset(run["defaultDatasetId"])
+                raw_items = provider("apify").call(lambda: list(dataset.iterate_items()), retries=settings.OUTBOUND_MAX_RETRIES)
+                span.items = len(raw_items)
             print(f"📦 Apidojo: получено {len(raw_items)} сырых записей.")
             
             return raw_items
 
         except Exception as exc:
+            APIFY_RUNS.labels(mode, "error").inc()
             print(f"⚠️ Ошибка Apify: {exc}")
-            return []
\ No newline at end of file
+            return []
+
+    async def collect_fanout(
+        self, keywords: List[str], limit: int = 30, is_deep: bool = False, concurrency: Optional[int] = None
+    ) -> AsyncIterator[Tuple[str, list]]:
+        """
+        Fan-out поиска: отдельный запуск актора на каждый ключ (с ограничением параллельности).
+        Отдает (ключ, записи) по мере завершения запусков — общее время равно самому медленному ключу,
+        а не сумме, и у каждого ключа свой maxItems.
+        """
+        semaphore = asyncio.Semaphore(concurrency or settings.SEARCH_FANOUT_CONCURRENCY)
+
+        async def run(keyword: str):
+            async with semaphore:
+                items = await asyncio.to_thread(self.collect, [keyword], limit=limit, mode="search", is_deep=is_deep)
+                return keyword, items
+
+        tasks = [asyncio.create_task(run(k)) for k in keywords]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            # Клиент ушел / ошибка выше по стеку — не запускаем оставшиеся ключи
+            for task in tasks:
+                task.cancel()
+
+    async def stream(
+        self, targets: List[str], mode: str = "keywords", is_deep: bool = False, fan_out: bool = True
+    ) -> AsyncIterator[Tuple[str, list]]:
+        """
+        Источник данных для поиска: async-генератор пар (ключ, сырые записи).
+        Несколько ключей + fan_out — отдельный запуск актора на ключ, результаты по мере готовности.
+        Apify-клиент блокирующий — уводим его в поток, чтобы не держать event loop.
+        """
+        if mode == "username":
+            yield targets[0], await asyncio.to_thread(self.collect, targets, limit=20, mode="profile", is_deep=True)
+            return
+
+        limit = 50 if is_deep else 20
+        if fan_out and len(targets) > 1:
+            async for keyword, items in self.collect_fanout(targets, limit=limit, is_deep=is_deep):
+                yield keyword, items
+        else:
+            yield targets[0], await asyncio.to_thread(self.collect, targets, limit=limit, mode="search", is_deep=is_deep)
@@ -0,0 +1,162 @@
+# backend/app/services/creator_ranking.py
+# Рейтинг авторов по всему ростеру сразу: одна выборка competitor_videos (последние N видео каждого профиля)
+# и один векторный проход numpy по всем видео всех профилей — вместо analyze_profile_efficiency на каждый профиль.
+import math
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+from ..core.metrics import stage
+from ..db.models import CompetitorVideo, CompetitorWatch, ProfileData
+from .scorer import LIFT_RISING_STAR, LIFT_STRUGGLING
+
+# sort= в API -> поле строки рейтинга
+RANK_KEYS = {
+    "efficiency": "efficiency_score",
+    "lift": "avg_viral_lift",
+    "consistency": "consistency",
+    "cadence": "posts_per_week",
+    "er": "engagement_rate",
+    "avg_views": "avg_views",
+    "followers": "followers",
+}
+
+def _followers(channel: Optional[dict]) -> int:
+    try:
+        return int((channel or {}).get("fans") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+def compute_creator_metrics(owner: np.ndarray, views: np.ndarray, engagement: np.ndarray,
+                            uploaded_at: np.ndarray, followers: np.ndarray, now: float = None) -> Dict[str, np.ndarray]:
+    """
+    Вход — плоские массивы видео (owner = индекс профиля) и подписчики по профилям.
+    Выход — массивы метрик длины len(followers), все через bincount / ufunc.at:
+      avg_viral_lift / efficiency_score — как в TrendScorer.analyze_profile_efficiency (views / (followers + 1)),
+        NaN, если подписчики профиля неизвестны,
+      consistency — 1 / (1 + CV просмотров): 1.0 = все видео набирают одинаково,
+      posts_per_week / days_since_last_post — по датам публикации,
+      engagement_rate — (лайки + комменты + репосты) / просмотры, %.
+    """
+    now = now or time.time()
+    n = len(followers)
+    count = np.bincount(owner, minlength=n).astype(np.float64)
+    safe_count = np.maximum(count, 1)
+
+    sum_views = np.bincount(owner, weights=views, minlength=n)
+    mean_views = sum_views / safe_count
+    var_views = np.maximum(np.bincount(owner, weights=views ** 2, minlength=n) / safe_count - mean_views ** 2, 0)
+    cv = np.divide(np.sqrt(var_views), mean_views, out=np.zeros(n), where=mean_views > 0)
+
+    lift = views / (followers[owner] + 1)
+    # Подписчики неизвестны (0) — lift не считаем, иначе он выходит «против одного подписчика»
+    avg_lift = np.where(followers > 0, np.bincount(owner, weights=lift, minlength=n) / safe_count, np.nan)
+
+    er = np.divide(np.bincount(owner, weights=engagement, minlength=n) * 100, sum_views,
+                   out=np.zeros(n), where=sum_views > 0)
+
+    # Каденс: только видео с известной датой
+    dated = uploaded_at > 0
+    first = np.full(n, np.inf)
+    last = np.full(n, -np.inf)
+    np.minimum.at(first, owner[dated], uploaded_at[dated])
+    np.maximum.at(last, owner[dated], uploaded_at[dated])
+    n_dated = np.bincount(owner[dated], minlength=n)
+    span_weeks = np.where(n_dated > 1, (last - first) / (7 * 86400), 0)
+    posts_per_week = np.divide(n_dated - 1, span_weeks, out=np.zeros(n), where=span_weeks > 0)
+    days_since_last = np.where(n_dated > 0, (now - last) / 86400, np.nan)
+
+    return {
+        "videos": count,
+        "avg_views": mean_views,
+        "views_cv": cv,
+        "consistency": 1 / (1 + cv),
+        "avg_viral_lift": avg_lift,
+        "efficiency_score": np.minimum(avg_lift * 2, 10),
+        "engagement_rate": er,
+        "posts_per_week": posts_per_week,
+        "days_since_last_post": days_since_last,
+    }
+
+async def load_roster(db: AsyncSession, usernames: List[str] = None, watchlist_only: bool = False,
+                      window: int = None):
+    """Профили ростера и их последние window видео — два SELECT на весь ростер."""
+    window = window or settings.CREATOR_RANKING_WINDOW
+    query = select(ProfileData.username, ProfileData.channel_data)
+    if usernames:
+        query = query.where(ProfileData.username.in_(usernames))
+    if watchlist_only:
+        query = query.where(ProfileData.username.in_(select(CompetitorWatch.username)))
+    profiles = (await db.execute(query.limit(settings.CREATOR_RANKING_MAX_PROFILES))).all()
+    if not profiles:
+        return profiles, []
+
+    ranked = select(
+        CompetitorVideo.username, CompetitorVideo.views, CompetitorVideo.likes, CompetitorVideo.comments,
+        CompetitorVideo.shares, CompetitorVideo.uploaded_at,
+        func.row_number().over(
+            partition_by=CompetitorVideo.username, order_by=CompetitorVideo.uploaded_at.desc()
+        ).label("rn")
+    ).where(CompetitorVideo.username.in_([p.username for p in profiles])).subquery()
+    videos = (await db.execute(select(ranked).where(ranked.c.rn <= window))).all()
+    return profiles, videos
+
+async def rank_creators(db: AsyncSession, sort: str = "efficiency", descending: bool = True,
+                        usernames: List[str] = None, watchlist_only: bool = False, limit: int = 200) -> List[dict]:
+    profiles, videos = await load_roster(db, usernames, watchlist_only)
+    if not profiles:
+        return []
+
+    with stage("creator_ranking", items=len(videos)) as span:
+        index = {p.username: i for i, p in enumerate(profiles)}
+        n = len(videos)
+        owner = np.fromiter((index[v.username] for v in videos), dtype=np.int64, count=n)
+        views = np.fromiter((v.views or 0 for v in videos), dtype=np.float64, count=n)
+        engagement = np.fromiter(((v.likes or 0) + (v.comments or 0) + (v.shares or 0) for v in videos), dtype=np.float64, count=n)
+        uploaded_at = np.fromiter((v.uploaded_at or 0 for v in videos), dtype=np.float64, count=n)
+        followers = np.fromiter((_followers(p.channel_data) for p in profiles), dtype=np.float64, count=len(profiles))
+
+        m = compute_creator_metrics(owner, views, engagement, uploaded_at, followers)
+        status = np.select(
+            [m["avg_viral_lift"] > LIFT_RISING_STAR, m["avg_viral_lift"] < LIFT_STRUGGLING],
+            ["Rising Star", "Struggling"], default="Stable"
+        )
+        status = np.where(np.isnan(m["avg_viral_lift"]), "Unknown", status)
+
+        rows = []
+        for i, p in enumerate(profiles):
+            if not m["videos"][i]:
+                continue  # Профиль без сохраненных видео сравнивать не с чем
+            channel = p.channel_data or {}
+            last_post = m["days_since_last_post"][i]
+            lift = m["avg_viral_lift"][i]
+            rows.append({
+                "username": p.username,
+                "nickname": channel.get("nickName") or p.username,
+                "avatar": channel.get("avatarThumb"),
+                "followers": int(followers[i]),
+                "videos": int(m["videos"][i]),
+                "avg_views": int(m["avg_views"][i]),
+                "engagement_rate": round(float(m["engagement_rate"][i]), 2),
+                "avg_viral_lift": None if math.isnan(lift) else round(float(lift), 2),
+                "efficiency_score": None if math.isnan(lift) else round(float(m["efficiency_score"][i]), 1),
+                "status": str(status[i]),
+                "consistency": round(float(m["consistency"][i]), 3),
+                "views_cv": round(float(m["views_cv"][i]), 3),
+                "posts_per_week": round(float(m["posts_per_week"][i]), 2),
+                "days_since_last_post": None if math.isnan(last_post) else round(float(last_post), 1),
+            })
+        span.items = len(rows)
+
+    key = RANK_KEYS.get(sort, RANK_KEYS["efficiency"])
+    # Без значения (нет подписчиков) — всегда в конце списка
+    rows.sort(key=lambda r: (r[key] is not None, r[key] or 0), reverse=descending)
+    if not descending:
+        rows.sort(key=lambda r: r[key] is None)
+    for rank, row in enumerate(rows, start=1):
+        row["rank"] = rank
+    return rows[:limit]
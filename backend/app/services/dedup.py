@@ -0,0 +1,84 @@
+# backend/app/services/dedup.py
+import hashlib
+import math
+from typing import Iterable, List, Set, Tuple
+
+from sqlalchemy import select
+
+from ..core.config import settings
+from ..core.metrics import stage
+from ..db.models import Trend
+
+class BloomFilter:
+    """
+    Классический bloom-фильтр на bytearray (double hashing по blake2b).
+    "Нет" — точно нет, "да" — возможно (ложноположительные с вероятностью fp_rate).
+    """
+
+    def __init__(self, capacity: int, fp_rate: float = 0.01):
+        capacity = max(capacity, 1)
+        self.size = max(int(-capacity * math.log(fp_rate) / (math.log(2) ** 2)), 8)
+        self.hashes = max(int(round(self.size / capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class SeenIndex:
+    """
+    Индекс уже виденных видео между запусками (по trends.platform_id).
+    Bloom отсекает новые видео без похода в БД, "возможно видели" подтверждаем одним запросом IN (...).
+    Удаленные из trends записи остаются в bloom — это безопасно: их просто подтвердит (не найдет) БД.
+    Перестраивается при старте сервера.
+    """
+
+    def __init__(self):
+        self.bloom = BloomFilter(settings.DEDUP_BLOOM_CAPACITY, settings.DEDUP_BLOOM_FP_RATE)
+        self.ready = False
+
+    async def rebuild(self, db):
+        """Заливает все platform_id из trends. Емкость — с запасом x2 от текущего размера таблицы."""
+        with stage("dedup_rebuild") as span:
+            ids = (await db.execute(select(Trend.platform_id).where(Trend.platform_id.isnot(None)))).scalars().all()
+            bloom = BloomFilter(max(settings.DEDUP_BLOOM_CAPACITY, len(ids) * 2), settings.DEDUP_BLOOM_FP_RATE)
+            for p_id in ids:
+                bloom.add(p_id)
+            self.bloom = bloom
+            self.ready = True
+            span.items = len(ids)
+        print(f"🧮 Dedup index: {len(ids)} видео в индексе.")
+
+    def add_many(self, platform_ids: Iterable[str]):
+        for p_id in platform_ids:
+            self.bloom.add(p_id)
+
+    async def known_ids(self, db, platform_ids: List[str]) -> Set[str]:
+        """Какие из platform_id уже есть в trends. До rebuild() — всегда честный запрос в БД."""
+        candidates = [p for p in platform_ids if not self.ready or p in self.bloom]
+        if not candidates:
+            return set()
+        rows = await db.execute(select(Trend.platform_id).where(Trend.platform_id.in_(candidates)))
+        return set(rows.scalars().all())
+
+    async def partition(self, db, items: list) -> Tuple[list, list]:
+        """Делит сырые записи Apify на (новые, уже известные) — ДО нормализации и скоринга."""
+        with stage("dedup", items=len(items)):
+            known = await self.known_ids(db, [str(item.get("id")) for item in items])
+        fresh = [item for item in items if str(item.get("id")) not in known]
+        seen = [item for item in items if str(item.get("id")) in known]
+        return fresh, seen
+
+seen_index = SeenIndex()
@@ -0,0 +1,314 @@
+# backend/app/services/deep_scan.py
+# Deep Scan как конвейер (services/pipeline.py):
+#   collect (fan-out по ключам) -> filter -> dedup -> normalize -> upsert -> embed   (потоково, ограниченные очереди)
+#   -> cluster -> score                                                            (барьер: нужен весь батч)
+# Скачивание обложек и CLIP (потоки) перекрываются со сбором следующих ключей и записью в БД.
+import asyncio
+from collections import Counter
+from typing import Dict, List, Optional
+
+from sqlalchemy import String, bindparam, case, func, or_, select, update
+from sqlalchemy.dialects.postgresql import JSONB, insert as pg_insert
+
+from ..core.admission import AdmissionRejected, admission
+from ..core.config import settings
+from ..core.database import AsyncSessionLocal
+from ..core.metrics import stage
+from ..db.models import Trend
+from .adapter import fix_tt_url
+from .ai import get_image_embedding, open_image
+from .clustering import cluster_trends_by_visuals
+from .collector import TikTokCollector
+from .dedup import seen_index
+from .embeddings import attach_embeddings, embedded_ids, load_embeddings, save_embeddings
+from .filter import ViralContentFilter
+from .leaderboards import update_leaderboards
+from .media_cache import media_cache
+from .phash import dhash, phash_index
+from .pipeline import Pipeline, Stage
+from .relevance import apply_similarity, sort_trends
+from .scorer import TrendScorer
+from .velocity import record_snapshots
+
+def item_views(item: dict) -> int:
+    return int(item.get("views") or (item.get("stats") or {}).get("playCount") or 0)
+
+def attribute(current: Optional[str], keyword: str) -> str:
+    """Атрибуция по ключам: видео, найденное несколькими ключами, хранит их все через запятую."""
+    parts = [p for p in (current or "").split(",") if p]
+    if keyword not in parts:
+        parts.append(keyword)
+    return ",".join(parts)
+
+def item_id(item: dict) -> Optional[str]:
+    """platform_id записи Apify; без id видео не сохраняем (иначе все такие записи слипнутся в "None")."""
+    p_id = item.get("id")
+    return str(p_id) if p_id not in (None, "", "None") else None
+
+def attributed_vertical(current, keyword):
+    """SQL-версия attribute() для UPDATE / ON CONFLICT: дописывает ключ к vertical строки, если его там еще нет."""
+    return case(
+        (keyword == "", current),
+        (or_(current.is_(None), current == ""), keyword),
+        (func.strpos(func.concat(",", current, ","), func.concat(",", keyword, ",")) > 0, current),
+        else_=func.concat(current, ",", keyword),
+    )
+
+def trend_row(item: dict, keyword: str) -> dict:
+    """Сырая запись Apify -> строка INSERT в trends (буфер Deep Scan)."""
+    channel = item.get("channel") or item.get("authorMeta") or {}
+    video = item.get("video") or item.get("videoMeta") or {}
+    music = item.get("music") or item.get("musicMeta") or {}
+    views = item_views(item)
+    return {
+        "platform_id": item_id(item),
+        "url": item.get("postPage") or item.get("url") or item.get("webVideoUrl"),
+        "cover_url": fix_tt_url(video.get("coverUrl") or video.get("cover")),
+        "description": item.get("title") or item.get("desc") or "No desc",
+        "stats": {"playCount": views}, "initial_stats": {"playCount": views},
+        "author_username": channel.get("username") or channel.get("name") or "unknown",
+        "author_followers": int(channel.get("followers") or channel.get("fans") or 0),
+        "music_id": str(music.get("id") or music.get("musicId") or "") or None,
+        "music_title": music.get("title") or music.get("musicName"),
+        "uts_score": 0, "vertical": keyword or "deep_scan",
+        "last_scanned_at": None
+    }
+
+
+class DeepScan:
+    """Состояние одного Deep Scan: сессия запроса, дедуп между ключами, собранные тренды."""
+
+    def __init__(self, db, mode: str = "keywords", business_desc: str = ""):
+        self.db = db
+        self.business_desc = business_desc
+        self.filter = ViralContentFilter(mode="profile" if mode == "username" else "deep")
+        self.scorer = TrendScorer()
+        self.seen: Dict[str, Trend] = {}   # platform_id -> Trend (повтор из другого ключа = только атрибуция)
+        self.trends: List[Trend] = []
+        self.vectors: Dict[int, list] = {}  # trend_id -> вектор, посчитанный CLIP в этом скане
+        self.phash_hits = 0
+
+    # --- Стадии ---
+    async def filter_stage(self, batch):
+        keyword, raw_items = batch
+        clean = self.filter.filter_content(raw_items) if raw_items else []
+        return (keyword, clean) if clean else None
+
+    async def dedup_stage(self, batch):
+        """Видео из прошлых сканов не нормализуем заново — им нужен только сброс Точки А. Своя сессия: идет параллельно с upsert."""
+        keyword, items = batch
+        async with AsyncSessionLocal() as db:
+            fresh, known = await seen_index.partition(db, items)
+        return keyword, fresh, known
+
+    def normalize_stage(self, batch):
+        keyword, fresh, known = batch
+        # Один INSERT ... ON CONFLICT не может дважды задеть одну строку: повторы внутри батча схлопываем
+        # (по platform_id и по url, побеждает последняя запись)
+        rows = {}
+        for item in fresh:
+            if item_id(item):
+                row = trend_row(item, keyword)
+                rows[row["platform_id"]] = row
+        by_url = {}
+        for row in rows.values():
+            by_url[row["url"] or row["platform_id"]] = row
+        known_params = {
+            item_id(item): {"p_id": item_id(item), "p_stats": {"playCount": item_views(item)}}
+            for item in known if item_id(item)
+        }
+        return keyword, list(by_url.values()), list(known_params.values())
+
+    async def upsert_stage(self, batch):
+        """Единственная стадия на сессии запроса (1 воркер): атрибуция, UPDATE известных, INSERT новых."""
+        keyword, rows, known_params = batch
+        for p_id in [r["platform_id"] for r in rows] + [p["p_id"] for p in known_params]:
+            if p_id in self.seen:
+                self.seen[p_id].vertical = attribute(self.seen[p_id].vertical, keyword)
+        rows = [r for r in rows if r["platform_id"] not in self.seen]
+        known_params = [p for p in known_params if p["p_id"] not in self.seen]
+        ids = [r["platform_id"] for r in rows] + [p["p_id"] for p in known_params]
+        if not ids:
+            return None
+
+        db = self.db
+        with stage("db_upsert", mode="deep", keyword=keyword, items=len(ids)):
+            try:
+                # Тот же ролик под другим platform_id (url уникален): как в исходном поиске по platform_id ИЛИ url —
+                # обновляем существующую запись, а не вставляем вторую
+                urls = [r["url"] for r in rows if r["url"]]
+                taken = dict((await db.execute(
+                    select(Trend.url, Trend.platform_id).where(Trend.url.in_(urls))
+                )).all()) if urls else {}
+                by_url_params = []
+                for r in [r for r in rows if r["url"] in taken and taken[r["url"]] != r["platform_id"]]:
+                    rows.remove(r)
+                    ids.remove(r["platform_id"])
+                    existing_id = taken[r["url"]]
+                    if existing_id in self.seen:
+                        self.seen[existing_id].vertical = attribute(self.seen[existing_id].vertical, keyword)
+                    elif existing_id not in ids:
+                        ids.append(existing_id)
+                        by_url_params.append({"p_id": existing_id, "p_stats": r["stats"]})
+                known_params += by_url_params
+                table = Trend.__table__
+                if known_params:
+                    # ✅ Сброс Точки А при новом сканировании (храним временно для сверки) + атрибуция ключа
+                    await db.execute(
+                        update(table).where(table.c.platform_id == bindparam("p_id")).values(
+                            stats=bindparam("p_stats", type_=JSONB),
+                            initial_stats=bindparam("p_stats", type_=JSONB),
+                            vertical=attributed_vertical(table.c.vertical, bindparam("p_keyword", type_=String)),
+                            last_scanned_at=None # Обнуляем, чтобы рескан поставил новую метку
+                        ),
+                        [{**p, "p_keyword": keyword} for p in known_params]
+                    )
+                if rows:
+                    # Новые записи «буфера» — одним INSERT; ON CONFLICT страхует от гонки с параллельным сканом
+                    stmt = pg_insert(Trend).values(rows)
+                    await db.execute(stmt.on_conflict_do_update(
+                        index_elements=[Trend.platform_id],
+                        set_={
+                            "stats": stmt.excluded.stats, "initial_stats": stmt.excluded.initial_stats,
+                            "vertical": attributed_vertical(table.c.vertical, stmt.excluded.vertical),
+                            "last_scanned_at": None,
+                        }
+                    ))
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                print(f"⚠️ Ошибка сохранения батча '{keyword}' ({len(ids)} видео): {e}")
+                return None
+            if not ids:
+                return None
+            seen_index.add_many(ids)
+
+            saved = (await db.execute(
+                select(Trend).where(Trend.platform_id.in_(ids)).execution_options(populate_existing=True)
+            )).scalars().all()
+            for trend in saved:
+                self.seen[trend.platform_id] = trend
+            self.trends.extend(saved)
+            # Точка А серии снимков (для скорости по времени на рескане)
+            await record_snapshots(db, saved)
+            await db.commit()
+
+        # Дальше по конвейеру — только то, что еще без эмбеддинга (известные видео его уже имеют)
+        if not settings.DEEP_SCAN_EMBED:
+            return []
+        have = await embedded_ids(db, [t.id for t in saved])
+        return [(t.id, t.platform_id, t.cover_url) for t in saved if t.id not in have and t.cover_url]
+
+    async def _reuse_vector(self, phash: int) -> Optional[list]:
+        """
+        Вектор почти такой же обложки (pHash), если он есть — в этом скане или в trend_embeddings.
+        Кандидаты от ближайшего: видео без сохраненного вектора (удалено, еще не записано) пропускаем.
+        """
+        found = [trend_id for trend_id, _ in phash_index.candidates(phash)]
+        if not found:
+            return None
+        stored = {}
+        if any(trend_id not in self.vectors for trend_id in found):
+            async with AsyncSessionLocal() as db:
+                stored = await load_embeddings(db, [t for t in found if t not in self.vectors])
+        for trend_id in found:
+            vector = self.vectors.get(trend_id)
+            if vector is None:
+                vector = stored.get(trend_id)
+            if vector is not None:
+                return vector
+        return None
+
+    async def embed_stage(self, job):
+        """
+        Обложка из дискового кэша прокси (или одна загрузка в него) -> dHash -> дубль уже посчитанной? берем ее вектор : CLIP.
+        Одинаковый вектор = та же точка для DBSCAN, так что и кластер у дубля совпадает с оригиналом.
+        Только вычисление: ORM-объекты не трогаем из конвейера, пока upsert пишет в сессию.
+        """
+        trend_id, platform_id, cover_url = job
+        with stage("image_download", items=1):
+            found = await asyncio.to_thread(media_cache.original, platform_id, cover_url)
+        image = open_image(found[1]) if found else None
+        if image is None:
+            return None
+        phash = None
+        if settings.PHASH_ENABLED:
+            phash = dhash(image)
+            vector = await self._reuse_vector(phash)
+            if vector is not None:
+                self.phash_hits += 1
+                return trend_id, phash, vector
+
+        try:
+            async with admission.admit("embedding"):
+                vector = await asyncio.to_thread(get_image_embedding, image=image)
+        except AdmissionRejected:
+            return None  # CLIP перегружен: видео остается без эмбеддинга (сбрасываем нагрузку, а не ждем)
+        if vector is None:
+            return None
+        self.vectors[trend_id] = vector
+        if phash is not None:
+            phash_index.add(phash, trend_id)
+        return trend_id, phash, vector
+
+    # --- Барьер: кластер и скоринг на всем батче ---
+    def score(self):
+        """Первичный UTS (Точка А): L4 — сколько видео батча под тем же звуком."""
+        cascades = Counter(t.music_id for t in self.trends if t.music_id)
+        with stage("scoring", mode="deep", items=len(self.trends)):
+            for t in self.trends:
+                t.uts_score = self.scorer.calculate_uts(
+                    video_data={
+                        "views": int((t.stats or {}).get("playCount") or 0),
+                        "author_followers": t.author_followers or 0,
+                    },
+                    cascade_count=cascades.get(t.music_id, 1) if t.music_id else 1
+                )
+
+    async def run(self, source) -> List[Trend]:
+        c = settings.DEEP_SCAN_CONCURRENCY
+        pipeline = Pipeline("deep_scan", [
+            Stage("filter", self.filter_stage, concurrency=c.get("filter", 1)),
+            Stage("dedup", self.dedup_stage, concurrency=c.get("dedup", 2)),
+            Stage("normalize", self.normalize_stage, concurrency=c.get("normalize", 2), threaded=True),
+            Stage("upsert", self.upsert_stage, concurrency=1, fan_out=True),
+            Stage("embed", self.embed_stage, concurrency=c.get("embed", 4)),
+        ])
+        embedded = await pipeline.run(source)
+        embeddings = {trend_id: vector for trend_id, _, vector in embedded}
+        phashes = {trend_id: phash for trend_id, phash, _ in embedded if phash is not None}
+
+        if not self.trends:
+            return []
+        if embedded and settings.PHASH_ENABLED:
+            print(f"🖼️ pHash: {self.phash_hits} из {len(embedded)} обложек — дубли, CLIP пропущен.")
+        for t in self.trends:
+            if t.id in phashes:
+                t.cover_phash = phashes[t.id]
+        # Новые векторы — одним upsert в trend_embeddings; векторы известных видео подгружаем для кластеров
+        try:
+            await save_embeddings(self.db, embeddings)
+            await self.db.commit()
+        except Exception as e:
+            await self.db.rollback()
+            print(f"⚠️ Deep Scan: не удалось сохранить эмбеддинги: {e}")
+        await attach_embeddings(self.db, self.trends, known=embeddings)
+
+        # Близость к описанию бизнеса: один текстовый вектор x матрица обложек
+        await apply_similarity(self.trends, self.business_desc)
+        self.trends = await asyncio.to_thread(cluster_trends_by_visuals, self.trends)
+        self.score()
+        self.trends = sort_trends(self.trends, "relevance" if self.business_desc else "uts")
+        try:
+            await update_leaderboards(self.db, self.trends)
+            await self.db.commit()
+        except Exception as e:
+            await self.db.rollback()
+            print(f"⚠️ Deep Scan: не удалось сохранить кластеры/баллы: {e}")
+        return self.trends
+
+async def run_deep_scan(db, targets: List[str], mode: str = "keywords", fan_out: bool = True,
+                        collector: TikTokCollector = None, business_desc: str = "") -> List[Trend]:
+    collector = collector or TikTokCollector()
+    scan = DeepScan(db, mode=mode, business_desc=business_desc)
+    return await scan.run(collector.stream(targets, mode=mode, is_deep=True, fan_out=fan_out))
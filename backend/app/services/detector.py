@@ -0,0 +1,179 @@
+# backend/app/services/detector.py
+# Раннее обнаружение трендов: фоновый потребитель рескансов.
+# На каждую вертикаль — онлайн-базлайн (экспоненциально взвешенные среднее/дисперсия log(1 + просмотры/час)):
+# O(1) на снимок и постоянная память на вертикаль. Выбросы (z-score выше порога) пишутся в trend_alerts
+# и сразу рассылаются подписчикам /api/alerts/stream.
+import asyncio
+import math
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set
+
+from prometheus_client import Counter, Gauge
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from ..core.config import settings
+from ..core.database import AsyncSessionLocal
+from ..core.metrics import stage
+from ..db.models import TrendAlert
+
+DETECTOR_DRAIN_BATCH = 500
+
+ALERTS_RAISED = Counter("trendscout_alerts_total", "Сработавшие алерты раннего тренда", ["vertical"])
+DETECTOR_DROPPED = Counter("trendscout_detector_dropped_total", "Снимки, не влезшие в очередь детектора")
+DETECTOR_QUEUE = Gauge("trendscout_detector_queue", "Длина очереди детектора")
+
+class OnlineStats:
+    """
+    Экспоненциально взвешенные среднее и дисперсия (вариант Уэлфорда/West):
+    старые наблюдения забываются с коэффициентом alpha, поэтому базлайн следует за сезонностью вертикали.
+    """
+    __slots__ = ("alpha", "mean", "var", "count")
+
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+        self.mean = 0.0
+        self.var = 0.0
+        self.count = 0
+
+    def update(self, x: float):
+        self.count += 1
+        if self.count == 1:
+            self.mean = x
+            return
+        diff = x - self.mean
+        incr = self.alpha * diff
+        self.mean += incr
+        self.var = (1 - self.alpha) * (self.var + diff * incr)
+
+    def zscore(self, x: float) -> float:
+        std = math.sqrt(self.var)
+        return (x - self.mean) / std if std > 1e-9 else 0.0
+
+
+class TrendDetector:
+    def __init__(self):
+        self.baselines: Dict[str, OnlineStats] = {}
+        self.queue: Optional[asyncio.Queue] = None
+        self.subscribers: Set[asyncio.Queue] = set()
+        # Недавно алертнутые видео — ограниченный LRU, чтобы не спамить одним и тем же роликом
+        self.recent: "OrderedDict[str, None]" = OrderedDict()
+        self.task: Optional[asyncio.Task] = None
+
+    # --- Вход ---
+    def submit(self, trends: list):
+        """Неблокирующая постановка снимков из рескана. Переполнение = потеря (счетчик), а не торможение рескана."""
+        if self.queue is None:
+            return
+        for t in trends:
+            if t.views_per_hour is None:
+                continue
+            try:
+                self.queue.put_nowait({
+                    "trend_id": t.id, "platform_id": t.platform_id, "url": t.url,
+                    "vertical": t.vertical, "author_username": t.author_username,
+                    "views": int((t.stats or {}).get("playCount") or 0),
+                    "views_per_hour": t.views_per_hour, "acceleration": t.acceleration or 0.0,
+                })
+            except asyncio.QueueFull:
+                DETECTOR_DROPPED.inc()
+        DETECTOR_QUEUE.set(self.queue.qsize())
+
+    # --- Логика ---
+    def observe(self, obs: dict) -> List[dict]:
+        """
+        O(1) на вертикаль: z-score считается ДО обновления базлайна (выброс не маскирует сам себя).
+        Видео с несколькими ключами (vertical = "a,b") сравнивается с каждой вертикалью.
+        """
+        alerts = []
+        x = math.log1p(max(obs["views_per_hour"], 0.0))
+        for vertical in [v for v in (obs["vertical"] or "").split(",") if v]:
+            stats = self.baselines.get(vertical)
+            if stats is None:
+                stats = self.baselines[vertical] = OnlineStats(settings.DETECTOR_ALPHA)
+
+            z = stats.zscore(x)
+            warmed = stats.count >= settings.DETECTOR_WARMUP
+            key = f"{vertical}:{obs['platform_id']}"
+            if warmed and z >= settings.DETECTOR_Z_THRESHOLD and obs["acceleration"] >= 0 and key not in self.recent:
+                self.recent[key] = None
+                while len(self.recent) > settings.DETECTOR_COOLDOWN_SIZE:
+                    self.recent.popitem(last=False)
+                alerts.append({
+                    **obs, "vertical": vertical, "zscore": round(z, 2),
+                    "baseline_views_per_hour": round(math.expm1(stats.mean), 2),
+                })
+            stats.update(x)
+        return alerts
+
+    async def _flush(self, alerts: List[dict]):
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(pg_insert(TrendAlert).values(alerts).returning(TrendAlert))).scalars().all()
+            await db.commit()
+        for alert in rows:
+            ALERTS_RAISED.labels(alert.vertical).inc()
+            payload = alert_to_dict(alert)
+            print(f"🚨 Ранний тренд [{alert.vertical}]: {alert.url} (z={alert.zscore}, {alert.views_per_hour}/ч)")
+            for sub in list(self.subscribers):
+                try:
+                    sub.put_nowait(payload)
+                except asyncio.QueueFull:
+                    pass  # Медленный подписчик теряет алерты, но не тормозит детектор
+
+    async def run(self):
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < DETECTOR_DRAIN_BATCH and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            DETECTOR_QUEUE.set(self.queue.qsize())
+
+            with stage("detector", items=len(batch)):
+                alerts = [a for obs in batch for a in self.observe(obs)]
+            if alerts:
+                try:
+                    await self._flush(alerts)
+                except Exception as e:
+                    print(f"❌ Detector: не удалось сохранить алерты: {e}")
+
+    # --- Жизненный цикл и подписки ---
+    def start(self):
+        if self.task is None:
+            self.queue = asyncio.Queue(maxsize=settings.DETECTOR_QUEUE_SIZE)
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def subscribe(self) -> asyncio.Queue:
+        sub = asyncio.Queue(maxsize=100)
+        self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: asyncio.Queue):
+        self.subscribers.discard(sub)
+
+    def baselines_snapshot(self) -> List[dict]:
+        return [
+            {"vertical": v, "count": s.count,
+             "mean_views_per_hour": round(math.expm1(s.mean), 2), "std_log": round(math.sqrt(s.var), 3)}
+            for v, s in sorted(self.baselines.items())
+        ]
+
+def alert_to_dict(alert: TrendAlert) -> dict:
+    return {
+        "id": alert.id,
+        "trend_id": alert.trend_id,
+        "platform_id": alert.platform_id,
+        "url": alert.url,
+        "vertical": alert.vertical,
+        "author_username": alert.author_username,
+        "views": alert.views,
+        "views_per_hour": alert.views_per_hour,
+        "acceleration": alert.acceleration,
+        "zscore": alert.zscore,
+        "baseline_views_per_hour": alert.baseline_views_per_hour,
+        "created_at": alert.created_at.isoformat() if alert.created_at else None,
+    }
+
+detector = TrendDetector()
@@ -0,0 +1,167 @@
+# backend/app/services/embeddings.py
+# Хранение CLIP-векторов отдельно от trends (таблица trend_embeddings) в одном из форматов:
+#   "vector"  — float32, 2 КБ на видео (как раньше),
+#   "halfvec" — float16, 1 КБ, HNSW-индекс по halfvec,
+#   "int8"    — скалярная квантизация (int8-коды + scale), 0.5 КБ, поиск — сканом в numpy.
+# Поиск ближайших всегда с пересчетом (rescoring): кандидатов берем с запасом и сортируем точным косинусом.
+#
+# Перекодировать уже сохраненные векторы в текущий EMBEDDING_STORAGE (из папки backend/):
+#   python -m app.services.embeddings convert
+import asyncio
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from ..core.config import settings
+from ..core.metrics import stage
+from ..db.models import Trend, TrendEmbedding
+
+# --- Кодирование ---
+def quantize_int8(vector) -> Tuple[bytes, float]:
+    v = np.asarray(vector, dtype=np.float32)
+    scale = float(np.abs(v).max()) / 127 or 1.0
+    codes = np.clip(np.round(v / scale), -127, 127).astype(np.int8)
+    return codes.tobytes(), scale
+
+def dequantize_int8(codes: bytes, scale: float) -> np.ndarray:
+    return np.frombuffer(codes, dtype=np.int8).astype(np.float32) * scale
+
+def encode(vector, storage: str = None) -> dict:
+    """Вектор -> значения колонок trend_embeddings для выбранного формата (остальные колонки пустые)."""
+    storage = storage or settings.EMBEDDING_STORAGE
+    v = np.asarray(vector, dtype=np.float32)
+    row = {"vector": None, "half": None, "codes": None, "scale": None}
+    if storage == "int8":
+        row["codes"], row["scale"] = quantize_int8(v)
+    elif storage == "halfvec":
+        row["half"] = v.astype(np.float16)
+    else:
+        row["vector"] = v
+    return row
+
+def decode(row) -> Optional[np.ndarray]:
+    """Строка trend_embeddings (любого формата) -> float32."""
+    if row.vector is not None:
+        return np.asarray(row.vector, dtype=np.float32)
+    if row.half is not None:
+        return np.asarray(row.half.to_list() if hasattr(row.half, "to_list") else row.half, dtype=np.float32)
+    if row.codes is not None:
+        return dequantize_int8(row.codes, row.scale)
+    return None
+
+def _normalize(M: np.ndarray) -> np.ndarray:
+    return M / np.maximum(np.linalg.norm(M, axis=-1, keepdims=True), 1e-12)
+
+# --- Чтение/запись ---
+async def embedded_ids(db, trend_ids: Iterable[int]) -> Set[int]:
+    """У каких трендов вектор уже есть (без загрузки самих векторов)."""
+    ids = list(trend_ids)
+    if not ids:
+        return set()
+    rows = await db.execute(select(TrendEmbedding.trend_id).where(TrendEmbedding.trend_id.in_(ids)))
+    return set(rows.scalars().all())
+
+async def save_embeddings(db, vectors: Dict[int, list]):
+    """Один INSERT ... ON CONFLICT на батч (без commit)."""
+    if not vectors:
+        return
+    rows = [{"trend_id": tid, "created_at": datetime.utcnow(), **encode(v)} for tid, v in vectors.items()]
+    stmt = pg_insert(TrendEmbedding).values(rows)
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[TrendEmbedding.trend_id],
+        set_={c: stmt.excluded[c] for c in ("vector", "half", "codes", "scale", "created_at")}
+    ))
+
+async def load_embeddings(db, trend_ids: Iterable[int]) -> Dict[int, np.ndarray]:
+    ids = list(trend_ids)
+    if not ids:
+        return {}
+    rows = (await db.execute(select(TrendEmbedding).where(TrendEmbedding.trend_id.in_(ids)))).scalars().all()
+    return {r.trend_id: decode(r) for r in rows}
+
+async def attach_embeddings(db, trends: list, known: Dict[int, list] = None):
+    """Проставляет трендам t.embedding (не колонка ORM) — только там, где вектор реально нужен."""
+    known = known or {}
+    loaded = await load_embeddings(db, [t.id for t in trends if t.id not in known])
+    for t in trends:
+        vector = known.get(t.id)
+        t.embedding = np.asarray(vector, dtype=np.float32) if vector is not None else loaded.get(t.id)
+
+# --- Поиск ближайших ---
+async def nearest(db, vector, k: int = 10, vertical: str = None, exclude_id: int = None) -> List[Tuple[int, float]]:
+    """
+    Top-k по косинусу. Кандидаты: HNSW по vector/halfvec (или int8-скан), k * EMBEDDING_RESCORE_FACTOR штук,
+    затем точный пересчет косинуса по декодированным векторам.
+    """
+    storage = settings.EMBEDDING_STORAGE
+    limit = k * settings.EMBEDDING_RESCORE_FACTOR
+    q = np.asarray(vector, dtype=np.float32)
+
+    query = select(TrendEmbedding)
+    if vertical:
+        query = query.join(Trend, Trend.id == TrendEmbedding.trend_id).where(Trend.vertical.ilike(f"%{vertical}%"))
+    if exclude_id is not None:
+        query = query.where(TrendEmbedding.trend_id != exclude_id)
+
+    with stage("ann_search", storage=storage, k=k):
+        if storage == "int8":
+            rows = (await db.execute(
+                query.where(TrendEmbedding.codes.isnot(None))
+                .order_by(TrendEmbedding.trend_id.desc()).limit(settings.EMBEDDING_INT8_SCAN_LIMIT)
+            )).scalars().all()
+            if not rows:
+                return []
+            codes = np.frombuffer(b"".join(r.codes for r in rows), dtype=np.int8).reshape(len(rows), -1)
+            q_codes, _ = quantize_int8(q)
+            approx = codes.astype(np.int32) @ np.frombuffer(q_codes, dtype=np.int8).astype(np.int32)
+            approx = approx / np.maximum(np.linalg.norm(codes.astype(np.float32), axis=1), 1e-12)
+            top = np.argsort(-approx)[:limit]
+            rows = [rows[i] for i in top]
+        else:
+            column = TrendEmbedding.half if storage == "halfvec" else TrendEmbedding.vector
+            param = q.astype(np.float16) if storage == "halfvec" else q
+            rows = (await db.execute(
+                query.where(column.isnot(None)).order_by(column.cosine_distance(param)).limit(limit)
+            )).scalars().all()
+            if not rows:
+                return []
+
+        # Rescoring: точный косинус в float32 по кандидатам
+        M = _normalize(np.stack([decode(r) for r in rows]))
+        scores = M @ _normalize(q)
+        order = np.argsort(-scores)[:k]
+    return [(rows[i].trend_id, round(float(scores[i]), 4)) for i in order]
+
+# --- Перекодирование существующих векторов ---
+async def convert_storage(batch: int = 1000) -> int:
+    """Переводит все строки trend_embeddings в текущий EMBEDDING_STORAGE (батчами по trend_id)."""
+    from ..core.database import AsyncSessionLocal
+
+    converted, last_id = 0, 0
+    async with AsyncSessionLocal() as db:
+        while True:
+            rows = (await db.execute(
+                select(TrendEmbedding).where(TrendEmbedding.trend_id > last_id)
+                .order_by(TrendEmbedding.trend_id).limit(batch)
+            )).scalars().all()
+            if not rows:
+                break
+            for r in rows:
+                vector = decode(r)
+                if vector is not None:
+                    for column, value in encode(vector).items():
+                        setattr(r, column, value)
+                    converted += 1
+            last_id = rows[-1].trend_id
+            await db.commit()
+            print(f"🔁 Перекодировано {converted} векторов в '{settings.EMBEDDING_STORAGE}'...")
+    return converted
+
+if __name__ == "__main__":
+    import sys
+    if sys.argv[1:] != ["convert"]:
+        sys.exit("usage: python -m app.services.embeddings convert")
+    asyncio.run(convert_storage())
@@ -0,0 +1,195 @@
+# backend/app/services/export.py
+# Выгрузка для аналитиков: trends / снимки / профили / видео конкурентов / алерты в Parquet или Arrow IPC.
+# Строки идут серверным курсором порциями по EXPORT_CHUNK_ROWS, каждая порция — один RecordBatch,
+# так что память не зависит от размера выгрузки, а HTTP-ответ начинает стримиться сразу.
+#
+# Из папки backend/:
+#   python -m app.services.export trends --vertical cars --since 2026-01-01 --columns id,platform_id,uts_score -o trends.parquet
+#   python -m app.services.export snapshots --format arrow -o snapshots.arrow
+import argparse
+import asyncio
+import json
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.types import BigInteger, Boolean, DateTime, Float, Integer, LargeBinary
+
+from ..core.config import settings
+from ..core.metrics import stage
+from ..db.models import CompetitorVideo, ProfileData, Trend, TrendAlert, TrendSnapshot
+
+# dataset -> (модель, колонка времени для since/until, колонка вертикали или None)
+DATASETS = {
+    "trends": (Trend, Trend.created_at, Trend.vertical),
+    "snapshots": (TrendSnapshot, TrendSnapshot.captured_at, Trend.vertical),
+    "profiles": (ProfileData, ProfileData.updated_at, None),
+    "competitor_videos": (CompetitorVideo, CompetitorVideo.created_at, None),
+    "alerts": (TrendAlert, TrendAlert.created_at, TrendAlert.vertical),
+}
+FORMATS = {
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow"),
+}
+
+class ExportError(ValueError):
+    """Неизвестный датасет/формат/колонка — ошибка запроса, а не сервера."""
+
+
+def _arrow_type(column):
+    import pyarrow as pa
+
+    t = column.type
+    if isinstance(t, (BigInteger, Integer)):
+        return pa.int64()
+    if isinstance(t, Float):
+        return pa.float64()
+    if isinstance(t, Boolean):
+        return pa.bool_()
+    if isinstance(t, DateTime):
+        return pa.timestamp("us")
+    if isinstance(t, LargeBinary):
+        return pa.binary()
+    return pa.string()  # String / Text / JSONB (как JSON-строка)
+
+def resolve_columns(dataset: str, columns: Optional[List[str]] = None) -> list:
+    """Проекция: только запрошенные колонки (по умолчанию — все)."""
+    if dataset not in DATASETS:
+        raise ExportError(f"dataset: {', '.join(DATASETS)}")
+    table = DATASETS[dataset][0].__table__
+    if not columns:
+        return list(table.columns)
+    unknown = [c for c in columns if c not in table.columns]
+    if unknown:
+        raise ExportError(f"Неизвестные колонки {dataset}: {', '.join(unknown)}")
+    return [table.columns[c] for c in columns]
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Колонки времени — naive UTC (timestamp без зоны); "...Z" / "+03:00" переводим в UTC и снимаем зону."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def build_query(dataset: str, columns: list, vertical: str = None, since: datetime = None, until: datetime = None):
+    model, time_column, vertical_column = DATASETS[dataset]
+    since, until = naive_utc(since), naive_utc(until)
+    query = select(*columns)
+    if vertical and vertical_column is not None:
+        if dataset == "snapshots":
+            query = query.join(Trend, Trend.id == TrendSnapshot.trend_id)
+        query = query.where(vertical_column.ilike(f"%{vertical}%"))
+    if since:
+        query = query.where(time_column >= since)
+    if until:
+        query = query.where(time_column < until)
+    return query.order_by(model.__table__.primary_key.columns.values()[0])
+
+def _record_batch(columns: list, schema, rows: list):
+    import pyarrow as pa
+
+    arrays = []
+    for i, column in enumerate(columns):
+        values = [r[i] for r in rows]
+        if isinstance(column.type, JSONB):
+            values = [None if v is None else json.dumps(v, ensure_ascii=False, default=str) for v in values]
+        arrays.append(pa.array(values, type=schema.field(i).type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class _Sink:
+    """Файлоподобный буфер для writer'а pyarrow: что записано — забираем порцией в HTTP-стрим."""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+async def export_stream(dataset: str, fmt: str = "parquet", columns: List[str] = None, vertical: str = None,
+                        since: datetime = None, until: datetime = None, chunk_rows: int = None) -> AsyncIterator[bytes]:
+    """Байты файла Parquet / Arrow IPC порциями — по мере чтения курсора."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from ..core.database import async_engine
+
+    if fmt not in FORMATS:
+        raise ExportError(f"format: {', '.join(FORMATS)}")
+    cols = resolve_columns(dataset, columns)
+    schema = pa.schema([pa.field(c.name, _arrow_type(c)) for c in cols])
+    query = build_query(dataset, cols, vertical, since, until)
+    chunk_rows = chunk_rows or settings.EXPORT_CHUNK_ROWS
+
+    sink = _Sink()
+    stream = pa.PythonFile(sink, mode="w")
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(stream, schema, compression="zstd")
+        write = writer.write_batch
+    else:
+        writer = pa.ipc.new_stream(stream, schema)
+        write = writer.write_batch
+
+    total = 0
+    async with async_engine.connect() as conn:
+        # Серверный курсор: строки приходят порциями, а не всей выборкой
+        result = await conn.stream(query.execution_options(yield_per=chunk_rows))
+        async for rows in result.partitions(chunk_rows):
+            with stage("export_batch", dataset=dataset, fmt=fmt, items=len(rows)):
+                write(_record_batch(cols, schema, rows))
+            total += len(rows)
+            data = sink.drain()
+            if data:
+                yield data
+    writer.close()
+    tail = sink.drain()
+    if tail:
+        yield tail
+    print(f"📦 Export {dataset}.{fmt}: {total} строк, {len(cols)} колонок.")
+
+def export_filename(dataset: str, fmt: str) -> str:
+    return f"{dataset}_{datetime.utcnow():%Y%m%d_%H%M%S}.{FORMATS[fmt][1]}"
+
+async def export_to_file(path: str, **kwargs) -> int:
+    written = 0
+    with open(path, "wb") as f:
+        async for data in export_stream(**kwargs):
+            f.write(data)
+            written += len(data)
+    return written
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Выгрузка в Parquet / Arrow IPC")
+    parser.add_argument("dataset", choices=list(DATASETS))
+    parser.add_argument("--format", default="parquet", choices=list(FORMATS))
+    parser.add_argument("--columns", default="", help="Через запятую (по умолчанию все)")
+    parser.add_argument("--vertical", default=None)
+    parser.add_argument("--since", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--until", type=datetime.fromisoformat, default=None)
+    parser.add_argument("-o", "--output", default=None)
+    args = parser.parse_args()
+
+    output = args.output or export_filename(args.dataset, args.format)
+    size = asyncio.run(export_to_file(
+        output, dataset=args.dataset, fmt=args.format,
+        columns=[c.strip() for c in args.columns.split(",") if c.strip()] or None,
+        vertical=args.vertical, since=args.since, until=args.until,
+    ))
+    print(f"✅ {output}: {size / 1024 / 1024:.1f} MB")
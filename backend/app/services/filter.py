@@ -1,56 +1,78 @@
 # backend/app/services/filter.py
-from datetime import datetime, timedelta
-from typing import List
+# Стандартная стадия перед сохранением: отсекает невиральное ДО БД, эмбеддингов и скоринга.
+# Считается колоночно: из батча один раз вытаскиваем массивы views/likes/возраст, дальше — только numpy-маски.
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from ..core.config import settings
+from ..core.metrics import stage
+from .adapter import to_epoch
+
+UNKNOWN_AGE_HOURS = 365 * 24  # Нет даты публикации — считаем старым роликом (нужен "классический" порог)
 
 class ViralContentFilter:
-    def __init__(self, is_profile_mode: bool = False):
-        self.is_profile_mode = is_profile_mode 
-        # Настройки порогов (для поиска трендов)
-        self.min_views_fresh = 1000       # < 48 часов
-        self.min_likes_recent = 1000      # < 60 дней
-        self.min_views_timeless = 100000  # Старое, но легендарное
-        
+    """
+    Пороги берутся из settings.VIRAL_FILTER по режиму ("live", "deep", "profile"):
+      min_views       — общий минимум просмотров,
+      fresh_hours / fresh_views     — свежий взлет (моложе fresh_hours),
+      recent_days / recent_likes    — уверенный тренд (моложе recent_days),
+      timeless_views                — старое, но легендарное.
+    Профиль/конкурент — берем всё (нужна история), проверяем только наличие ссылки.
+    """
+
+    def __init__(self, mode: str = "live", is_profile_mode: bool = False, thresholds: Dict = None):
+        self.mode = "profile" if is_profile_mode else mode
+        self.thresholds = thresholds if thresholds is not None else settings.VIRAL_FILTER.get(self.mode, {})
+
+    @staticmethod
+    def columns(raw_items: List[dict]) -> Dict[str, np.ndarray]:
+        """Один проход по dict-ам Apify (любой формат payload-а) -> колонки numpy."""
+        n = len(raw_items)
+
+        def stat(item, flat, nested):
+            return item.get(flat) or item.get(nested) or (item.get("stats") or {}).get(nested) or 0
+
+        views = np.fromiter((int(stat(i, "views", "playCount")) for i in raw_items), dtype=np.int64, count=n)
+        likes = np.fromiter((int(stat(i, "likes", "diggCount")) for i in raw_items), dtype=np.int64, count=n)
+        uploaded = np.fromiter(
+            (to_epoch(i.get("uploadedAt") or i.get("createTime") or i.get("createTimeISO")) for i in raw_items),
+            dtype=np.int64, count=n
+        )
+        has_url = np.fromiter(
+            (bool(i.get("postPage") or i.get("webVideoUrl") or i.get("url")) for i in raw_items), dtype=bool, count=n
+        )
+        return {"views": views, "likes": likes, "uploaded_at": uploaded, "has_url": has_url}
+
+    def mask(self, cols: Dict[str, np.ndarray], now: float = None) -> np.ndarray:
+        keep = cols["has_url"].copy()
+        if self.mode == "profile":
+            return keep
+
+        t = self.thresholds
+        views, likes, uploaded = cols["views"], cols["likes"], cols["uploaded_at"]
+        now = now or time.time()
+        age_hours = np.where(uploaded > 0, (now - uploaded) / 3600, UNKNOWN_AGE_HOURS)
+
+        keep &= views >= t.get("min_views", 0)
+
+        fresh = age_hours <= t.get("fresh_hours", 48)
+        recent = ~fresh & (age_hours <= t.get("recent_days", 60) * 24)
+        timeless = ~fresh & ~recent
+        keep &= (
+            (fresh & (views >= t.get("fresh_views", 0)))
+            | (recent & (likes >= t.get("recent_likes", 0)))
+            | (timeless & (views >= t.get("timeless_views", 0)))
+        )
+        return keep
+
     def filter_content(self, raw_items: List[dict]) -> List[dict]:
         """Оставляет только виральный контент или всё подряд (если это аудит профиля)"""
-        filtered = []
-        now = datetime.utcnow() # Используем UTC для единообразия
-
-        for item in raw_items:
-            # Техническая проверка
-            if not item.get("webVideoUrl"):
-                continue
-
-            # Если анализируем профиль/конкурента — берем ВСЁ (нам нужна история)
-            if self.is_profile_mode:
-                filtered.append(item)
-                continue
-
-            # --- ЛОГИКА ДЛЯ ПОИСКА ТРЕНДОВ ---
-            views = item.get("stats", {}).get("playCount", 0)
-            likes = item.get("stats", {}).get("diggCount", 0)
-            create_time = item.get("createTime", 0)
-            
-            try:
-                created_at = datetime.fromtimestamp(create_time)
-                age = now - created_at
-            except:
-                age = timedelta(days=365)
-
-            is_viral = False
-            
-            # 1. Свежий взлет (до 48ч)
-            if age <= timedelta(hours=48):
-                if views >= self.min_views_fresh: is_viral = True
-            
-            # 2. Уверенный тренд (до 60 дней)
-            elif age <= timedelta(days=60):
-                if likes >= self.min_likes_recent: is_viral = True
-                    
-            # 3. Классика
-            else:
-                if views >= self.min_views_timeless: is_viral = True
-
-            if is_viral:
-                filtered.append(item)
-
-        return filtered
\ No newline at end of file
+        if not raw_items:
+            return []
+        with stage("filter", mode=self.mode, items=len(raw_items)):
+            keep = self.mask(self.columns(raw_items))
+            filtered = [raw_items[i] for i in np.flatnonzero(keep)]
+        print(f"🧹 Filter [{self.mode}]: {len(filtered)} из {len(raw_items)} прошли пороги.")
+        return filtered
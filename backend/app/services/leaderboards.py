@@ -0,0 +1,133 @@
+# backend/app/services/leaderboards.py
+# Предрасчитанные топы по вертикали (таблица leaderboard_entries).
+# Топов по визуальному кластеру нет: cluster_id от DBSCAN имеет смысл только внутри одного скана,
+# и постоянный ключ "вертикаль:кластер" сливал бы в один топ несвязанные кластеры разных сканов.
+# Обновляются инкрементально — только те видео, чей UTS изменился (Deep Scan, рескан), и только их топы;
+# после вставки каждый затронутый топ подрезается до LEADERBOARD_SIZE. Дашборд читает готовый короткий список.
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, delete, func, or_, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from ..core.config import settings
+from ..core.metrics import stage
+from ..db.models import LeaderboardEntry, Trend
+from .media_cache import cover_proxy_path
+
+VERTICAL = "vertical"
+
+def vertical_keys(vertical: Optional[str]) -> List[str]:
+    """Видео, найденное несколькими ключами, хранит их через запятую — и попадает в топ каждого."""
+    return sorted({v.strip().lower() for v in (vertical or "").split(",") if v.strip()})
+
+def scopes_for(trend) -> List[Tuple[str, str]]:
+    """(scope, scope_key) всех топов, где должно стоять видео."""
+    return [(VERTICAL, v) for v in vertical_keys(trend.vertical)]
+
+def entry_payload(trend) -> dict:
+    """Копия полей видео: trends — временный буфер, а место в топе переживает его очистку."""
+    return {
+        "id": trend.id,
+        "platform_id": trend.platform_id,
+        "url": trend.url,
+        "cover_url": trend.cover_url,
+        "cover_proxy": cover_proxy_path(trend.platform_id),
+        "description": trend.description,
+        "author_username": trend.author_username,
+        "vertical": trend.vertical,
+        "cluster_id": trend.cluster_id,
+        "uts_score": trend.uts_score,
+        "views": int((trend.stats or {}).get("playCount") or 0),
+        "views_per_hour": trend.views_per_hour,
+        "ai_summary": trend.ai_summary,
+    }
+
+async def update_leaderboards(db, trends: Iterable) -> Set[Tuple[str, str]]:
+    """
+    Инкрементальное обновление (без commit — в транзакции вызывающего):
+    upsert видео во все его топы и подрезка затронутых топов.
+    Возвращает затронутые (scope, scope_key).
+    """
+    trends = [t for t in trends if t.platform_id]
+    if not trends:
+        return set()
+
+    now = datetime.utcnow()
+    rows = {}  # (scope, key, platform_id) -> строка: один INSERT не может дважды задеть одну строку
+    for t in trends:
+        for scope, key in scopes_for(t):
+            rows[(scope, key, t.platform_id)] = {
+                "scope": scope, "scope_key": key, "platform_id": t.platform_id, "trend_id": t.id,
+                "uts_score": t.uts_score or 0, "payload": entry_payload(t), "updated_at": now,
+            }
+    touched = {(scope, key) for scope, key, _ in rows}
+    rows = list(rows.values())
+
+    with stage("leaderboards", items=len(rows)):
+        if rows:
+            stmt = pg_insert(LeaderboardEntry).values(rows)
+            await db.execute(stmt.on_conflict_do_update(
+                constraint="uq_leaderboard_scope_platform",
+                set_={c: stmt.excluded[c] for c in ("trend_id", "uts_score", "payload", "updated_at")}
+            ))
+        await trim(db, touched)
+    return touched
+
+async def trim(db, scopes: Set[Tuple[str, str]]):
+    """Оставляет в каждом топе LEADERBOARD_SIZE лучших и выкидывает места старше LEADERBOARD_MAX_AGE_DAYS."""
+    if not scopes:
+        return
+    in_scopes = tuple_(LeaderboardEntry.scope, LeaderboardEntry.scope_key).in_(list(scopes))
+    ranked = select(
+        LeaderboardEntry.id,
+        func.row_number().over(
+            partition_by=(LeaderboardEntry.scope, LeaderboardEntry.scope_key),
+            order_by=LeaderboardEntry.uts_score.desc()
+        ).label("rn")
+    ).where(in_scopes).subquery()
+    stale_before = datetime.utcnow() - timedelta(days=settings.LEADERBOARD_MAX_AGE_DAYS)
+    await db.execute(delete(LeaderboardEntry).where(or_(
+        LeaderboardEntry.id.in_(select(ranked.c.id).where(ranked.c.rn > settings.LEADERBOARD_SIZE)),
+        and_(in_scopes, LeaderboardEntry.updated_at < stale_before),
+    )))
+
+async def read_leaderboard(db, vertical: str, limit: int = None) -> List[dict]:
+    """Готовый топ: одна выборка по индексу (scope, scope_key, uts_score)."""
+    scope, key = VERTICAL, vertical.strip().lower()
+    limit = min(limit or settings.LEADERBOARD_SIZE, settings.LEADERBOARD_SIZE)
+    rows = (await db.execute(
+        select(LeaderboardEntry)
+        .where(LeaderboardEntry.scope == scope, LeaderboardEntry.scope_key == key)
+        .order_by(LeaderboardEntry.uts_score.desc()).limit(limit)
+    )).scalars().all()
+    return [{**r.payload, "rank": i + 1, "uts_score": r.uts_score, "updated_at": r.updated_at} for i, r in enumerate(rows)]
+
+async def list_leaderboards(db, vertical: str = None) -> List[dict]:
+    """Какие топы есть: scope, ключ, размер, время последнего обновления."""
+    query = select(
+        LeaderboardEntry.scope, LeaderboardEntry.scope_key,
+        func.count().label("size"), func.max(LeaderboardEntry.updated_at).label("updated_at")
+    ).group_by(LeaderboardEntry.scope, LeaderboardEntry.scope_key)
+    if vertical:
+        v = vertical.strip().lower()
+        query = query.where(LeaderboardEntry.scope_key == v)
+    rows = (await db.execute(query.order_by(LeaderboardEntry.scope_key))).all()
+    return [{"scope": r.scope, "key": r.scope_key, "size": r.size, "updated_at": r.updated_at} for r in rows]
+
+async def rebuild_leaderboards(db, batch: int = 1000) -> int:
+    """Полная пересборка из trends (первый запуск / после смены LEADERBOARD_SIZE). С commit."""
+    await db.execute(delete(LeaderboardEntry))
+    count, last_id = 0, 0
+    while True:
+        trends = (await db.execute(
+            select(Trend).where(Trend.id > last_id).order_by(Trend.id).limit(batch)
+        )).scalars().all()
+        if not trends:
+            break
+        await update_leaderboards(db, trends)
+        count += len(trends)
+        last_id = trends[-1].id
+    await db.commit()
+    print(f"🏆 Leaderboards: пересобраны по {count} видео.")
+    return count
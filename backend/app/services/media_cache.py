@@ -0,0 +1,209 @@
+# backend/app/services/media_cache.py
+# Локальный кэш обложек: скачиваем с CDN TikTok один раз, храним оригинал и миниатюры (WebP/JPEG)
+# на диске по хэшу содержимого, размер кэша ограничен (LRU по времени последнего доступа).
+#
+# Раскладка MEDIA_CACHE_DIR:
+#   blobs/ab/abcdef...orig          — оригинал (его же читает CLIP в Deep Scan, второй загрузки нет)
+#   blobs/ab/abcdef..._thumb.webp   — миниатюры фиксированных размеров
+#   refs/<platform_id>              — какой хэш содержимого у обложки видео
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from PIL import Image
+
+from ..core.config import settings
+from ..core.metrics import stage
+from ..core.outbound import fetch_bytes
+from .adapter import fix_tt_url
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "media_cache")
+SIZES = {"thumb": 240, "medium": 540}   # Ширина миниатюры, px (высота — по пропорциям)
+FORMATS = {"webp": "image/webp", "jpeg": "image/jpeg"}
+
+def cover_proxy_path(platform_id) -> Optional[str]:
+    """Путь прокси обложки для выдачи на фронт."""
+    return f"/api/media/cover/{platform_id}" if platform_id else None
+
+def transcode(data: bytes, size: str, fmt: str) -> bytes:
+    image = Image.open(io.BytesIO(data))
+    image = image.convert("RGB")
+    width = SIZES[size]
+    image.thumbnail((width, width * 4), Image.LANCZOS)
+    out = io.BytesIO()
+    if fmt == "webp":
+        image.save(out, "WEBP", quality=80, method=4)
+    else:
+        image.save(out, "JPEG", quality=85, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+class MediaCache:
+    def __init__(self, root: str = None, max_bytes: int = None):
+        self.root = os.path.normpath(root or settings.MEDIA_CACHE_DIR or DEFAULT_CACHE_DIR)
+        self.max_bytes = max_bytes or settings.MEDIA_CACHE_MAX_MB * 1024 * 1024
+        self.lock = threading.Lock()
+        self.total = None                      # Текущий размер кэша (считаем лениво, один обход диска)
+        self.urls: "OrderedDict[str, str]" = OrderedDict()  # platform_id -> URL для live-выдачи (без записи в БД)
+
+    # --- Пути ---
+    def _blob(self, digest: str, suffix: str) -> str:
+        return os.path.join(self.root, "blobs", digest[:2], f"{digest}{suffix}")
+
+    def _ref(self, platform_id: str) -> str:
+        return os.path.join(self.root, "refs", "".join(c for c in str(platform_id) if c.isalnum() or c in "-_"))
+
+    # --- Live-выдача: URL обложки знаем только в памяти ---
+    def remember(self, platform_id: str, url: str):
+        if not platform_id or not url:
+            return
+        with self.lock:
+            self.urls[platform_id] = url
+            self.urls.move_to_end(platform_id)
+            while len(self.urls) > settings.MEDIA_URL_MEMORY:
+                self.urls.popitem(last=False)
+
+    def known_url(self, platform_id: str) -> Optional[str]:
+        return self.urls.get(platform_id)
+
+    # --- Запись с учетом размера ---
+    def _write(self, path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)  # Атомарно: параллельный читатель не увидит полфайла
+        self._account(len(data))
+
+    def _account(self, added: int):
+        with self.lock:
+            if self.total is None:
+                self.total = sum(size for _, size, _ in self._scan())
+            else:
+                self.total += added
+            over = self.total > self.max_bytes
+        if over:
+            self.prune()
+
+    def _scan(self):
+        blobs = os.path.join(self.root, "blobs")
+        for dirpath, _, files in os.walk(blobs):
+            for name in files:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+    def prune(self):
+        """
+        LRU: удаляем самые давно читанные файлы, пока кэш не станет <= 90% лимита,
+        затем ссылки refs/<platform_id> на содержимое, от которого не осталось ни одного файла.
+        """
+        with stage("media_prune") as span:
+            files = sorted(self._scan(), key=lambda f: f[2])
+            total = sum(size for _, size, _ in files)
+            target = self.max_bytes * 0.9
+            removed = 0
+            kept = set()  # Хэши, у которых остался оригинал или хоть одна миниатюра
+            for path, size, _ in files:
+                if total > target:
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    total -= size
+                    removed += 1
+                else:
+                    kept.add(os.path.basename(path)[:64])
+            with self.lock:
+                self.total = total
+            refs = self._prune_refs(kept)
+            span.items = removed + refs
+        print(f"🧹 Media cache: удалено {removed} файлов и {refs} ссылок, размер {total / 1024 / 1024:.0f} MB.")
+
+    def _prune_refs(self, kept: set) -> int:
+        refs_dir = os.path.join(self.root, "refs")
+        removed = 0
+        for name in os.listdir(refs_dir) if os.path.isdir(refs_dir) else []:
+            path = os.path.join(refs_dir, name)
+            try:
+                with open(path) as f:
+                    digest = f.read().strip()
+                if digest not in kept:
+                    os.remove(path)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
+
+    @staticmethod
+    def _touch(path: str):
+        try:
+            os.utime(path)  # mtime = время последнего доступа (для LRU)
+        except FileNotFoundError:
+            pass
+
+    # --- Оригинал ---
+    def _digest_for(self, platform_id: str) -> Optional[str]:
+        try:
+            with open(self._ref(platform_id)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def original(self, platform_id: str, url: str = None) -> Optional[Tuple[str, bytes]]:
+        """(хэш, байты) оригинала: из кэша или одна загрузка с CDN. None — нет ни кэша, ни рабочего URL."""
+        digest = self._digest_for(platform_id) if platform_id else None
+        if digest:
+            path = self._blob(digest, ".orig")
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                self._touch(path)
+                return digest, data
+            except FileNotFoundError:
+                pass  # Вытеснен LRU — качаем заново
+
+        url = url or self.known_url(platform_id)
+        if not url:
+            return None
+        data = fetch_bytes(fix_tt_url(url))
+        if not data:
+            return None
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob(digest, ".orig")
+        if not os.path.exists(path):
+            self._write(path, data)
+        if platform_id:
+            ref = self._ref(platform_id)
+            os.makedirs(os.path.dirname(ref), exist_ok=True)
+            with open(ref, "w") as f:
+                f.write(digest)
+        return digest, data
+
+    # --- Миниатюры ---
+    def variant(self, platform_id: str, size: str, fmt: str, url: str = None) -> Optional[Tuple[str, str]]:
+        """(путь к файлу миниатюры, etag). Транскодируем один раз на (содержимое, размер, формат)."""
+        digest = self._digest_for(platform_id)
+        if digest:
+            path = self._blob(digest, f"_{size}.{fmt}")
+            if os.path.exists(path):
+                self._touch(path)
+                return path, f"{digest[:16]}-{size}-{fmt}"
+
+        found = self.original(platform_id, url)
+        if found is None:
+            return None
+        digest, data = found
+        path = self._blob(digest, f"_{size}.{fmt}")
+        if not os.path.exists(path):
+            with stage("media_transcode", size=size, fmt=fmt):
+                self._write(path, transcode(data, size, fmt))
+        return path, f"{digest[:16]}-{size}-{fmt}"
+
+media_cache = MediaCache()
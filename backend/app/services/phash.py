@@ -0,0 +1,100 @@
+# backend/app/services/phash.py
+# Перцептивный хэш обложек (dHash, 64 бита): перезаливы и репосты с почти той же обложкой
+# получают эмбеддинг (а значит и кластер) уже посчитанного видео — без прогона через CLIP.
+import numpy as np
+from PIL import Image
+from sqlalchemy import select
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ..core.config import settings
+from ..core.metrics import stage
+from ..db.models import Trend, TrendEmbedding
+
+BITS = 64
+MASK = (1 << BITS) - 1
+
+def dhash(image: Image.Image) -> int:
+    """Difference hash: серая 9x8, бит = пиксель ярче соседа справа. Возвращает int64 со знаком (как BIGINT)."""
+    pixels = np.asarray(image.convert("L").resize((9, 8), Image.LANCZOS), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    value = int.from_bytes(np.packbits(bits).tobytes(), "big")
+    return value - (1 << BITS) if value >= 1 << (BITS - 1) else value
+
+def hamming(a: int, b: int) -> int:
+    return bin((a ^ b) & MASK).count("1")
+
+
+class PhashIndex:
+    """
+    Поиск по расстоянию Хэмминга через бэнды: хэш режется на max_distance + 1 кусков,
+    и по принципу Дирихле у хэшей на расстоянии <= max_distance хотя бы один кусок совпадает точно.
+    Кандидаты из бакетов проверяем точным Хэммингом.
+    Индексируются только видео с сохраненным эмбеддингом; перестраивается при старте сервера,
+    удаленные из trends видео убираются через remove().
+    """
+
+    def __init__(self, max_distance: int = None):
+        self.max_distance = settings.PHASH_MAX_DISTANCE if max_distance is None else max_distance
+        bands = self.max_distance + 1
+        width = BITS // bands
+        # (сдвиг, маска) каждого бэнда; последний забирает остаток бит
+        self.bands = [(i * width, (1 << (width if i < bands - 1 else BITS - i * width)) - 1) for i in range(bands)]
+        self.buckets: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+        self.hashes: Dict[int, int] = {}  # trend_id -> хэш (для remove)
+
+    def _keys(self, h: int):
+        h &= MASK
+        return [(i, (h >> shift) & mask) for i, (shift, mask) in enumerate(self.bands)]
+
+    @property
+    def size(self) -> int:
+        return len(self.hashes)
+
+    def add(self, h: int, trend_id: int):
+        if trend_id in self.hashes:
+            self.remove([trend_id])
+        self.hashes[trend_id] = h
+        for key in self._keys(h):
+            self.buckets.setdefault(key, []).append((h, trend_id))
+
+    def remove(self, trend_ids: Iterable[int]):
+        for trend_id in trend_ids:
+            h = self.hashes.pop(trend_id, None)
+            if h is None:
+                continue
+            for key in self._keys(h):
+                bucket = [e for e in self.buckets.get(key, ()) if e[1] != trend_id]
+                if bucket:
+                    self.buckets[key] = bucket
+                else:
+                    self.buckets.pop(key, None)
+
+    def candidates(self, h: int) -> List[Tuple[int, int]]:
+        """Все (trend_id, расстояние) в пределах max_distance, ближайшие первыми."""
+        found = {}
+        for key in self._keys(h):
+            for other, trend_id in self.buckets.get(key, ()):
+                d = hamming(h, other)
+                if d <= self.max_distance:
+                    found[trend_id] = d
+        return sorted(found.items(), key=lambda e: e[1])
+
+    def lookup(self, h: int) -> Optional[Tuple[int, int]]:
+        """Ближайший (trend_id, расстояние) в пределах max_distance или None."""
+        found = self.candidates(h)
+        return found[0] if found else None
+
+    async def rebuild(self, db):
+        with stage("phash_rebuild") as span:
+            rows = (await db.execute(
+                select(Trend.id, Trend.cover_phash)
+                .join(TrendEmbedding, TrendEmbedding.trend_id == Trend.id)
+                .where(Trend.cover_phash.isnot(None))
+            )).all()
+            self.buckets, self.hashes = {}, {}
+            for trend_id, h in rows:
+                self.add(h, trend_id)
+            span.items = len(rows)
+        print(f"🖼️ pHash index: {len(rows)} обложек в индексе.")
+
+phash_index = PhashIndex()
@@ -0,0 +1,149 @@
+# backend/app/services/pipeline.py
+# Маленький движок конвейера: стадии связаны ограниченными asyncio-очередями (backpressure),
+# у каждой стадии свое число воркеров, CPU/блокирующие стадии уходят в потоки.
+# Медленная стадия заполняет свою очередь — и верхние стадии сами притормаживают на put().
+import asyncio
+import time
+from typing import AsyncIterator, Callable, List
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from ..core.config import settings
+from ..core.metrics import STAGE_BUCKETS
+
+PIPELINE_QUEUE = Gauge(
+    "trendscout_pipeline_queue_depth", "Глубина входной очереди стадии конвейера", ["pipeline", "stage"]
+)
+PIPELINE_ITEMS = Counter(
+    "trendscout_pipeline_items_total", "Элементы, обработанные стадией конвейера", ["pipeline", "stage"]
+)
+# Отдельно от trendscout_stage_seconds: внутри стадий конвейера идут свои спаны stage() (filter, dedup, ...),
+# и запись в ту же серию считала бы каждый батч дважды
+PIPELINE_STAGE_SECONDS = Histogram(
+    "trendscout_pipeline_stage_seconds", "Время воркера стадии конвейера на один элемент",
+    ["pipeline", "stage"], buckets=STAGE_BUCKETS
+)
+PIPELINE_ERRORS = Counter(
+    "trendscout_pipeline_errors_total", "Элементы, упавшие в стадии конвейера", ["pipeline", "stage"]
+)
+
+_DONE = object()
+
+class Stage:
+    """
+    fn(item) -> результат | None (элемент отброшен).
+    fan_out=True — fn возвращает список, каждый элемент идет дальше отдельно.
+    threaded=True — fn синхронная и выполняется в пуле потоков.
+    """
+
+    def __init__(self, name: str, fn: Callable, concurrency: int = 1, queue_size: int = None,
+                 threaded: bool = False, fan_out: bool = False):
+        self.name = name
+        self.fn = fn
+        self.concurrency = max(concurrency, 1)
+        self.queue_size = queue_size or settings.PIPELINE_QUEUE_SIZE
+        self.threaded = threaded
+        self.fan_out = fan_out
+        self.items_in = 0
+        self.items_out = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.max_depth = 0
+
+    async def call(self, item):
+        if self.threaded:
+            return await asyncio.to_thread(self.fn, item)
+        return await self.fn(item)
+
+    def stats(self) -> dict:
+        return {
+            "stage": self.name, "workers": self.concurrency, "in": self.items_in, "out": self.items_out,
+            "errors": self.errors, "busy_ms": round(self.busy * 1000, 1), "max_queue": self.max_depth,
+        }
+
+
+class Pipeline:
+    def __init__(self, name: str, stages: List[Stage]):
+        self.name = name
+        self.stages = stages
+        self.elapsed = 0.0
+
+    async def run(self, source: AsyncIterator) -> list:
+        """Прогоняет все элементы source через стадии; возвращает то, что вышло из последней."""
+        queues = [asyncio.Queue(maxsize=s.queue_size) for s in self.stages]
+        results = []
+        started = time.perf_counter()
+
+        async def put(idx: int, item):
+            if idx == len(self.stages):
+                results.append(item)
+                return
+            stage = self.stages[idx]
+            await queues[idx].put(item)
+            depth = queues[idx].qsize()
+            stage.max_depth = max(stage.max_depth, depth)
+            PIPELINE_QUEUE.labels(self.name, stage.name).set(depth)
+
+        async def worker(idx: int):
+            stage, queue = self.stages[idx], queues[idx]
+            while True:
+                item = await queue.get()
+                PIPELINE_QUEUE.labels(self.name, stage.name).set(queue.qsize())
+                if item is _DONE:
+                    return
+                stage.items_in += 1
+                t0 = time.perf_counter()
+                try:
+                    out = await stage.call(item)
+                except Exception as e:
+                    # Ошибка одного элемента не роняет конвейер
+                    stage.errors += 1
+                    PIPELINE_ERRORS.labels(self.name, stage.name).inc()
+                    print(f"⚠️ Pipeline {self.name}/{stage.name}: {e}")
+                    continue
+                finally:
+                    took = time.perf_counter() - t0
+                    stage.busy += took
+                    PIPELINE_STAGE_SECONDS.labels(self.name, stage.name).observe(took)
+                if out is None:
+                    continue
+                for produced in (out if stage.fan_out else [out]):
+                    stage.items_out += 1
+                    PIPELINE_ITEMS.labels(self.name, stage.name).inc()
+                    await put(idx + 1, produced)
+
+        async def close(idx: int):
+            # Все воркеры стадии завершились -> по одному маркеру конца каждому воркеру следующей
+            if idx < len(self.stages):
+                for _ in range(self.stages[idx].concurrency):
+                    await queues[idx].put(_DONE)
+
+        async def run_stage(idx: int):
+            await asyncio.gather(*(worker(idx) for _ in range(self.stages[idx].concurrency)))
+            await close(idx + 1)
+
+        async def feed():
+            async for item in source:
+                await put(0, item)
+            await close(0)
+
+        tasks = [asyncio.create_task(feed())] + [asyncio.create_task(run_stage(i)) for i in range(len(self.stages))]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.elapsed = time.perf_counter() - started
+        self.log_stats()
+        return results
+
+    def stats(self) -> list:
+        return [s.stats() for s in self.stages]
+
+    def log_stats(self):
+        if not settings.LOG_SPANS:
+            return
+        for s in self.stats():
+            print(f"🧵 pipeline={self.name} stage={s['stage']} workers={s['workers']} in={s['in']} out={s['out']} "
+                  f"errors={s['errors']} busy_ms={s['busy_ms']} max_queue={s['max_queue']}")
+        print(f"🧵 pipeline={self.name} total_ms={self.elapsed * 1000:.1f}")
@@ -0,0 +1,336 @@
+# backend/app/services/profile_analytics.py
+import asyncio
+import heapq
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.admission import AdmissionRejected, admission
+from ..core.config import settings
+from ..core.database import AsyncSessionLocal
+from ..core.metrics import stage
+from ..db.models import ProfileData, CompetitorVideo, CompetitorWatch
+from .adapter import normalize_video_data
+from .media_cache import cover_proxy_path
+from .collector import TikTokCollector
+from .scorer import TrendScorer
+
+TOP_K = 3                 # Сколько хитов храним в top_videos
+LATEST_FEED_SIZE = 30     # Длина ленты latest_videos
+FULL_SCAN_LIMIT = 30      # Первый парсинг профиля
+DELTA_SCAN_LIMIT = 10     # Повторный парсинг: только свежая верхушка ленты
+WATCHLIST_BATCH_SIZE = 20 # Сколько профилей отдаем в один запуск актора
+UTS_BUCKETS = [(0, 2), (2, 4), (4, 6), (6, 8), (8, 10)]
+
+scorer = TrendScorer()
+_refreshing = set()  # Профили, которые уже обновляются в фоне (защита от дублей)
+
+def uts_bucket(score: float) -> str:
+    """Корзина гистограммы UTS ("0-2", "2-4", ... "8-10")."""
+    for low, high in UTS_BUCKETS:
+        if score < high:
+            return f"{low}-{high}"
+    low, high = UTS_BUCKETS[-1]
+    return f"{low}-{high}"
+
+def _engagement(row: CompetitorVideo) -> int:
+    return (row.likes or 0) + (row.comments or 0) + (row.shares or 0)
+
+def video_row_to_dict(row: CompetitorVideo) -> dict:
+    """Формат видео для фронтенда (совпадает с normalize_video_data + uts_score)."""
+    return {
+        "id": row.platform_id,
+        "title": row.title or "",
+        "url": row.url,
+        "cover_url": row.cover_url,
+        "cover_proxy": cover_proxy_path(row.platform_id),
+        "uploaded_at": row.uploaded_at or 0,
+        "views": row.views or 0,
+        "uts_score": row.uts_score or 0,
+        "stats": {
+            "playCount": row.views or 0,
+            "diggCount": row.likes or 0,
+            "commentCount": row.comments or 0,
+            "shareCount": row.shares or 0,
+            "collectCount": row.bookmarks or 0
+        }
+    }
+
+def _merge_ranked(current: Optional[list], changed: List[dict], key: str, size: int) -> list:
+    """
+    Инкрементально сливает уже посчитанный топ с изменившимися видео.
+    Видео из changed перекрывают свои старые версии по id.
+    """
+    merged = {v["id"]: v for v in (current or [])}
+    for v in changed:
+        merged[v["id"]] = v
+    return heapq.nlargest(size, merged.values(), key=lambda v: v.get(key, 0))
+
+def scan_limit(profile: Optional[ProfileData]) -> int:
+    """Полный парсинг для нового профиля, дельта — если водяной знак уже есть."""
+    if profile and profile.last_uploaded_at and profile.top_videos is not None:
+        return DELTA_SCAN_LIMIT
+    return FULL_SCAN_LIMIT
+
+async def get_profile(db: AsyncSession, username: str) -> Optional[ProfileData]:
+    """Один индексированный SELECT по уникальному username."""
+    result = await db.execute(select(ProfileData).where(ProfileData.username == username))
+    return result.scalars().first()
+
+async def ingest_profile_feed(
+    db: AsyncSession, username: str, raw_videos: list,
+    profile: Optional[ProfileData] = None, existing: Optional[Dict[str, CompetitorVideo]] = None
+) -> ProfileData:
+    """
+    Кладет сырые видео профиля в competitor_videos и обновляет агрегаты ProfileData.
+    Агрегаты НЕ пересчитываются с нуля: применяем только разницу по новым/изменившимся видео.
+    existing — заранее загруженные строки видео этого профиля (для пакетного обновления).
+    Commit остается за вызывающим кодом.
+    """
+    if profile is None:
+        profile = ProfileData(username=username, total_videos=0, total_views=0, total_engagement=0, uts_distribution={})
+        db.add(profile)
+        await db.flush()  # Нужен profile.id для внешнего ключа
+
+    with stage("normalization", mode="profile", items=len(raw_videos)):
+        feed = [normalize_video_data(raw) for raw in raw_videos]
+    feed = [v for v in feed if v["id"] and v["id"] != "None"]
+    if not feed:
+        return profile
+
+    if existing is None:
+        ids = [v["id"] for v in feed]
+        result = await db.execute(
+            select(CompetitorVideo).where(CompetitorVideo.username == username, CompetitorVideo.platform_id.in_(ids))
+        )
+        existing = {row.platform_id: row for row in result.scalars().all()}
+
+    # Legacy-профиль (только recent_videos_data) считаем с нуля
+    legacy = profile.top_videos is None
+    total_views = 0 if legacy else profile.total_views or 0
+    total_engagement = 0 if legacy else profile.total_engagement or 0
+    total_videos = 0 if legacy else profile.total_videos or 0
+    distribution = {} if legacy else dict(profile.uts_distribution or {})
+    watermark = profile.last_uploaded_at or 0
+    changed = []
+
+    for vid in feed:
+        # Упрощенный UTS без истории (как и раньше в Spy Mode)
+        vid["uts_score"] = scorer.calculate_uts({
+            "views": vid["views"],
+            "author_followers": vid["author"]["followers"],
+            "collect_count": 0,
+            "share_count": vid["stats"]["shareCount"]
+        }, history_data=None, cascade_count=1)
+
+        row = existing.get(vid["id"])
+        if row:
+            # Уже знакомое видео: вычитаем старый вклад в агрегаты
+            total_views -= row.views or 0
+            total_engagement -= _engagement(row)
+            old_bucket = uts_bucket(row.uts_score or 0)
+            distribution[old_bucket] = max(distribution.get(old_bucket, 0) - 1, 0)
+        else:
+            row = CompetitorVideo(profile_id=profile.id, username=username, platform_id=vid["id"])
+            db.add(row)
+            existing[vid["id"]] = row
+            total_videos += 1
+
+        row.url = vid["url"]
+        row.title = vid["title"]
+        row.cover_url = vid["cover_url"]
+        row.uploaded_at = vid["uploaded_at"]
+        row.views = vid["views"]
+        row.likes = vid["stats"]["diggCount"]
+        row.comments = vid["stats"]["commentCount"]
+        row.shares = vid["stats"]["shareCount"]
+        row.bookmarks = vid["stats"]["collectCount"]
+        row.uts_score = vid["uts_score"]
+
+        total_views += row.views
+        total_engagement += _engagement(row)
+        bucket = uts_bucket(row.uts_score)
+        distribution[bucket] = distribution.get(bucket, 0) + 1
+        watermark = max(watermark, row.uploaded_at or 0)
+        changed.append(video_row_to_dict(row))
+
+    first_vid = feed[0]
+    channel_info = dict(profile.channel_data or {})
+    channel_info.update({
+        "nickName": first_vid["author"]["nickname"],
+        "uniqueId": username,
+        "avatarThumb": first_vid["author"]["avatar"] or channel_info.get("avatarThumb"),
+        "fans": first_vid["author"]["followers"] or channel_info.get("fans", 0),
+        "videos": total_videos
+    })
+
+    profile.channel_data = channel_info
+    profile.top_videos = _merge_ranked(profile.top_videos, changed, "views", TOP_K)
+    profile.latest_videos = _merge_ranked(profile.latest_videos, changed, "uploaded_at", LATEST_FEED_SIZE)
+    profile.uts_distribution = distribution
+    profile.total_views = total_views
+    profile.total_engagement = total_engagement
+    profile.total_videos = total_videos
+    profile.avg_views = total_views / total_videos if total_videos else 0
+    profile.engagement_rate = round((total_engagement / total_views) * 100, 2) if total_views > 0 else 0.0
+    profile.last_uploaded_at = watermark or None
+    profile.updated_at = datetime.utcnow()
+    return profile
+
+async def refresh_competitor(db: AsyncSession, username: str, profile: Optional[ProfileData] = None) -> Optional[ProfileData]:
+    """
+    Парсит профиль (полностью или только дельту) и обновляет агрегаты.
+    Возвращает None, если TikTok ничего не отдал.
+    """
+    limit = scan_limit(profile)
+    print(f"🕵️‍♂️ Spy Mode: Парсим конкурента @{username} (лимит {limit})...")
+    collector = TikTokCollector()
+    async with admission.admit("live_scrape"):
+        raw_videos = await asyncio.to_thread(collector.collect, [username], limit=limit, mode="profile")
+    if not raw_videos:
+        return None
+
+    profile = await ingest_profile_feed(db, username, raw_videos, profile)
+    with stage("db_upsert", mode="profile", items=len(raw_videos)):
+        await db.commit()
+    return profile
+
+def is_fresh(profile: ProfileData) -> bool:
+    """Профиль свежий, если обновлялся не раньше PROFILE_CACHE_TTL_MINUTES назад."""
+    if not profile.updated_at:
+        return False
+    return datetime.utcnow() - profile.updated_at < timedelta(minutes=settings.PROFILE_CACHE_TTL_MINUTES)
+
+async def refresh_in_background(username: str):
+    """Фоновое обновление устаревшего профиля в собственной сессии (сессия запроса уже закрыта)."""
+    if username in _refreshing:
+        return
+    _refreshing.add(username)
+    try:
+        async with AsyncSessionLocal() as db:
+            profile = await get_profile(db, username)
+            await refresh_competitor(db, username, profile)
+    except Exception as e:
+        print(f"⚠️ Фоновое обновление @{username} не удалось: {e}")
+    finally:
+        _refreshing.discard(username)
+
+async def get_cached_profile(db: AsyncSession, username: str, background_tasks=None, force_refresh: bool = False) -> Tuple[Optional[ProfileData], str]:
+    """
+    Основной путь для профилей. Возвращает (профиль, статус кэша):
+    - "fresh": отдаем из БД как есть;
+    - "stale": отдаем из БД, а обновление уходит в фон;
+    - "live":  профиля не было (или force_refresh) — парсим прямо в запросе.
+    """
+    profile = await get_profile(db, username)
+    has_cache = profile is not None and profile.top_videos is not None
+
+    if not has_cache or force_refresh:
+        try:
+            updated = await refresh_competitor(db, username, profile)
+        except AdmissionRejected:
+            if not has_cache:
+                raise  # Отдавать нечего — 429/503 с Retry-After
+            return profile, "stale"  # Перегрузка: лучше кэш сразу, чем ожидание скрейпа
+        if updated:
+            return updated, "live"
+        return (profile, "stale") if has_cache else (None, "missing")
+
+    if is_fresh(profile):
+        return profile, "fresh"
+
+    if background_tasks is not None:
+        background_tasks.add_task(refresh_in_background, username)
+    return profile, "stale"
+
+def author_of(raw: dict) -> str:
+    """Username автора сырого видео (в нижнем регистре) — ключ для разбивки пакетного ответа."""
+    channel = raw.get("channel") or raw.get("authorMeta") or {}
+    name = channel.get("username") or channel.get("name") or raw.get("channel.username") or ""
+    return name.lower().strip().replace("@", "")
+
+def split_by_author(raw_items: list, usernames: List[str]) -> Dict[str, list]:
+    """Раскладывает общий датасет актора обратно по профилям. Чужие видео отбрасываются."""
+    wanted = set(usernames)
+    grouped = defaultdict(list)
+    for raw in raw_items:
+        author = author_of(raw)
+        if author in wanted:
+            grouped[author].append(raw)
+    return grouped
+
+async def refresh_competitors_batch(db: AsyncSession, usernames: List[str]) -> Dict[str, Optional[ProfileData]]:
+    """
+    Обновляет пачку профилей ОДНИМ запуском актора:
+    1 SELECT профилей + 1 SELECT видео + 1 run Apify + 1 COMMIT на всю пачку.
+    """
+    if not usernames:
+        return {}
+
+    result = await db.execute(select(ProfileData).where(ProfileData.username.in_(usernames)))
+    profiles = {p.username: p for p in result.scalars().all()}
+
+    # maxItems у актора общий на весь запуск — складываем лимиты профилей
+    total_limit = sum(scan_limit(profiles.get(u)) for u in usernames)
+    print(f"🕵️‍♂️ Watchlist: Пакетный парсинг {len(usernames)} профилей (лимит {total_limit})...")
+    collector = TikTokCollector()
+    raw_items = await asyncio.to_thread(collector.collect, usernames, limit=total_limit, mode="profile")
+    grouped = split_by_author(raw_items, usernames)
+
+    # Все уже известные видео пачки — одним запросом
+    result = await db.execute(select(CompetitorVideo).where(CompetitorVideo.username.in_(usernames)))
+    existing_by_user = defaultdict(dict)
+    for row in result.scalars().all():
+        existing_by_user[row.username][row.platform_id] = row
+
+    updated = {}
+    for username in usernames:
+        feed = grouped.get(username)
+        if not feed:
+            updated[username] = None
+            continue
+        updated[username] = await ingest_profile_feed(
+            db, username, feed, profiles.get(username), existing_by_user[username]
+        )
+
+    with stage("db_upsert", mode="watchlist", items=len(raw_items)):
+        await db.commit()
+    hits = sum(1 for p in updated.values() if p)
+    print(f"✅ Watchlist: Обновлено {hits}/{len(usernames)} профилей за один запуск актора.")
+    return updated
+
+async def due_watchlist(db: AsyncSession, limit: int = 200) -> List[CompetitorWatch]:
+    """Профили из watchlist, у которых подошло время обновления."""
+    result = await db.execute(
+        select(CompetitorWatch)
+        .where(CompetitorWatch.next_refresh_at <= datetime.utcnow())
+        .order_by(CompetitorWatch.next_refresh_at)
+        .limit(limit)
+    )
+    return result.scalars().all()
+
+def mark_refreshed(entries: List[CompetitorWatch]):
+    """Сдвигает next_refresh_at даже для пустых профилей, чтобы не долбить их каждый тик."""
+    now = datetime.utcnow()
+    for entry in entries:
+        entry.last_refreshed_at = now
+        entry.next_refresh_at = now + timedelta(minutes=entry.refresh_minutes or 360)
+
+def profile_report(profile: ProfileData) -> dict:
+    """Ответ Spy Mode целиком из предрасчитанных колонок — без сортировок и JOIN."""
+    return {
+        "username": profile.username,
+        "channel_data": profile.channel_data,
+        "updated_at": profile.updated_at,
+        "top_3_hits": profile.top_videos or [],
+        "latest_feed": profile.latest_videos or [],
+        "metrics": {
+            "engagement_rate": profile.engagement_rate,
+            "avg_views": int(profile.avg_views or 0),
+            "total_videos": profile.total_videos or 0,
+            "uts_distribution": profile.uts_distribution or {}
+        }
+    }
@@ -0,0 +1,74 @@
+# backend/app/services/relevance.py
+# Релевантность трендов бизнесу: описание бизнеса -> один текстовый вектор CLIP,
+# обложки кандидатов -> матрица, косинусная близость — одно матричное умножение на весь батч.
+import asyncio
+from typing import List
+
+import numpy as np
+
+from ..core.admission import AdmissionRejected, admission
+from ..core.config import settings
+from ..core.metrics import stage
+from .ai import get_text_embedding
+
+def similarity_scores(text_vector, image_matrix: np.ndarray) -> np.ndarray:
+    """Косинус между текстом и каждой строкой матрицы [n x dim]."""
+    q = np.asarray(text_vector, dtype=np.float32)
+    q /= max(float(np.linalg.norm(q)), 1e-12)
+    M = np.asarray(image_matrix, dtype=np.float32)
+    norms = np.linalg.norm(M, axis=1)
+    return (M @ q) / np.maximum(norms, 1e-12)
+
+def relevance_scores(trends: List) -> np.ndarray:
+    """
+    Смешанный ключ сортировки: UTS (0..10 -> 0..1) и близость к бизнесу, вес — RELEVANCE_WEIGHT.
+    similarity_score — сырой косинус CLIP текст-картинка, он живет в узкой полосе (~0.15..0.35),
+    поэтому перед смешиванием растягиваем его min-max по этой выдаче в 0..1: лучшее совпадение = 1, худшее = 0.
+    Без близости (нет описания бизнеса / эмбеддинга: None или 0.0 — дефолт колонки) в нормировке не участвуют
+    и получают 0; если близость у всех одинаковая — слагаемое 0, и порядок совпадает с сортировкой по UTS.
+    """
+    w = settings.RELEVANCE_WEIGHT
+    uts = np.array([(t.uts_score or 0) / 10 for t in trends], dtype=np.float64)
+    sims = np.array([np.nan if t.similarity_score is None else t.similarity_score for t in trends], dtype=np.float64)
+    known = sims > 0  # NaN > 0 -> False
+    normalized = np.zeros(len(trends))
+    if known.any():
+        lo, hi = sims[known].min(), sims[known].max()
+        if hi - lo > 1e-6:
+            normalized[known] = (sims[known] - lo) / (hi - lo)
+    return uts * (1 - w) + normalized * w
+
+async def apply_similarity(trends: list, business_desc: str) -> int:
+    """Проставляет similarity_score всем трендам с эмбеддингом. Возвращает, скольким проставлено."""
+    if not business_desc or not business_desc.strip():
+        return 0
+    with_vectors = [t for t in trends if t.embedding is not None]
+    if not with_vectors:
+        return 0
+
+    try:
+        async with admission.admit("embedding"):
+            text_vector = await asyncio.to_thread(get_text_embedding, business_desc.strip())
+    except AdmissionRejected:
+        return 0  # CLIP перегружен: выдача без близости, сортировка по UTS
+    if text_vector is None:
+        return 0
+
+    with stage("similarity", items=len(with_vectors)):
+        scores = similarity_scores(text_vector, np.stack([np.asarray(t.embedding, dtype=np.float32) for t in with_vectors]))
+        for t, s in zip(with_vectors, scores):
+            t.similarity_score = round(float(s), 4)
+    return len(with_vectors)
+
+def sort_trends(trends: List, sort: str = "uts") -> List:
+    """sort: "uts" | "similarity" | "relevance" (смешанный ключ)."""
+    if sort == "relevance":
+        # Ключ зависит от всей выдачи (нормировка близости), поэтому считаем его сразу для списка
+        scores = relevance_scores(trends)
+        order = sorted(range(len(trends)), key=lambda i: scores[i], reverse=True)
+        return [trends[i] for i in order]
+    keys = {
+        "uts": lambda t: (t.uts_score or 0, t.similarity_score or 0),
+        "similarity": lambda t: (t.similarity_score or 0, t.uts_score or 0),
+    }
+    return sorted(trends, key=keys.get(sort, keys["uts"]), reverse=True)
@@ -1,50 +1,71 @@
 # backend/app/services/scheduler.py
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from sqlalchemy.orm import Session
-from datetime import datetime
+from sqlalchemy import or_, select
+from datetime import datetime, timedelta
 import asyncio
 
-from ..core.database import SessionLocal
+from ..core.admission import AdmissionRejected, admission
+from ..core.config import settings
+from ..core.database import AsyncSessionLocal
 from ..db.models import Trend
 from ..services.collector import TikTokCollector
 from ..services.scorer import TrendScorer 
+from ..core.metrics import stage
+from ..services.velocity import record_snapshots, update_velocity
+from ..services.detector import detector
+from ..services.deep_scan import run_deep_scan
+from ..services.leaderboards import update_leaderboards
+from ..services.profile_analytics import due_watchlist, mark_refreshed, refresh_competitors_batch, WATCHLIST_BATCH_SIZE
 
 scheduler = AsyncIOScheduler()
 
 async def rescan_videos_task(video_urls: list, batch_id: str):
     print(f"⏰ [AUTO-RESCAN] Начало задачи сверки (Batch: {batch_id})")
     
-    db = SessionLocal()
+    db = AsyncSessionLocal()
     scorer = TrendScorer() 
     
     try:
         collector = TikTokCollector()
-        # Собираем самые свежие данные (Точка Б)
-        raw_items = collector.collect(video_urls, limit=len(video_urls), mode="urls")
+        # Собираем самые свежие данные (Точка Б). Apify-клиент блокирующий — в отдельный поток.
+        raw_items = await asyncio.to_thread(collector.collect, video_urls, limit=len(video_urls), mode="urls")
         
         if not raw_items:
             print("⚠️ Rescan: Нет новых данных для сверки.")
             return
 
+        # Одним запросом поднимаем все видео батча вместо запроса на каждый URL
+        result = await db.execute(select(Trend).where(Trend.url.in_(video_urls)))
+        videos_by_url = {t.url: t for t in result.scalars().all()}
+
+        matched = []
         for item in raw_items:
             url = item.get("postPage") or item.get("webVideoUrl") or item.get("url")
-            video = db.query(Trend).filter(Trend.url == url).first()
-            
-            if video:
-                stats = item.get("stats") or {}
-                fresh_views = int(item.get("views") or stats.get("playCount") or 0)
-                
-                new_stats = {
-                    "playCount": fresh_views,
-                    "diggCount": int(item.get("likes") or stats.get("diggCount") or 0),
-                    "commentCount": int(item.get("comments") or stats.get("commentCount") or 0),
-                    "shareCount": int(item.get("shares") or stats.get("shareCount") or 0),
-                    "collectCount": int(item.get("bookmarks") or stats.get("collectCount") or 0)
-                }
+            video = videos_by_url.get(url)
+            if not video:
+                continue
+            stats = item.get("stats") or {}
+            video.stats = {
+                "playCount": int(item.get("views") or stats.get("playCount") or 0),
+                "diggCount": int(item.get("likes") or stats.get("diggCount") or 0),
+                "commentCount": int(item.get("comments") or stats.get("commentCount") or 0),
+                "shareCount": int(item.get("shares") or stats.get("shareCount") or 0),
+                "collectCount": int(item.get("bookmarks") or stats.get("collectCount") or 0)
+            }
+            video.last_scanned_at = datetime.utcnow()
+            matched.append(video)
 
-                # --- ✅ СВЕРКА: Новые данные vs Временные старые данные (Point A) ---
+        # Новая точка серии + скорость/ускорение по всем снимкам батча (один INSERT, один SELECT, numpy)
+        await record_snapshots(db, matched)
+        velocity = await update_velocity(db, matched)
+
+        with stage("scoring", mode="rescan", items=len(matched)):
+            for video in matched:
+                fresh_views = video.stats["playCount"]
+                # --- ✅ СВЕРКА: Точка А + скорость по времени между сканами ---
                 history_data = {
-                    "play_count": video.initial_stats.get("playCount", 0) if video.initial_stats else fresh_views
+                    "play_count": video.initial_stats.get("playCount", 0) if video.initial_stats else fresh_views,
+                    **velocity.get(video.id, {})
                 }
 
                 # Пересчитываем балл UTS на базе динамики роста между Точкой А и Точкой Б
@@ -52,26 +73,83 @@ async def rescan_videos_task(video_urls: list, batch_id: str):
                     video_data={
                         "views": fresh_views,
                         "author_followers": video.author_followers,
-                        "collect_count": new_stats["collectCount"],
-                        "share_count": new_stats["shareCount"]
+                        "collect_count": video.stats["collectCount"],
+                        "share_count": video.stats["shareCount"]
                     },
                     history_data=history_data,
                     cascade_count=1
                 )
                 
-                video.stats = new_stats
-                video.last_scanned_at = datetime.utcnow()
-                
-        db.commit()
+        # Топы вертикалей: только видео этого рескана и только их топы
+        await update_leaderboards(db, matched)
+        with stage("db_upsert", mode="rescan", items=len(videos_by_url)):
+            await db.commit()
+        # Детектор ранних трендов получает свежие скорости (неблокирующе)
+        detector.submit(matched)
         print(f"✅ [AUTO-RESCAN] Сверка завершена. Статистика и UTS-баллы обновлены.")
         
     except Exception as e:
         print(f"❌ Ошибка рескана: {e}")
-        db.rollback()
+        await db.rollback()
     finally:
-        db.close()
+        await db.close()
+
+async def refresh_watchlist_task():
+    """Периодически обновляет профили из watchlist пачками по WATCHLIST_BATCH_SIZE за один запуск актора."""
+    async with AsyncSessionLocal() as db:
+        try:
+            entries = await due_watchlist(db)
+            if not entries:
+                return
+            print(f"⏰ [WATCHLIST] К обновлению: {len(entries)} профилей")
+
+            for i in range(0, len(entries), WATCHLIST_BATCH_SIZE):
+                chunk = entries[i:i + WATCHLIST_BATCH_SIZE]
+                mark_refreshed(chunk)  # Коммитится вместе с пачкой
+                await refresh_competitors_batch(db, [e.username for e in chunk])
+        except Exception as e:
+            print(f"❌ Ошибка обновления watchlist: {e}")
+            await db.rollback()
+
+async def track_verticals_task():
+    """
+    Непрерывная подача детектора ранних трендов по DETECTOR_VERTICALS (без поиска пользователя):
+      1. рескан видео вертикали, найденных за последние DETECTOR_TRACK_WINDOW_HOURS (Точка Б -> скорость -> detector),
+      2. Deep Scan по ключам вертикалей — новые видео становятся Точкой А для следующего прохода.
+    """
+    verticals = [v.strip().lower() for v in settings.DETECTOR_VERTICALS if v.strip()]
+    if not verticals:
+        return
+    print(f"⏰ [TRACK] Отслеживаемые вертикали: {', '.join(verticals)}")
+
+    try:
+        async with AsyncSessionLocal() as db:
+            since = datetime.utcnow() - timedelta(hours=settings.DETECTOR_TRACK_WINDOW_HOURS)
+            urls = (await db.execute(
+                select(Trend.url)
+                .where(Trend.url.isnot(None), Trend.created_at >= since)
+                .where(or_(*[Trend.vertical.ilike(f"%{v}%") for v in verticals]))
+                .order_by(Trend.created_at.desc()).limit(settings.DETECTOR_TRACK_LIMIT)
+            )).scalars().all()
+        if urls:
+            await rescan_videos_task(list(urls), f"track_{int(datetime.utcnow().timestamp())}")
+
+        async with admission.admit("deep_scan"):
+            async with AsyncSessionLocal() as db:
+                found = await run_deep_scan(db, verticals)
+        print(f"✅ [TRACK] Deep Scan: {len(found)} видео в отслеживании.")
+    except AdmissionRejected:
+        print("⚠️ [TRACK] Deep Scan пропущен: сервис перегружен, попробуем в следующий проход.")
+    except Exception as e:
+        print(f"❌ Ошибка отслеживания вертикалей: {e}")
 
 def start_scheduler():
     if not scheduler.running:
+        scheduler.add_job(refresh_watchlist_task, 'interval', minutes=5, id="watchlist_refresh", replace_existing=True)
+        if settings.DETECTOR_VERTICALS:
+            scheduler.add_job(
+                track_verticals_task, 'interval', minutes=settings.DETECTOR_TRACK_MINUTES,
+                id="track_verticals", replace_existing=True, next_run_time=datetime.now(), max_instances=1
+            )
         scheduler.start()
         print("⏳ Background Scheduler успешно запущен.")
\ No newline at end of file
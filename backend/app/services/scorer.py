@@ -2,6 +2,18 @@ import math
 import numpy as np
 from datetime import datetime
 
+# Пороги статуса автора по среднему Viral Lift (просмотры / подписчики)
+LIFT_RISING_STAR = 2
+LIFT_STRUGGLING = 0.5
+
+def efficiency_status(avg_lift: float) -> str:
+    if avg_lift > LIFT_RISING_STAR: return "Rising Star"
+    if avg_lift < LIFT_STRUGGLING: return "Struggling"
+    return "Stable"
+
+def efficiency_score(avg_lift: float) -> float:
+    return round(min(avg_lift * 2, 10), 1)
+
 class TrendScorer:
     def __init__(self):
         # Веса для Universal Transfer Score (UTS)
@@ -29,8 +41,7 @@ class TrendScorer:
         # L2: Velocity (Скорость роста, если есть история в БД)
         l2_score = 0.5 # Default
         if history_data:
-            old_views = history_data.get('play_count', views)
-            l2_score = min((views - old_views) / (old_views + 1), 1.0)
+            l2_score = self.velocity_score(views, history_data)
 
         # L3: Retention Intensity (Закладки к просмотрам)
         l3_score = min((bookmarks / (views + 1)) * 20, 1.0)
@@ -57,6 +68,22 @@ class TrendScorer:
         
         return round(final_score, 2)
 
+    def velocity_score(self, views: int, history_data: dict) -> float:
+        """
+        L2 с учетом времени: доля текущих просмотров, набираемая за сутки (0..1).
+        Приоритет: EWMA-скорость по снимкам -> две точки + прошедшие часы -> старая формула без времени.
+        """
+        per_hour = history_data.get('velocity_ewma')
+        if per_hour is None:
+            per_hour = history_data.get('views_per_hour')
+        if per_hour is None and history_data.get('elapsed_hours'):
+            old_views = history_data.get('play_count', views)
+            per_hour = (views - old_views) / max(history_data['elapsed_hours'], 1 / 60)
+        if per_hour is None:
+            old_views = history_data.get('play_count', views)
+            return min((views - old_views) / (old_views + 1), 1.0)
+        return min(max(per_hour * 24 / (views + 1), 0.0), 1.0)
+
     def analyze_profile_efficiency(self, videos: list) -> dict:
         """
         Новая логика: Анализ эффективности автора.
@@ -66,11 +93,8 @@ class TrendScorer:
         lifts = [v.get('views', 0) / (v.get('author_followers', 1) + 1) for v in videos]
         avg_lift = sum(lifts) / len(lifts)
         
-        status = "Rising Star" if avg_lift > 2 else "Stable"
-        if avg_lift < 0.5: status = "Struggling"
-        
         return {
             "avg_viral_lift": round(avg_lift, 2),
-            "efficiency_score": round(min(avg_lift * 2, 10), 1),
-            "status": status
+            "efficiency_score": efficiency_score(avg_lift),
+            "status": efficiency_status(avg_lift)
         }
\ No newline at end of file
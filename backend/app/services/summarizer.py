@@ -0,0 +1,199 @@
+# backend/app/services/summarizer.py
+# Суть трендов от Claude: один запрос на визуальный кластер (а не на каждое видео),
+# ограниченная параллельность, кэш по хэшу содержимого и режим Message Batches для больших объемов.
+# Запускается фоновой задачей после Deep Scan — LLM не сидит на пути запроса.
+import asyncio
+import hashlib
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from ..core.config import settings
+from ..core.database import AsyncSessionLocal
+from ..core.metrics import stage
+from ..core.outbound import provider
+from ..db.models import Trend, AISummaryCache
+
+PROMPT_VERSION = "v1"          # Меняем при правке промпта — старый кэш перестает совпадать
+MAX_EXAMPLES = 8               # Сколько описаний кластера отдаем модели (самые просматриваемые)
+BATCH_POLL_SECONDS = 10
+
+def _views(trend: Trend) -> int:
+    return int((trend.stats or {}).get("playCount") or 0)
+
+def build_prompt(trends: List[Trend]) -> str:
+    examples = sorted(trends, key=_views, reverse=True)[:MAX_EXAMPLES]
+    lines = "\n".join(f"- {(t.description or 'No desc')[:300]} ({_views(t)} просмотров)" for t in examples)
+    return (
+        f"Группа визуально похожих TikTok-видео ({len(trends)} шт.). Описания:\n{lines}\n"
+        "В чем суть тренда? Ответь одной короткой фразой."
+    )
+
+def content_hash(prompt: str) -> str:
+    return hashlib.sha256(f"{settings.AI_SUMMARY_MODEL}|{PROMPT_VERSION}|{prompt}".encode()).hexdigest()
+
+def group_by_cluster(trends: List[Trend]) -> List[List[Trend]]:
+    """
+    Кластер = (vertical, cluster_id). Шум (-1 / без кластера) — каждое видео само по себе,
+    но не больше SUMMARY_NOISE_LIMIT самых просматриваемых, чтобы не вернуться к запросу на видео.
+    """
+    clusters: Dict[tuple, List[Trend]] = defaultdict(list)
+    noise = []
+    for t in trends:
+        if t.cluster_id is None or t.cluster_id < 0:
+            noise.append(t)
+        else:
+            clusters[(t.vertical, t.cluster_id)].append(t)
+    noise.sort(key=_views, reverse=True)
+    return list(clusters.values()) + [[t] for t in noise[:settings.SUMMARY_NOISE_LIMIT]]
+
+
+# --- Клиенты ---
+class AnthropicSummaryClient:
+    def __init__(self, api_key: str):
+        from anthropic import AsyncAnthropic
+        # Ретраи/лимит/breaker — через core.outbound, у SDK свои ретраи выключены
+        self.client = AsyncAnthropic(api_key=api_key, max_retries=0)
+
+    def _params(self, prompt: str) -> dict:
+        return {
+            "model": settings.AI_SUMMARY_MODEL,
+            "max_tokens": 60,
+            "messages": [{"role": "user", "content": [{"type": "text", "text": prompt}]}]
+        }
+
+    async def summarize(self, prompt: str) -> str:
+        resp = await provider("anthropic").acall(self.client.messages.create, **self._params(prompt))
+        return resp.content[0].text.strip()
+
+    async def summarize_batch(self, prompts: Dict[str, str]) -> Dict[str, str]:
+        """Message Batches: одна заявка на все промпты, ждем завершения и забираем успешные ответы."""
+        batch = await provider("anthropic").acall(
+            self.client.messages.batches.create,
+            requests=[{"custom_id": key, "params": self._params(p)} for key, p in prompts.items()]
+        )
+        deadline = asyncio.get_running_loop().time() + settings.SUMMARY_BATCH_TIMEOUT
+        while batch.processing_status != "ended":
+            if asyncio.get_running_loop().time() >= deadline:
+                try:
+                    await provider("anthropic").acall(self.client.messages.batches.cancel, batch.id)
+                except Exception as e:
+                    print(f"⚠️ AI Batch: не удалось отменить {batch.id}: {e}")
+                raise asyncio.TimeoutError(f"batch {batch.id} не завершился за {settings.SUMMARY_BATCH_TIMEOUT} с")
+            await asyncio.sleep(BATCH_POLL_SECONDS)
+            batch = await provider("anthropic").acall(self.client.messages.batches.retrieve, batch.id)
+
+        answers = {}
+        async for entry in await self.client.messages.batches.results(batch.id):
+            if entry.result.type == "succeeded":
+                answers[entry.custom_id] = entry.result.message.content[0].text.strip()
+            else:
+                print(f"⚠️ AI Batch: {entry.custom_id} -> {entry.result.type}")
+        return answers
+
+
+class StubSummaryClient:
+    """Локальная заглушка без сети: детерминированный ответ из промпта (тесты, бенчмарки, CI)."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def summarize(self, prompt: str) -> str:
+        self.calls += 1
+        first = next((line[2:] for line in prompt.splitlines() if line.startswith("- ")), "")
+        return f"Stub: {first[:60]}"
+
+    async def summarize_batch(self, prompts: Dict[str, str]) -> Dict[str, str]:
+        return {key: await self.summarize(p) for key, p in prompts.items()}
+
+
+_client = None
+
+def get_summary_client():
+    """SUMMARY_CLIENT=stub — заглушка; иначе Anthropic (None, если ключ не задан)."""
+    global _client
+    if _client is None:
+        if settings.SUMMARY_CLIENT == "stub":
+            _client = StubSummaryClient()
+        elif settings.ANTHROPIC_API_KEY:
+            _client = AnthropicSummaryClient(settings.ANTHROPIC_API_KEY)
+    return _client
+
+
+# --- Пайплайн ---
+async def _run_requests(client, prompts: Dict[str, str]) -> Dict[str, str]:
+    if settings.SUMMARY_MODE == "batch" and len(prompts) >= settings.SUMMARY_BATCH_MIN:
+        try:
+            with stage("ai_summary", mode="batch", items=len(prompts)):
+                return await client.summarize_batch(prompts)
+        except asyncio.TimeoutError as e:
+            print(f"⚠️ AI Batch: {e} — переходим на обычные запросы.")
+
+    semaphore = asyncio.Semaphore(settings.SUMMARY_CONCURRENCY)
+
+    async def one(key: str, prompt: str):
+        async with semaphore:
+            try:
+                return key, await client.summarize(prompt)
+            except Exception as e:
+                print(f"⚠️ AI Summary Error: {e}")
+                return key, None
+
+    with stage("ai_summary", mode="async", items=len(prompts)):
+        results = await asyncio.gather(*(one(k, p) for k, p in prompts.items()))
+    return {k: v for k, v in results if v}
+
+async def summarize_trends(trend_ids: List[int], client=None) -> int:
+    """
+    Проставляет ai_summary трендам по id. Возвращает число реальных запросов к модели.
+    Сессии короткие: чтение (тренды + кэш) закрываем до запросов к модели, запись — в новой сессии,
+    чтобы соединение пула не висело «idle in transaction» все время ожидания LLM.
+    """
+    client = client or get_summary_client()
+    if client is None or not trend_ids:
+        return 0
+
+    async with AsyncSessionLocal() as db:
+        trends = (await db.execute(select(Trend).where(Trend.id.in_(trend_ids)))).scalars().all()
+        groups: Dict[str, List[int]] = {}
+        prompts = {}
+        for members in group_by_cluster(list(trends)):
+            prompt = build_prompt(members)
+            key = content_hash(prompt)
+            groups.setdefault(key, []).extend(t.id for t in members)
+            prompts[key] = prompt
+        if not prompts:
+            return 0
+        cached = (await db.execute(
+            select(AISummaryCache.content_hash, AISummaryCache.summary).where(AISummaryCache.content_hash.in_(list(prompts)))
+        )).all()
+    summaries = {h: s for h, s in cached}
+    missing = {k: p for k, p in prompts.items() if k not in summaries}
+    print(f"🤖 AI Summary: {len(prompts)} кластеров, из кэша {len(summaries)}, к модели {len(missing)}.")
+
+    fresh = await _run_requests(client, missing) if missing else {}
+    summaries.update(fresh)
+    params = [{"t_id": t_id, "t_summary": summaries[key]} for key, ids in groups.items() if key in summaries for t_id in ids]
+
+    async with AsyncSessionLocal() as db:
+        if fresh:
+            await db.execute(pg_insert(AISummaryCache).values([
+                {"content_hash": k, "summary": v, "model": settings.AI_SUMMARY_MODEL} for k, v in fresh.items()
+            ]).on_conflict_do_nothing(index_elements=[AISummaryCache.content_hash]))
+        if params:
+            table = Trend.__table__
+            await db.execute(
+                update(table).where(table.c.id == bindparam("t_id")).values(ai_summary=bindparam("t_summary")),
+                params
+            )
+        await db.commit()
+    return len(missing)
+
+async def summarize_trends_task(trend_ids: List[int], client=None):
+    """Фоновая задача планировщика: тренды по id, сессии открывает сама."""
+    try:
+        await summarize_trends(trend_ids, client=client)
+    except Exception as e:
+        print(f"❌ AI Summary task failed: {e}")
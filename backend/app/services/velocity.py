@@ -0,0 +1,121 @@
+# backend/app/services/velocity.py
+# Скорость роста по серии снимков (trend_snapshots) — векторно на весь батч:
+# просмотры/час между соседними снимками, ускорение и EWMA-сглаживание с учетом реального времени между сканами.
+import math
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from ..core.config import settings
+from ..core.metrics import stage
+from ..db.models import TrendSnapshot
+
+MIN_DT_HOURS = 1 / 60  # Снимки ближе минуты друг к другу не делят на почти ноль
+
+def compute_velocity(trend_ids: np.ndarray, hours: np.ndarray, views: np.ndarray,
+                     half_life_hours: float = None) -> Dict[str, np.ndarray]:
+    """
+    Вход — плоские массивы снимков, отсортированные по (trend_id, время); hours — время в часах от любой точки.
+    Выход — по одному значению на уникальный trend_id (в порядке возрастания id):
+      views_per_hour — скорость на последнем отрезке,
+      acceleration   — изменение скорости (просмотры/час²) между двумя последними отрезками,
+      ewma           — EWMA скорости, вес отрезка = 1 - 2^(-dt / half_life).
+    Видео с одним снимком получают NaN-скорость и нулевое ускорение.
+    """
+    half_life = half_life_hours or settings.VELOCITY_HALF_LIFE_HOURS
+    ids, starts, counts = np.unique(trend_ids, return_index=True, return_counts=True)
+    n, width = len(ids), int(counts.max()) if len(ids) else 0
+
+    # Паддинг в матрицу [видео x снимок]: все дальнейшие операции — по столбцам, цикл только по длине серии
+    row = np.repeat(np.arange(n), counts)
+    col = np.arange(len(trend_ids)) - np.repeat(starts, counts)
+    T = np.full((n, width), np.nan)
+    V = np.full((n, width), np.nan)
+    T[row, col] = hours
+    V[row, col] = views
+
+    dt = np.diff(T, axis=1)
+    R = np.diff(V, axis=1) / np.maximum(dt, MIN_DT_HOURS)      # скорость на каждом отрезке
+
+    last = counts - 2                                           # индекс последнего отрезка
+    has_rate = last >= 0
+    velocity = np.full(n, np.nan)
+    velocity[has_rate] = R[has_rate, last[has_rate]]
+
+    acceleration = np.zeros(n)
+    has_acc = last >= 1
+    if has_acc.any():
+        r = np.nonzero(has_acc)[0]
+        span = (T[r, last[r] + 1] - T[r, last[r] - 1]) / 2      # между серединами двух отрезков
+        acceleration[r] = (R[r, last[r]] - R[r, last[r] - 1]) / np.maximum(span, MIN_DT_HOURS)
+
+    ewma = np.full(n, np.nan)
+    for j in range(width - 1):
+        rate = R[:, j]
+        alpha = 1 - np.power(2.0, -np.nan_to_num(dt[:, j]) / half_life)
+        ewma = np.where(np.isnan(ewma), rate, np.where(np.isnan(rate), ewma, ewma + alpha * (rate - ewma)))
+
+    return {"trend_id": ids, "views_per_hour": velocity, "acceleration": acceleration, "ewma": ewma}
+
+def _snapshot_row(trend, captured_at: datetime) -> dict:
+    stats = trend.stats or {}
+    return {
+        "trend_id": trend.id,
+        "views": int(stats.get("playCount") or 0),
+        "likes": int(stats.get("diggCount") or 0),
+        "shares": int(stats.get("shareCount") or 0),
+        "bookmarks": int(stats.get("collectCount") or 0),
+        "captured_at": captured_at,
+    }
+
+async def record_snapshots(db, trends: list, captured_at: datetime = None):
+    """Один INSERT снимков текущих stats для всего батча (без commit — в транзакции вызывающего)."""
+    rows = [_snapshot_row(t, captured_at or datetime.utcnow()) for t in trends if t.id is not None]
+    if rows:
+        await db.execute(pg_insert(TrendSnapshot).values(rows))
+
+async def load_series(db, trend_ids: List[int], max_points: int = None):
+    """Последние max_points снимков каждого видео, плоскими массивами numpy в порядке (trend_id, время)."""
+    max_points = max_points or settings.VELOCITY_MAX_POINTS
+    ranked = select(
+        TrendSnapshot.trend_id, TrendSnapshot.captured_at, TrendSnapshot.views,
+        func.row_number().over(partition_by=TrendSnapshot.trend_id, order_by=TrendSnapshot.captured_at.desc()).label("rn")
+    ).where(TrendSnapshot.trend_id.in_(trend_ids)).subquery()
+    rows = (await db.execute(
+        select(ranked.c.trend_id, ranked.c.captured_at, ranked.c.views)
+        .where(ranked.c.rn <= max_points)
+        .order_by(ranked.c.trend_id, ranked.c.captured_at)
+    )).all()
+
+    ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    hours = np.fromiter((r[1].timestamp() / 3600 for r in rows), dtype=np.float64, count=len(rows))
+    views = np.fromiter((r[2] or 0 for r in rows), dtype=np.float64, count=len(rows))
+    return ids, hours, views
+
+async def update_velocity(db, trends: list) -> Dict[int, dict]:
+    """Считает скорость по снимкам и проставляет ее трендам. Возвращает {trend_id: метрики} для скоринга."""
+    by_id = {t.id: t for t in trends if t.id is not None}
+    if not by_id:
+        return {}
+
+    with stage("velocity", items=len(by_id)):
+        ids, hours, views = await load_series(db, list(by_id))
+        if not len(ids):
+            return {}
+        result = compute_velocity(ids, hours, views)
+
+    metrics = {}
+    for tid, vph, acc, ewma in zip(result["trend_id"], result["views_per_hour"], result["acceleration"], result["ewma"]):
+        trend = by_id[int(tid)]
+        trend.views_per_hour = None if math.isnan(vph) else round(float(vph), 2)
+        trend.acceleration = round(float(acc), 4)
+        trend.velocity_ewma = None if math.isnan(ewma) else round(float(ewma), 2)
+        metrics[trend.id] = {
+            "views_per_hour": trend.views_per_hour,
+            "acceleration": trend.acceleration,
+            "velocity_ewma": trend.velocity_ewma,
+        }
+    return metrics
@@ -0,0 +1,100 @@
+# backend/benchmarks/synthetic.py
+# Генераторы синтетических данных для бенчмарков (детерминированные, через seed).
+import io
+import json
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+
+VERTICALS = 100  # Кол-во синтетических вертикалей: v0000 ... v0099
+
+def vertical_name(i: int) -> str:
+    # Фиксированная ширина, чтобы ILIKE '%v0007%' не цеплял v0070..v0079
+    return f"v{i:04d}"
+
+def video_url(i: int) -> str:
+    return f"https://www.tiktok.com/@bench{i % 5000}/video/{7300000000000000000 + i}"
+
+def synthetic_video(rng: random.Random) -> dict:
+    """Вход для TrendScorer.calculate_uts."""
+    views = rng.randint(1000, 5_000_000)
+    return {
+        "views": views,
+        "author_followers": rng.randint(100, 10_000_000),
+        "collect_count": views // rng.randint(50, 500),
+        "share_count": views // rng.randint(50, 500)
+    }
+
+def synthetic_history(rng: random.Random, views: int) -> dict:
+    return {"play_count": int(views / (1 + rng.random())), "total_sound_usage": rng.randint(0, 2000)}
+
+def synthetic_embeddings(n: int, dim: int = 512, clusters: int = 20, seed: int = 42) -> np.ndarray:
+    """Кластеризованные точки на сфере: центры + шум, как у похожих обложек."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    X = centers[labels] + rng.normal(scale=0.15, size=(n, dim)).astype(np.float32)
+    X /= np.linalg.norm(X, axis=1, keepdims=True)
+    return X
+
+def synthetic_series(n: int, points: int = 6, seed: int = 42):
+    """Серии снимков для velocity: n видео x points сканов с неровными интервалами (плоские массивы)."""
+    rng = np.random.default_rng(seed)
+    ids = np.repeat(np.arange(n), points)
+    gaps = rng.uniform(0.03, 48, size=(n, points))
+    gaps[:, 0] = 0
+    hours = np.cumsum(gaps, axis=1).ravel()
+    growth = rng.uniform(10, 5000, size=(n, 1)) * np.cumsum(gaps, axis=1)
+    views = (rng.integers(1000, 100_000, size=(n, 1)) + growth).ravel()
+    return ids, hours, views
+
+def _trend_csv_chunk(start: int, stop: int, rng: random.Random, scanned: bool) -> io.StringIO:
+    buf = io.StringIO()
+    now = datetime.utcnow()
+    for i in range(start, stop):
+        views = rng.randint(1000, 5_000_000)
+        stats = json.dumps({"playCount": views}).replace('"', '""')
+        last_scanned = (now - timedelta(minutes=rng.randint(0, 600))).isoformat() if scanned else ""
+        buf.write(
+            f'{7300000000000000000 + i},{video_url(i)},"bench video {i} #fyp",'
+            f'https://p16-sign.tiktokcdn.com/obj/{i}.jpeg,{vertical_name(i % VERTICALS)},bench{i % 5000},'
+            f'{rng.randint(100, 10_000_000)},"{stats}","{stats}",{rng.random() * 10:.2f},{last_scanned},{now.isoformat()}\n'
+        )
+    buf.seek(0)
+    return buf
+
+def copy_trends(database_url: str, n: int, seed: int = 42, scanned: bool = False, chunk: int = 50_000):
+    """
+    Заливает n синтетических трендов через COPY (1M строк — десятки секунд, а не часы INSERT-ами).
+    scanned=False: last_scanned_at пустой, поэтому get_saved_results их НЕ удаляет после выдачи.
+    """
+    import psycopg2
+
+    rng = random.Random(seed)
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("TRUNCATE trends RESTART IDENTITY CASCADE")
+            for start in range(0, n, chunk):
+                cur.copy_expert(
+                    "COPY trends (platform_id, url, description, cover_url, vertical, author_username, "
+                    "author_followers, stats, initial_stats, uts_score, last_scanned_at, created_at) "
+                    "FROM STDIN WITH (FORMAT csv, NULL '')",
+                    _trend_csv_chunk(start, min(start + chunk, n), rng, scanned)
+                )
+            cur.execute("ANALYZE trends")
+        conn.commit()
+    finally:
+        conn.close()
+
+def truncate_trends(database_url: str):
+    import psycopg2
+
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("TRUNCATE trends RESTART IDENTITY CASCADE")
+        conn.commit()
+    finally:
+        conn.close()
@@ -27,6 +27,8 @@ const SafeImage = ({ src, alt, className }: { src: string | null | undefined, al
   // Используем прокси для TikTok изображений
   const getImageUrl = (url: string | null | undefined) => {
     if (!url) return null;
+    // Свой прокси обложек (кэш + миниатюры): относительный путь /api/media/...
+    if (url.startsWith('/api/')) return `${getBackendUrl()}${url}`;
     // Проверяем все варианты TikTok CDN доменов (любой домен с tiktokcdn)
     if (url.includes('tiktokcdn')) {
       // Используем прокси через backend
@@ -189,7 +191,7 @@ export default function Home() {
     return (
       <div className="group bg-zinc-900/40 border border-zinc-800/50 rounded-2xl overflow-hidden hover:border-blue-500/50 transition-all flex flex-col">
         <div className="relative aspect-[9/16] bg-black">
-          <SafeImage src={item.cover_url} alt="Cover" className="w-full h-full object-cover opacity-80 group-hover:opacity-100 transition-opacity" />
+          <SafeImage src={item.cover_proxy || item.cover_url} alt="Cover" className="w-full h-full object-cover opacity-80 group-hover:opacity-100 transition-opacity" />
           
           {/*UTS & GROWTH BADGE */}
           <div className="absolute top-2 right-2 flex flex-col gap-1 items-end">
@@ -5,6 +5,7 @@ export interface Trend {
     url: string;
     description: string;
     cover_url: string;
+    cover_proxy?: string;   // /api/media/cover/{platform_id} — кэшированная миниатюра
     vertical: string;
     author_username: string;
     author_followers: number;